@@ -0,0 +1,99 @@
+"""
+Memory and construction time of the in-process representations of the full module catalog (exploit + auxiliary).
+
+Compares the SQLAlchemy ORM objects, the plain row tuples of the DB-API cursor, and the ModuleCatalog of slotted
+ModuleRecord rows with interned strings. The retained memory is measured with tracemalloc while the structure is
+alive, after a warm-up build; the time is the median build time, fetch included.
+Example:
+    python -m benchmarks.catalog_memory
+    python -m benchmarks.catalog_memory --db metasploit_data.db --repeat 10
+"""
+import argparse
+import gc
+import logging
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import constants
+from utils.msf.catalog_records import ModuleCatalog
+
+COLUMNS = ('group', 'sub_group', 'name', 'rank', 'disclosure_date', 'status_check', 'description')
+
+
+def fetch_rows(db_path: str) -> List[tuple]:
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        columns = ', '.join(f'"{column}"' for column in COLUMNS)
+        return connection.execute(f"SELECT {columns} FROM modules ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def orm_objects(db_path: str):
+    """The ModuleAuxiliary objects of a session, with the session kept open like a caller holding them."""
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+    from utils.dao.sqlalchemy.models import ModuleAuxiliary
+
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.ERROR)
+    engine = create_engine(f'sqlite:///{db_path}', future=True)
+    session = Session(engine)
+    modules = session.execute(select(ModuleAuxiliary).order_by(ModuleAuxiliary.id)).scalars().all()
+    return session, modules
+
+
+def slotted_catalog(db_path: str) -> ModuleCatalog:
+    return ModuleCatalog.from_rows(fetch_rows(db_path))
+
+
+REPRESENTATIONS: Dict[str, Callable] = {
+    'orm': orm_objects,
+    'rows': fetch_rows,
+    'slots': slotted_catalog,
+}
+
+
+def retained_bytes(build: Callable, db_path: str) -> int:
+    # A first build imports and configures what the representation needs, which is not part of its size
+    build(db_path)
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build(db_path)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def build_seconds(build: Callable, db_path: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = build(db_path)
+        timings.append(time.perf_counter() - started)
+        del result
+    return statistics.median(timings)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare the in-process representations of the module catalog.')
+    parser.add_argument('--db', default=constants.MSF_CATALOG_DB)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modules = len(fetch_rows(args.db))
+    print(f'{modules} modules')
+    print(f"{'representation':>15} {'retained KB':>12} {'bytes/module':>13} {'build ms':>9}")
+    for name, build in REPRESENTATIONS.items():
+        retained = retained_bytes(build, args.db)
+        seconds = build_seconds(build, args.db, args.repeat)
+        print(f'{name:>15} {retained / 1024:>12.1f} {retained / modules:>13.0f} {seconds * 1000:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
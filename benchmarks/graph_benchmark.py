@@ -0,0 +1,311 @@
+"""
+End-to-end benchmark of the host-team graphs with a scripted fake LLM and stubbed tools.
+
+Builds create_host_graph, create_host_planner_graph and create_host_testing_graph, drives them through
+representative routing paths and reports framework overhead separately from (fake) model and tool time:
+graph build time, run latency, per-step overhead, per-node wall time, allocations and peak memory.
+Example:
+    python -m benchmarks.graph_benchmark --iterations 50
+    python -m benchmarks.graph_benchmark --scenario testing --llm-latency 0.01 --json bench.json
+
+Node wall times of connector nodes (planner_team, tools_team, nmap_tester_node) include the sub-graphs they run.
+The host_planner scenario runs the planner team from the host graph with a scratch plan cache: the warm-up run
+stores the plan and every identical run after it must be served from the cache.
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from langchain_core.messages import HumanMessage
+
+import constants
+from utils.fake_llm import ScriptedChatModel, scripted_llm_factory, tool_call_reply
+from utils.instrumentation import Instrumentation
+from utils.nmap.recon import ReconPrefetch
+from utils.plan_cache import PlanCache
+
+TARGET = '10.10.11.23'
+
+STUB_TOOL_OUTPUTS = {
+    'tool_based_on_metasploit': f'[+] {TARGET}:22 - TCP OPEN\n[+] {TARGET}:80 - TCP OPEN\n'
+                                f'[*] Auxiliary module execution completed',
+    'tool_based_on_nmap': f'Targets: {TARGET}, Ports: 22,80, Arguments: -sV, Hosts: 1 up, 0 down, 0 timed out\n'
+                          f'Open services (port/protocol service: hosts):\n  22/tcp ssh OpenSSH 8.9p1: {TARGET}\n'
+                          f'  80/tcp http nginx 1.18.0: {TARGET}',
+    'get_nmap_open_ports': '22/tcp ssh OpenSSH 8.9p1; 80/tcp http nginx 1.18.0',
+    'get_msf_module_options': "{'RHOSTS': 'The target host(s)', 'PORTS': 'Ports to scan (e.g. 22-25,80,110-900)'}",
+    'get_msf_exact_sub_group_modules_list': "['auxiliary/scanner/portscan/tcp', 'auxiliary/scanner/portscan/syn']",
+    'get_msf_modules_for_sub_groups': "{'auxiliary/scanner/portscan': ['auxiliary/scanner/portscan/tcp', "
+                                      "'auxiliary/scanner/portscan/syn']}",
+}
+
+SUB_GROUPS = ['auxiliary/scanner/portscan', 'auxiliary/scanner/ssh', 'auxiliary/scanner/http']
+
+
+def host_script() -> Dict[str, List[Any]]:
+    # host -> chooser -> END
+    return {
+        'host/host#1.txt': [f'The host {TARGET} was already tested, the task is solved. FINAL ANSWER'],
+        'host/chooser#1.txt': [constants.FINAL_ANSWER],
+    }
+
+
+def planner_script() -> Dict[str, List[Any]]:
+    # plan composition -> tools team (group selection -> module selection -> executor) -> plan composition
+    # -> extraction -> END
+    return {
+        'planning_team/plan_composition_agent#2.txt': [
+            'I need the list of modules first. Tools Agent, please prepare it.',
+            f'Plan:\n1) auxiliary/scanner/portscan/tcp against {TARGET}\n2) auxiliary/scanner/ssh/ssh_version'
+        ],
+        'planning_team/group_selection_agent#1.txt': [str(SUB_GROUPS[:1])],
+        'planning_team/module_selection_agent#2.txt': [
+            tool_call_reply('get_msf_modules_for_sub_groups', {'sub_group_names': SUB_GROUPS[:1]})
+        ],
+        'planning_team/extraction_agent#1.txt': [
+            {constants.PLAN_FIELD: f'1) auxiliary/scanner/portscan/tcp against {TARGET}'}
+        ],
+    }
+
+
+def host_planner_script() -> Dict[str, List[Any]]:
+    # host -> chooser -> planner team (the planner script) -> host -> chooser -> END
+    return {
+        'host/host#1.txt': [
+            f'{constants.PLANNER_AGENT}, prepare a testing plan for the host {TARGET}.',
+            f'The plan is ready, the task is solved. {constants.FINAL_ANSWER}'
+        ],
+        'host/chooser#1.txt': [constants.PLANNER_AGENT, constants.FINAL_ANSWER],
+        **planner_script(),
+    }
+
+
+def testing_script() -> Dict[str, List[Any]]:
+    # header -> nmap team (nmap tester -> executor -> nmap tester) -> header -> msf tester -> executor -> header
+    # -> args (-> executor -> args) -> header -> extraction -> END
+    return {
+        'testing_team/header#1.txt': [
+            f'**{constants.NMAP_TESTER_AGENT}**, scan {TARGET}.',
+            f'**{constants.MSF_TESTER_AGENT}**, run the TCP port scanner.',
+            f'**{constants.ARGS_AGENT}**, check the options of the SSH version scanner.',
+            f'All steps are done. {constants.FINAL_ANSWER}'
+        ],
+        'testing_team/tester_nmap#1.txt': [
+            tool_call_reply('tool_based_on_nmap', {'in_hosts': TARGET, 'in_ports': '22,80'}),
+            f'22/tcp and 80/tcp are open. {constants.FINAL_ANSWER}'
+        ],
+        'testing_team/tester_msf#1.txt': [
+            tool_call_reply('tool_based_on_metasploit', {'input_dict': {
+                'module_category': 'auxiliary', 'module_name': 'scanner/portscan/tcp',
+                'RHOSTS': TARGET, 'PORTS': '22,80'
+            }})
+        ],
+        'testing_team/args_msf#1.txt': [
+            tool_call_reply('get_msf_module_options', {'module_name': 'auxiliary/scanner/ssh/ssh_version'}),
+            'RHOSTS is the only required option.'
+        ],
+        'planning_team/extraction_agent#1.txt': [
+            {constants.RESULT_FIELD: f'{TARGET}: 22/tcp ssh OpenSSH 8.9p1, 80/tcp http nginx 1.18.0'}
+        ],
+    }
+
+
+def _build_host_graph(model: ScriptedChatModel):
+    from teams.graph_host_team import create_host_graph
+    return create_host_graph()
+
+
+def _build_planner_graph(model: ScriptedChatModel):
+    from teams.graph_planning_team import create_host_planner_graph
+    return create_host_planner_graph(model)
+
+
+def _build_testing_graph(model: ScriptedChatModel):
+    from teams.graph_testing_team import create_host_testing_graph
+    return create_host_testing_graph(model)
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    'host': {'script': host_script, 'build': _build_host_graph},
+    'planner': {'script': planner_script, 'build': _build_planner_graph},
+    'testing': {'script': testing_script, 'build': _build_testing_graph},
+    'host_planner': {'script': host_planner_script, 'build': _build_host_graph, 'cached_plan': True},
+}
+
+
+@contextlib.contextmanager
+def benchmark_environment(model: ScriptedChatModel, tool_latency: float = 0.0):
+    """
+    Route every LLM and tool of the graphs to fakes: create_llm returns the scripted model, the tools return
+    canned outputs (the speculative reconnaissance included), graph drawing and metric export are disabled and
+    the plan cache is a scratch file.
+    """
+    import utils.llm
+    import teams.graph_host_team
+    import graph_entities.nodes
+    from tools import msf_tools, nmap_tools
+
+    def stub(name: str) -> Callable:
+        def run(*args, **kwargs) -> str:
+            if tool_latency:
+                time.sleep(tool_latency)
+            return STUB_TOOL_OUTPUTS[name]
+        return run
+
+    tools = [msf_tools.tool_based_on_metasploit, msf_tools.get_msf_module_options,
+             msf_tools.get_msf_exact_sub_group_modules_list, msf_tools.get_msf_modules_for_sub_groups,
+             nmap_tools.tool_based_on_nmap,
+             nmap_tools.get_nmap_open_ports]
+
+    create_llm = scripted_llm_factory(model)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(utils.llm, 'create_llm', create_llm))
+        stack.enter_context(mock.patch.object(teams.graph_host_team, 'create_llm', create_llm))
+        stack.enter_context(mock.patch.object(graph_entities.nodes, 'get_msf_sub_groups_list', lambda: SUB_GROUPS))
+        stack.enter_context(mock.patch.object(constants, 'DRAW_GRAPHS', False))
+        stack.enter_context(mock.patch.object(constants, 'INSTRUMENTATION_EXPORT_DIR', None))
+        for tool in tools:
+            stack.enter_context(mock.patch.object(tool, 'func', stub(tool.name)))
+        # The speculative reconnaissance of the host run scans through run_nmap_scan
+        stack.enter_context(mock.patch.object(nmap_tools, 'run_nmap_scan', stub('tool_based_on_nmap')))
+
+        plan_cache = PlanCache()
+        store_path = plan_cache.store_path
+        plan_cache.configure(f'{stack.enter_context(tempfile.TemporaryDirectory())}/plan_cache.db')
+        stack.callback(plan_cache.configure, store_path)
+        yield
+
+
+def run_once(compiled_graph, model: ScriptedChatModel, task: str) -> Dict[str, Any]:
+    """
+    Execute the compiled graph once and return its wall time with the instrumentation events of the run.
+    """
+    instrumentation = Instrumentation()
+    instrumentation.reset()
+    model.reset()
+    ReconPrefetch().reset()
+    # The run counts as the outermost execution, so the nested execute_graph calls don't export and reset
+    instrumentation.begin_run()
+    try:
+        # Nodes and sub-graph executors print every message; the printing is measured but not shown
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            state = compiled_graph.invoke({'messages': [HumanMessage(content=task)], 'sender': ['Human']})
+            elapsed = time.perf_counter() - start_time
+    finally:
+        instrumentation.end_run()
+
+    return {'elapsed': elapsed, 'events': list(instrumentation.events), 'state': state,
+            'plan_cache_hits': instrumentation.counter_total('plan_cache_hits_total')}
+
+
+def benchmark_scenario(name: str, iterations: int, llm_latency: float = 0.0, tool_latency: float = 0.0,
+                       task: str = f'Test the host {TARGET} for open ports and vulnerable services.'
+                       ) -> Dict[str, Any]:
+    """
+    Build and run one scenario.
+
+    :param name: Key of SCENARIOS
+    :param iterations: Number of timed runs
+    :param llm_latency: Seconds the fake model sleeps per call
+    :param tool_latency: Seconds the stubbed tools sleep per call
+    :param task: The human task the graph starts with
+    :return: Report of the scenario
+    """
+    scenario = SCENARIOS[name]
+    model = ScriptedChatModel(script=scenario['script'](), latency=llm_latency, prompt_tokens=100,
+                              completion_tokens=20)
+
+    with benchmark_environment(model, tool_latency):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            compiled_graph = scenario['build'](model).compile()
+        build_s = time.perf_counter() - start_time
+
+        # Warm-up run, also used to validate the routing path
+        warm_up = run_once(compiled_graph, model, task)
+        path = [event['name'] for event in warm_up['events'] if event['kind'] == 'node_enter']
+
+        runs = [run_once(compiled_graph, model, task) for _ in range(iterations)]
+        # The warm-up run stored the plan, the identical runs after it must not run the planner team again
+        if scenario.get('cached_plan') and not all(run['plan_cache_hits'] for run in runs):
+            raise RuntimeError(f"The runs of the {name} scenario were not served from the plan cache")
+
+        # Allocations are measured in a separate run: tracemalloc slows the interpreter down
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        run_once(compiled_graph, model, task)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stats = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+    elapsed = [run['elapsed'] for run in runs]
+
+    overheads = []
+    node_durations: Dict[str, List[float]] = {}
+    for run in runs:
+        events = run['events']
+        steps = [event for event in events if event['kind'] == 'node']
+        external = sum(event['duration_s'] for event in events if event['kind'] in ('llm', 'tool'))
+        overheads.append((run['elapsed'] - external) / max(len(steps), 1))
+        for event in steps:
+            node_durations.setdefault(event['name'], []).append(event['duration_s'])
+
+    return {
+        'scenario': name,
+        'iterations': iterations,
+        'path': path,
+        'steps_per_run': len(path),
+        'llm_calls_per_run': sum(1 for event in warm_up['events'] if event['kind'] == 'llm'),
+        'build_ms': build_s * 1000,
+        'run_mean_ms': statistics.mean(elapsed) * 1000,
+        'run_p50_ms': statistics.median(elapsed) * 1000,
+        'run_max_ms': max(elapsed) * 1000,
+        'overhead_per_step_us': statistics.mean(overheads) * 1_000_000,
+        'nodes_mean_ms': {node: statistics.mean(values) * 1000 for node, values in node_durations.items()},
+        'allocated_kb': sum(stat.size_diff for stat in stats) / 1024,
+        'allocated_blocks': sum(stat.count_diff for stat in stats if stat.count_diff > 0),
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"== {report['scenario']} ==")
+    print(f"{'path':>22}: {' -> '.join(report['path'])}")
+    for key, value in report.items():
+        if key in ('scenario', 'path', 'nodes_mean_ms'):
+            continue
+        print(f'{key:>22}: {value:.3f}' if isinstance(value, float) else f'{key:>22}: {value}')
+    for node, value in sorted(report['nodes_mean_ms'].items(), key=lambda item: -item[1]):
+        print(f'{node:>22}: {value:.3f} ms')
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the host-team graphs with a fake LLM and stub tools.')
+    parser.add_argument('--scenario', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds the fake LLM sleeps per call')
+    parser.add_argument('--tool-latency', type=float, default=0.0, help='seconds every stubbed tool sleeps')
+    parser.add_argument('--json', default=None, help='also write the reports to this JSON file')
+    args = parser.parse_args(argv)
+
+    reports = [benchmark_scenario(name, args.iterations, args.llm_latency, args.tool_latency)
+               for name in args.scenario]
+    for report in reports:
+        print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as file_writer:
+            json.dump(reports, file_writer, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark based on `python -X importtime`.
+
+Every target is executed in a fresh interpreter; the import times reported by the interpreter are summed per run,
+and the median over the runs is checked against the target's budget. The heavy dependencies that must only be
+loaded on first use (LLM providers, sqlalchemy, pymetasploit3, ...) are reported when a target imports them.
+Example:
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --target workflows.host_team --top 20
+
+Exits with code 1 if a budget is exceeded or a deferred module is imported.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# target -> (code executed in a fresh interpreter, budget of the summed import time in ms)
+TARGETS: Dict[str, Tuple[str, int]] = {
+    'workflows.host_team': ('import workflows.host_team', 1500),
+    'workflows.planning_team': ('import workflows.planning_team', 1500),
+    'create_host_graph': ('from teams.graph_host_team import create_host_graph; create_host_graph()', 1700),
+}
+
+# Packages that are imported on first use only and must not be loaded at start-up
+DEFERRED_MODULES = ('langchain_openai', 'langchain_anthropic', 'langchain_community', 'langchain.agents',
+                    'sqlalchemy', 'pymetasploit3', 'nmap')
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+# Modules the interpreter imports before the target code runs
+STARTUP_MODULES = {'site', 'encodings', '_frozen_importlib_external', 'zipimport', 'codecs', 'io', 'abc', 'time',
+                   '_io', 'marshal', 'posix', '_thread', '_warnings', '_weakref', 'winreg', 'nt'}
+
+
+def parse_import_time(stderr: str) -> List[Tuple[int, str, int, int]]:
+    """
+    Parse `-X importtime` output into (depth, module, self_us, cumulative_us) rows.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((len(indent) // 2, module, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(code: str) -> Dict[str, object]:
+    """
+    Run the code in a fresh interpreter with -X importtime.
+
+    :return: Dictionary with the summed import time (ms), the wall time (ms) and the parsed rows
+    """
+    start_time = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                               cwd=os.getcwd(), env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    wall_ms = (time.perf_counter() - start_time) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{code}' failed:\n{completed.stderr[-2000:]}")
+
+    rows = parse_import_time(completed.stderr)
+    import_us = sum(cumulative for depth, module, _, cumulative in rows
+                    if depth == 0 and module not in STARTUP_MODULES)
+    return {'import_ms': import_us / 1000, 'wall_ms': wall_ms, 'rows': rows}
+
+
+def top_packages(rows: List[Tuple[int, str, int, int]], top: int) -> List[Tuple[str, float]]:
+    """Self import time aggregated per top-level package, heaviest first."""
+    packages: Dict[str, int] = {}
+    for _, module, self_us, _ in rows:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return [(package, us / 1000) for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]]
+
+
+def loaded_deferred_modules(rows: List[Tuple[int, str, int, int]]) -> List[str]:
+    modules = {module for _, module, _, _ in rows}
+    return [deferred for deferred in DEFERRED_MODULES
+            if any(module == deferred or module.startswith(f'{deferred}.') for module in modules)]
+
+
+def run_benchmark(targets: List[str], runs: int, top: int, budget_scale: float = 1.0) -> bool:
+    """
+    Measure the targets and print a report.
+
+    :param targets: Keys of TARGETS
+    :param runs: Fresh interpreters per target; the first one also warms up the bytecode and file caches
+    :param top: Number of heaviest packages to list
+    :param budget_scale: Multiplier of the budgets (for slower machines)
+    :return: True if every target is within its budget and loads no deferred module
+    """
+    passed = True
+    for target in targets:
+        code, budget_ms = TARGETS[target]
+        budget_ms *= budget_scale
+        measure(code)  # warm-up
+        measurements = [measure(code) for _ in range(runs)]
+        import_ms = statistics.median(m['import_ms'] for m in measurements)
+        wall_ms = statistics.median(m['wall_ms'] for m in measurements)
+        deferred = loaded_deferred_modules(measurements[0]['rows'])
+
+        within_budget = import_ms <= budget_ms and not deferred
+        passed &= within_budget
+
+        print(f"== {target} ({'OK' if within_budget else 'FAILED'}) ==")
+        print(f"{'import time':>22}: {import_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        print(f"{'interpreter wall time':>22}: {wall_ms:.1f} ms")
+        print(f"{'deferred modules':>22}: {', '.join(deferred) or 'none loaded'}")
+        for package, package_ms in top_packages(measurements[0]['rows'], top):
+            print(f'{package:>22}: {package_ms:.1f} ms')
+
+    return passed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Measure the cold-start import time against budgets.')
+    parser.add_argument('--target', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='number of heaviest packages to show')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='multiply every budget by this factor')
+    args = parser.parse_args(argv)
+
+    if not run_benchmark(args.target, args.runs, args.top, args.budget_scale):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
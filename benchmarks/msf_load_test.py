@@ -0,0 +1,95 @@
+"""
+Load test of the MSF integration against the local fake msfrpcd.
+
+Runs `_execute_metasploit_module` N times with the given concurrency and reports throughput and latency
+percentiles. Example:
+    python -m benchmarks.msf_load_test --concurrency 16 --calls 200 --chunk-delay 0.05 --poll-interval 0.1
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from utils.msf.fake_msfrpcd import FakeModuleScript, FakeMsfRpcScenario, FakeMsfRpcServer
+
+MODULE_CATEGORY = 'auxiliary'
+MODULE_NAME = 'scanner/portscan/tcp'
+MODULE_ARGS = {'RHOSTS': '10.10.11.23', 'PORTS': '1-1024'}
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_load_test(concurrency: int, calls: int, scenario: Optional[FakeMsfRpcScenario] = None,
+                  poll_interval: Optional[float] = None) -> Dict[str, float]:
+    """
+    Start the fake msfrpcd, point the MSF client at it and execute the module `calls` times.
+
+    :param concurrency: Number of concurrent callers
+    :param calls: Total number of module executions
+    :param scenario: Behaviour of the fake server
+    :param poll_interval: Override of CONSOLE_POLL_INTERVAL for the run
+    :return: Report with throughput (calls/s) and latency percentiles (seconds)
+    """
+    with FakeMsfRpcServer(scenario) as server:
+        os.environ.update({'PASSWORD': 'fake', 'HOST': server.address[0], 'PORT': str(server.address[1]),
+                           'SSL': 'false'})
+
+        # Imported after the environment is set: the RPC client is a singleton built on first use
+        from tools import msf_tools
+        if poll_interval is not None:
+            msf_tools.CONSOLE_POLL_INTERVAL = poll_interval
+
+        def timed_call(_) -> float:
+            start_time = time.perf_counter()
+            msf_tools._execute_metasploit_module(MODULE_CATEGORY, MODULE_NAME, dict(MODULE_ARGS))
+            return time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_call, range(calls)))
+        elapsed = time.perf_counter() - start_time
+
+        rpc_calls = sum(server.state.calls.values())
+
+    return {
+        'calls': calls,
+        'concurrency': concurrency,
+        'elapsed_s': elapsed,
+        'throughput_per_s': calls / elapsed,
+        'p50_s': percentile(latencies, 50),
+        'p99_s': percentile(latencies, 99),
+        'max_s': max(latencies),
+        'rpc_calls': rpc_calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test _execute_metasploit_module against a fake msfrpcd.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--calls', type=int, default=64)
+    parser.add_argument('--rpc-latency', type=float, default=0.0, help='seconds added to every RPC call')
+    parser.add_argument('--chunk-delay', type=float, default=0.1, help='seconds between output chunks')
+    parser.add_argument('--poll-interval', type=float, default=None, help='override CONSOLE_POLL_INTERVAL')
+    parser.add_argument('--scenario', default=None, help='YAML/JSON scenario file for the fake server')
+    args = parser.parse_args()
+
+    if args.scenario:
+        scenario = FakeMsfRpcScenario.from_file(args.scenario)
+    else:
+        scenario = FakeMsfRpcScenario(rpc_latency=args.rpc_latency,
+                                      default=FakeModuleScript(chunk_delay=args.chunk_delay))
+
+    report = run_load_test(args.concurrency, args.calls, scenario, args.poll_interval)
+    for key, value in report.items():
+        print(f'{key:>18}: {value:.4f}' if isinstance(value, float) else f'{key:>18}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark of the graph routers on long agent messages.
+
+Compares the RouteMatcher of every router with the re.findall scans the routers used before (one regex scan per
+label, in precedence order) and with a single scan of one compiled alternation of all labels, on messages of
+growing size with the label at the beginning, at the end, or missing (the worst case of all three).
+Example:
+    python -m benchmarks.router_benchmark
+    python -m benchmarks.router_benchmark --sizes 10000 1000000 --repeat 20
+"""
+import argparse
+import re
+import statistics
+import timeit
+from typing import Callable, Dict, List, Optional
+
+import constants
+from graph_entities.routers import CHOOSER_NODE_MATCHER, HEADER_NODE_MATCHER, RouteMatcher
+
+FILLER = 'Port 22/tcp is open, the service is OpenSSH 8.9p1 Ubuntu 3ubuntu0.10 (Ubuntu Linux; protocol 2.0). '
+
+ROUTERS: Dict[str, RouteMatcher] = {
+    'header': HEADER_NODE_MATCHER,
+    'chooser': CHOOSER_NODE_MATCHER,
+}
+# router -> label written into the message
+LABELS = {
+    'header': f'**{constants.ARGS_AGENT}**',
+    'chooser': constants.TESTER_AGENT,
+}
+
+
+def findall_router(matcher: RouteMatcher) -> Callable[[str], Optional[str]]:
+    """The previous routing: one re.findall scan per label, highest priority first."""
+    patterns = [(re.compile(re.escape(label)), route) for label, route in matcher.routes]
+
+    def match(text: str) -> Optional[str]:
+        for pattern, route in patterns:
+            if re.findall(pattern, text):
+                return route
+        return None
+
+    return match
+
+
+def alternation_router(matcher: RouteMatcher) -> Callable[[str], Optional[str]]:
+    """One scan of a compiled alternation with a group per label; the highest-priority match found wins."""
+    pattern = re.compile('|'.join(f'({re.escape(label)})' for label, _ in matcher.routes))
+    routes = [route for _, route in matcher.routes]
+
+    def match(text: str) -> Optional[str]:
+        best = None
+        for found in pattern.finditer(text):
+            if best is None or found.lastindex - 1 < best:
+                best = found.lastindex - 1
+                if best == 0:
+                    break
+        return None if best is None else routes[best]
+
+    return match
+
+
+def build_message(size: int, label: str, position: str) -> str:
+    body = (FILLER * (size // len(FILLER) + 1))[:size]
+    if position == 'start':
+        return f'{label} {body}'
+    if position == 'end':
+        return f'{body} {label}'
+    return body
+
+
+def measure(func, repeat: int) -> float:
+    """Median seconds of one call."""
+    number = 5
+    return statistics.median(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def run_benchmark(sizes: List[int], repeat: int) -> List[Dict[str, object]]:
+    rows = []
+    for router, matcher in ROUTERS.items():
+        for size in sizes:
+            for position in ('start', 'end', 'missing'):
+                text = build_message(size, LABELS[router], position)
+                timings = {}
+                for name, match in (('findall', findall_router(matcher)), ('alternation', alternation_router(matcher)),
+                                    ('matcher', matcher.match)):
+                    if match(text) != matcher.match(text):
+                        raise AssertionError(f'{router}: {name} disagrees with the matcher on {position}')
+                    timings[name] = measure(lambda: match(text), repeat)
+                rows.append({'router': router, 'size': size, 'label': position, 'route': matcher.match(text),
+                             **{f'{name}_us': seconds * 1_000_000 for name, seconds in timings.items()},
+                             'speedup': timings['findall'] / timings['matcher']})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare the route matchers with regex-based routing.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                        help='message sizes in characters')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'router':>8} {'size':>9} {'label':>8} {'route':>12} {'findall us':>11} {'alternation us':>15} "
+          f"{'matcher us':>11} {'speedup':>8}")
+    for row in run_benchmark(args.sizes, args.repeat):
+        print(f"{row['router']:>8} {row['size']:>9} {row['label']:>8} {str(row['route']):>12} "
+              f"{row['findall_us']:>11.1f} {row['alternation_us']:>15.1f} {row['matcher_us']:>11.1f} "
+              f"{row['speedup']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -34,6 +34,37 @@ EXECUTION_COMPLETION_PHRASES = [
     '[-] Unknown command:'
 ]
 TIMEOUT = 600  # 10 minutes
+CONSOLE_POLL_INTERVAL = 1  # seconds between console.read calls
+
+# msf result cache
+RESULT_CACHE_ENABLED: bool = True
+BYPASS_CACHE_KEY = 'bypass_cache'
+RESULT_CACHE_DEFAULT_TTL = 300  # 5 minutes
+# TTL in seconds per module class, the longest matching prefix wins; 0 disables caching
+RESULT_CACHE_TTL = {
+    'auxiliary/scanner': 900,
+    'auxiliary/gather': 900,
+    'auxiliary/admin': 0,
+    'auxiliary/dos': 0,
+    'exploit': 0,
+    'post': 0,
+    'nmap': 900,
+}
+
+# nmap_tools.py constant
+NMAP_SHARD_SIZE = 16  # hosts per nmap process
+NMAP_MAX_WORKERS = 8  # parallel nmap processes
+NMAP_HOST_TIMEOUT = 300  # seconds per host (--host-timeout)
+NMAP_SCAN_TIMEOUT = TIMEOUT  # seconds per shard
+NMAP_RENDER_TOKEN_BUDGET = 1500  # tokens of a scan result shown to the LLM
+NMAP_CACHE_MODULE = 'nmap'  # module name of nmap scans in the result cache
+
+# speculative reconnaissance: a host run starts an nmap scan of the targets of its task in the background;
+# the default profile matches the nmap tool's defaults, so the tester's first scan is served from the result cache
+RECON_ENABLED: bool = True
+RECON_NMAP_PROFILE = {'ports': None, 'arguments': '-sV'}
+RECON_MAX_WORKERS = 4
+RECON_MAX_TARGETS = 8  # targets of a task scanned speculatively
 
 # importing_msfinfo_database.py
 DELETE_UNTIL = '#     Name'
@@ -41,12 +72,92 @@ DELETE_UNTIL = '#     Name'
 # some flag
 MOCK: bool = False
 MOCK_MSF_TOOLS: bool = False
+# render compiled graphs to PNG and open them (disabled by benchmarks)
+DRAW_GRAPHS: bool = True
+
+# tool outputs: above its token budget a tool output is reduced with the strategy ('truncate', 'compress',
+# 'summarize' or 'passthrough') and the raw output is stored in the results DB ('store') under an id
+TOOL_OUTPUT_DEFAULT_POLICY = {'budget': 4000, 'strategy': 'truncate', 'store': True}
+TOOL_OUTPUT_POLICIES = {
+    'tool_based_on_metasploit': {'budget': 2500, 'strategy': 'truncate'},
+    'tool_based_on_nmap': {'budget': 2000, 'strategy': 'truncate'},
+    'get_msf_exact_sub_group_modules_list': {'budget': 4000, 'strategy': 'truncate'},
+    'get_msf_modules_for_sub_groups': {'budget': 6000, 'strategy': 'truncate'},
+    'get_tool_output': {'budget': 4000, 'strategy': 'truncate', 'store': False},
+}
+TOOL_OUTPUT_HEAD_RATIO = 0.7  # share of the budget kept from the beginning of a truncated output
+TOOL_OUTPUT_SUMMARY_MODEL = 'gpt-4o-mini'
+TOOL_OUTPUT_SUMMARY_INPUT_BUDGET = 16000  # larger outputs are truncated before they are summarized
+
+# record/replay of external tools: None, 'record' or 'replay' (the RECORD_REPLAY_MODE env variable overrides it)
+RECORD_REPLAY_MODE: str | None = None
+RECORD_REPLAY_STORE = 'resources/replay/tools_replay.db'
+REPLAY_SIMULATE_LATENCY: bool = False
+REPLAY_LATENCY_FACTOR: float = 1.0
+
+# instrumentation: timings and token usage, exported at the end of the outermost graph execution
+INSTRUMENTATION_ENABLED: bool = True
+INSTRUMENTATION_EXPORT_DIR: str | None = 'resources/metrics'
+
+# provider-side prompt caching: the static system prefix of Anthropic prompts is marked with cache_control
+PROMPT_CACHE_ENABLED: bool = True
+
+# tool calls of one message that may run concurrently (read-only lookups); the others run one by one
+CONCURRENT_TOOLS = {
+    'get_msf_exact_sub_group_modules_list',
+    'get_msf_modules_for_sub_groups',
+    'get_msf_module_options',
+    'get_nmap_open_ports',
+    'get_tool_output',
+}
+TOOL_EXECUTOR_MAX_WORKERS = 8
+
+# cross-run cache of the planner team's output, keyed by task, target ports and module catalog version
+PLAN_CACHE_ENABLED: bool = True
+PLAN_CACHE_STORE = 'resources/cache/plan_cache.db'
+PLAN_CACHE_TTL = 7 * 24 * 3600  # 1 week
+
+# routing: the chooser node routes messages naming exactly one option locally and asks its LLM only otherwise
+ROUTER_FAST_PATH_ENABLED: bool = True
 
 # database
 TABLE_NAME: str | None = None
+RESULTS_DB_URL = 'sqlite:///my_sqlite.db'
+MSF_CATALOG_DB = 'metasploit_data.db'
+# the catalog is opened read-only and immutable (memory-mapped, no locks, no journal); re-imports need a restart
+MSF_CATALOG_READ_ONLY: bool = True
+# the catalog tools read an mmap'd snapshot of the catalog, exported again when the catalog DB changes
+CATALOG_SNAPSHOT_ENABLED: bool = True
+CATALOG_SNAPSHOT_PATH = 'resources/cache/msf_catalog.snapshot'
+# long-lived connections of dao.sqlite.msf_sqlite.MsfSqliteDAO
+SQLITE_CACHE_SIZE_KB = 16384  # page cache per connection
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the DB file read through a memory map
+SQLITE_STATEMENT_CACHE = 256  # prepared statements kept per connection
+# background writer of the results DB: rows are committed in groups by size or time through a WAL connection
+RESULT_WRITER_ENABLED: bool = True
+RESULT_WRITER_QUEUE_SIZE = 1000  # queued rows; when full, writers wait up to RESULT_WRITER_PUT_TIMEOUT seconds
+RESULT_WRITER_BATCH_SIZE = 200  # rows per commit
+RESULT_WRITER_FLUSH_INTERVAL = 0.5  # seconds a commit waits for more rows
+RESULT_WRITER_PUT_TIMEOUT = 5.0
+# stored outputs (MSF console, raw tool outputs) of at least BLOB_COMPRESSION_MIN_SIZE characters are compressed with
+# BLOB_CODEC ('zstd' if the zstandard package is installed, otherwise 'zlib') and, with BLOB_DEDUP_ENABLED, stored
+# once per content in the blobs table
+BLOB_COMPRESSION_MIN_SIZE = 1024
+BLOB_CODEC = 'zstd'
+BLOB_COMPRESSION_LEVEL = 6
+BLOB_DEDUP_ENABLED: bool = True
+# retention of the results DB and the state snapshots, see utils.dao.compaction (python -m utils.dao.compaction)
+COMPACTION_MAX_AGE_DAYS = 30  # older results and snapshots are deleted
+COMPACTION_FOLD_AFTER_DAYS = 7  # older console results keep only their compressed output, snapshots are gzipped
+COMPACTION_MAX_DB_SIZE_MB: float | None = None
+COMPACTION_MAX_SNAPSHOTS_SIZE_MB: float | None = None
+COMPACTION_KEEP_HOSTS: list = []  # hosts of active engagements, never compacted
+COMPACTION_BATCH_ROWS = 500  # rows per compaction transaction
+COMPACTION_VACUUM_PAGES = 1000  # pages released per incremental vacuum step
 
 # file path
 MESSAGE_FOLDER = 'messages'
+STATES_FOLDER = 'resources/states'
 
 # end key
 FINAL_ANSWER = "FINAL ANSWER"
@@ -59,6 +170,7 @@ TESTER_AGENT = 'Tester Team'
 HOST_NODE = 'host_node'
 HOST_AGENT = 'host_agent'
 CHOOSER_NODE = 'chooser_node'
+RECON_NODE = 'recon_node'
 PLANNER_TEAM = 'planner_team'
 PLANNER_NODE = 'planner_node'
 TESTER_TEAM = 'tester_team'
@@ -122,13 +234,16 @@ MESSAGES_FIELD = "messages"
 SENDER_FIELD = "sender"
 PLAN_FIELD = "plan"
 RESULT_FIELD = "result"
+RESULTS_FIELD = "results"
 GROUPS_FIELD = "sub_groups"
 MODULES_FIELD = "modules"
 VALIDATOR_FIELD = "validator_feedback"
 CHOOSER_FIELD = "chooser_decision"
+RECON_FIELD = "recon"
 # for PlanningTeamState
 TASK_FINISHED = 'The task was finished!'
 
+RESULT_SAVED_MESSAGE = f'{TASK_FINISHED} The testing result was saved in "{RESULTS_FIELD}" field in a state.'
 PLAN_SAVED_MESSAGE = f'{TASK_FINISHED} The current plan was saved in "{PLAN_FIELD}" field in a state.'
 MODULES_SAVED_MESSAGE = f'{TASK_FINISHED} The relevant modules were saved in "{MODULES_FIELD}" field in a state.'
 GROUPS_SAVED_MESSAGE = f'{TASK_FINISHED} The relevant sub-groups were saved in "{GROUPS_FIELD}" field in a state.'
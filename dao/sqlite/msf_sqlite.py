@@ -1,7 +1,97 @@
+import logging
 import re
 import sqlite3
 import sqlite3 as sqlite
-from typing import List, Dict
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import constants
+from utils.dao.blob_store import ENCODING_COLUMN, LazyText, load_text
+from utils.dao.result_writer import sqlite_path
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCatalog:
+    """
+    Cached table names and lower-cased column sets of a DB.
+
+    The cache is valid while PRAGMA schema_version (incremented by SQLite on every schema change, whichever
+    connection made it) is unchanged: a lookup reads that one header field instead of one PRAGMA table_info per
+    table, and the whole catalog is dropped as soon as a table is created, altered or dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._tables: Optional[List[str]] = None
+        self._columns: Dict[str, FrozenSet[str]] = {}
+        self._filtered: Dict[FrozenSet[str], List[str]] = {}
+
+    def tables(self, connection: sqlite3.Connection) -> List[str]:
+        """Names of the tables, excluding SQLite internal tables."""
+        with self._lock:
+            self._validate(connection)
+            return list(self._all_tables(connection))
+
+    def columns(self, connection: sqlite3.Connection, table_name: str) -> FrozenSet[str]:
+        """Lower-cased column names of a table (empty if it does not exist)."""
+        with self._lock:
+            self._validate(connection)
+            return self._table_columns(connection, table_name)
+
+    def filtered_tables(self, connection: sqlite3.Connection, required_fields: Iterable[str]) -> List[str]:
+        """Names of the tables having all the required fields."""
+        required = frozenset(field.lower() for field in required_fields)
+        with self._lock:
+            self._validate(connection)
+            tables = self._filtered.get(required)
+            if tables is None:
+                tables = [table for table in self._all_tables(connection)
+                          if required <= self._table_columns(connection, table)]
+                self._filtered[required] = tables
+            return list(tables)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+    def _validate(self, connection: sqlite3.Connection) -> None:
+        version = connection.execute('PRAGMA schema_version').fetchone()[0]
+        if version != self._version:
+            self._version = version
+            self._tables = None
+            self._columns = {}
+            self._filtered = {}
+
+    def _all_tables(self, connection: sqlite3.Connection) -> List[str]:
+        if self._tables is None:
+            self._tables = _read_tables(connection)
+        return self._tables
+
+    def _table_columns(self, connection: sqlite3.Connection, table_name: str) -> FrozenSet[str]:
+        columns = self._columns.get(table_name)
+        if columns is None:
+            rows = connection.execute(f"PRAGMA table_info({table_name})").fetchall()
+            columns = self._columns[table_name] = frozenset(row[1].lower() for row in rows)
+        return columns
+
+
+# DB file -> catalog shared by the connections to that file
+_catalogs: Dict[str, SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def schema_catalog(db_connection) -> SchemaCatalog:
+    """
+    The schema catalog of the DB of a connection; an in-memory DB gets a new catalog, as its connections don't
+    share the DB.
+    """
+    db_file = next((row[2] for row in db_connection.execute('PRAGMA database_list') if row[1] == 'main'), '')
+    if not db_file:
+        return SchemaCatalog()
+    with _catalogs_lock:
+        return _catalogs.setdefault(db_file, SchemaCatalog())
 
 
 def create_connection(db_file="my_sqlite.db"):
@@ -77,11 +167,7 @@ def insert_data(conn, table_name: str, table_values: Dict[str, str], logger) ->
         bool: True if the insertion was successful, False otherwise.
     """
     # Validate that table fields match the keys in table_values
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name});")
-    table_info = cursor.fetchall()
-
-    table_columns = {column[1].lower() for column in table_info}
+    table_columns = schema_catalog(conn).columns(conn, table_name)
     value_columns = {key.lower() for key in table_values.keys()}
 
     if not value_columns.issubset(table_columns):
@@ -260,6 +346,10 @@ def get_all_tables(db_connection) -> List[str]:
     Returns:
         List[str]: A list of table names.
     """
+    return schema_catalog(db_connection).tables(db_connection)
+
+
+def _read_tables(db_connection) -> List[str]:
     cursor = db_connection.cursor()
     query = """
     SELECT name 
@@ -283,11 +373,8 @@ def table_has_required_fields(db_connection, table_name: str, required_fields: L
     Returns:
         bool: True if the table has all the required fields, False otherwise.
     """
-    cursor = db_connection.cursor()
-    query = f"PRAGMA table_info({table_name})"
-    cursor.execute(query)
-    columns = [row[1] for row in cursor.fetchall()]
-    return all(field in columns for field in required_fields)
+    columns = schema_catalog(db_connection).columns(db_connection, table_name)
+    return all(field.lower() in columns for field in required_fields)
 
 
 def get_filtered_tables(db_connection, required_fields: List[str]) -> List[str]:
@@ -301,12 +388,8 @@ def get_filtered_tables(db_connection, required_fields: List[str]) -> List[str]:
     Returns:
         List[str]: A list of table names that have all the required fields.
     """
-    tables = get_all_tables(db_connection)
-    filtered_tables = []
-    for table in tables:
-        if table_has_required_fields(db_connection, table, required_fields):
-            filtered_tables.append(table)
-    return filtered_tables
+    # The columns of the tables are cached until the schema changes (see SchemaCatalog)
+    return schema_catalog(db_connection).filtered_tables(db_connection, required_fields)
 
 
 
@@ -381,3 +464,164 @@ def check_existing_record(db_connection, module: str, rhosts: str) -> str | None
 
     return chose_heavy_weight_result(results) if results else None
 
+
+class MsfSqliteDAO:
+    """
+    Access object of a results DB owning one long-lived connection, shared by all threads (one DAO per file).
+
+    The connection is opened in WAL mode with SQLITE_CACHE_SIZE_KB of page cache and SQLITE_MMAP_SIZE bytes of
+    memory-mapped I/O. Every query of a table is built once and executed through the sqlite3 statement cache
+    (SQLITE_STATEMENT_CACHE statements), so repeated lookups are not prepared again, and the columns of the tables
+    are kept in a SchemaCatalog instead of being read with PRAGMA table_info before every insert or lookup. Calls
+    are serialized by a lock, so the DAO can be used from the tool threads.
+    """
+    _instances: Dict[str, 'MsfSqliteDAO'] = {}
+    _lock = threading.Lock()  # Lock for thread-safe initialization
+
+    def __new__(cls, db_file: Optional[str] = None):
+        db_file = db_file or sqlite_path(constants.RESULTS_DB_URL)
+        with cls._lock:
+            if db_file not in cls._instances:
+                instance = super(MsfSqliteDAO, cls).__new__(cls)
+                instance.db_file = db_file
+                instance._connection = None
+                instance._connection_lock = threading.RLock()
+                instance._catalog = SchemaCatalog()
+                instance._queries = {}  # (kind, table, columns) -> SQL text
+                cls._instances[db_file] = instance
+            return cls._instances[db_file]
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.db_file, check_same_thread=False, timeout=30,
+                                         cached_statements=constants.SQLITE_STATEMENT_CACHE)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA cache_size=-{int(constants.SQLITE_CACHE_SIZE_KB)}')
+            connection.execute(f'PRAGMA mmap_size={int(constants.SQLITE_MMAP_SIZE)}')
+            self._connection = connection
+        return self._connection
+
+    def close(self) -> None:
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._catalog.invalidate()
+
+    def create_table(self, table_name: str, table_fields: dict[str, list[str]] = None) -> bool:
+        """Create a table if it does not exist, see create_table."""
+        with self._connection_lock:
+            return create_table(self.connection, table_name, table_fields)
+
+    def table_columns(self, table_name: str) -> FrozenSet[str]:
+        """Lower-cased column names of a table (empty if it does not exist)."""
+        with self._connection_lock:
+            return self._catalog.columns(self.connection, table_name)
+
+    def insert(self, table_name: str, table_values: Dict[str, Any]) -> bool:
+        """Insert a row, see insert_data."""
+        return self.insert_many(table_name, [table_values]) == 1
+
+    def insert_many(self, table_name: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert rows with one statement and one commit; the rows are grouped by their set of columns.
+
+        :param table_name: Name of the table
+        :param rows: Dictionaries of column names and values
+        :return: Number of inserted rows (0 if a column is missing in the table or the insert failed)
+        """
+        grouped: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            columns = tuple(key.lower() for key in row)
+            grouped.setdefault(columns, []).append(tuple(row.values()))
+        if not grouped:
+            return 0
+
+        with self._connection_lock:
+            table_columns = self.table_columns(table_name)
+            for columns in grouped:
+                missing_columns = set(columns) - table_columns
+                if missing_columns:
+                    logger.error(f"The following columns are missing in the table {table_name}: {missing_columns}")
+                    return 0
+            try:
+                with self.connection:
+                    for columns, values in grouped.items():
+                        self.connection.executemany(self._insert_query(table_name, columns), values)
+            except sqlite3.Error as e:
+                logger.error(f"Error inserting data into table {table_name}: {e}")
+                return 0
+        return sum(len(values) for values in grouped.values())
+
+    def get_result_by_uuid(self, table_name: str, uuid: str) -> str:
+        """Result of a UUID, or an empty string, see get_result_by_uuid."""
+        with self._connection_lock:
+            return get_result_by_uuid(self.connection, table_name, uuid)
+
+    def get_uuid_by_status(self, table_name: str, status: str = "running") -> list:
+        """UUIDs with the given status, see get_uuid_by_status."""
+        with self._connection_lock:
+            return get_uuid_by_status(self.connection, table_name, status)
+
+    def get_results_by_table_name(self, table_name: str) -> list:
+        """Completed results of a table, see get_results_by_table_name."""
+        with self._connection_lock:
+            return get_results_by_table_name(self.connection, table_name)
+
+    def set_status_by_uuid(self, table_name: str, uuid: str, status: str) -> bool:
+        with self._connection_lock:
+            return set_status_by_uuid(self.connection, table_name, uuid, status)
+
+    def set_result_by_uuid(self, table_name: str, uuid: str, result: Any) -> bool:
+        with self._connection_lock:
+            return set_result_by_uuid(self.connection, table_name, uuid, result)
+
+    def get_filtered_tables(self, required_fields: List[str]) -> List[str]:
+        """Tables having all the required fields, checked against the cached columns."""
+        with self._connection_lock:
+            return self._catalog.filtered_tables(self.connection, required_fields)
+
+    def check_existing_record(self, module: str, rhosts: str) -> tuple | None:
+        """
+        Heaviest (output, compressed_output) recorded for the module and rhosts in any table, see
+        check_existing_record; the compressed output (utils.dao.blob_store) of the returned record only is decoded.
+        """
+        required_fields = ['module', 'rhosts', 'output', 'compressed_output']
+        results = {}
+        with self._connection_lock:
+            encoded_tables = set(self.get_filtered_tables([*required_fields, ENCODING_COLUMN]))
+            for table_name in self.get_filtered_tables(required_fields):
+                record = self.connection.execute(
+                    self._select_record_query(table_name, table_name in encoded_tables), (module, rhosts)
+                ).fetchone()
+                if record:
+                    output = LazyText(lambda value=record[0], encoding=record[2]:
+                                      load_text(value, encoding, self._load_blob))
+                    add_to_results(results, table_name, (output, record[1]))
+
+            heaviest = chose_heavy_weight_result(results) if results else None
+            return (heaviest[0].text, heaviest[1]) if heaviest else None
+
+    def _insert_query(self, table_name: str, columns: tuple) -> str:
+        key = ('insert', table_name, columns)
+        query = self._queries.get(key)
+        if query is None:
+            quoted_columns = ', '.join(f'"{column}"' for column in columns)
+            query = f"INSERT INTO {table_name} ({quoted_columns}) VALUES ({', '.join('?' * len(columns))})"
+            self._queries[key] = query
+        return query
+
+    def _select_record_query(self, table_name: str, encoded: bool) -> str:
+        encoding = ENCODING_COLUMN if encoded else 'NULL'
+        key = ('record', table_name, encoding)
+        query = self._queries.get(key)
+        if query is None:
+            query = (f"SELECT output, compressed_output, {encoding} FROM {table_name} "
+                     f"WHERE module = ? AND rhosts = ?")
+            self._queries[key] = query
+        return query
+
+    def _load_blob(self, sha256: str) -> Optional[tuple]:
+        return self.connection.execute("SELECT encoding, data FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
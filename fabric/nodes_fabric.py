@@ -1,9 +1,14 @@
+from __future__ import annotations
+
 from functools import partial
-from typing import Callable, Union, Optional, Dict, List
-from langchain_community.chat_models import ChatOpenAI, ChatAnthropic
+from typing import TYPE_CHECKING, Callable, Union, Optional, Dict, List
 
 from utils.orm_util import create_message_from_file
 
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
 
 class NodesFabric:
     def __init__(self, model_llm: Optional[Union[ChatOpenAI, ChatAnthropic, Callable]]):
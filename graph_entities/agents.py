@@ -1,14 +1,18 @@
-from typing import Any, Callable
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable
 
-from langchain_anthropic import ChatAnthropic
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
-from langchain_openai import ChatOpenAI
-from langchain.agents import create_structured_chat_agent
 
+from utils.llm import supports_cache_control
 from utils.orm_util import *
+from utils.prompt_registry import DEFAULT_PROMPT_KEY, PromptRegistry
 from graph_entities.statets import *
 
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
 
 def assistant_agent_with_tools(
         model_llm: ChatOpenAI | ChatAnthropic,
@@ -26,16 +30,11 @@ def assistant_agent_with_tools(
         A configured prompt bound with the model and tools.
     """
     # Load the default template message for the system
-    default_msg = create_message_from_file('default_without_tools.txt')
+    default_msg = create_message_from_file(DEFAULT_PROMPT_KEY)
 
     # Define the prompt template using the system message and placeholder for dynamic messages
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", default_msg),
-            ("system", system_message),
-            (MessagesPlaceholder(variable_name="messages"))
-        ]
-    )
+    prompt = PromptRegistry().chat_template(default_msg, system_message,
+                                            cache_control=supports_cache_control(model_llm))
 
     # Bind the tools to the model and return the configured prompt
     return prompt | model_llm.bind_tools(all_tools)
@@ -58,7 +57,7 @@ def assistant_agent_without_tools(
         A prompt configured with the model and system message.
     """
     # Load the default template message for the system
-    default_msg = create_message_from_file('default_without_tools.txt')
+    default_msg = create_message_from_file(DEFAULT_PROMPT_KEY)
 
     # Validate system_message input
     if not system_message or not isinstance(system_message, str):
@@ -73,16 +72,10 @@ def assistant_agent_without_tools(
     else:
         tools_descriptions = "No tools available."
 
-    # Define the prompt template with system message and tools description
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", default_msg),
-            ("system", system_message),
-            (MessagesPlaceholder(variable_name="messages"))
-        ]
-    )
-
-    prompt = prompt.partial(tools_descriptions=tools_descriptions)
+    # Define the prompt template with system message and tools description; both are rendered into a static prefix
+    prompt = PromptRegistry().chat_template(default_msg, system_message,
+                                            cache_control=supports_cache_control(model_llm),
+                                            tools_descriptions=tools_descriptions)
 
     # Bind the prompt to the model and return it
     return prompt | model_llm
@@ -117,20 +110,15 @@ def assistant_agent_with_constructed_output(
     """
 
     # Load the default template message for agents without tools
-    default_without_tools = create_message_from_file('default_without_tools.txt')
+    default_without_tools = create_message_from_file(DEFAULT_PROMPT_KEY)
 
     # Validate system_message input
     if not system_message or not isinstance(system_message, str):
         raise ValueError("Invalid system message. It must be a non-empty string.")
 
     # Define the prompt template using the system message and placeholder for dynamic messages
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", default_without_tools),
-            ("system", system_message),
-            (MessagesPlaceholder(variable_name="messages"))
-        ]
-    )
+    prompt = PromptRegistry().chat_template(default_without_tools, system_message,
+                                            cache_control=supports_cache_control(model_llm))
 
     # Bind the structured output (TeamState) and return the configured prompt
     return prompt | model_llm.with_structured_output(
@@ -160,19 +148,14 @@ def assistant_agent_with_constructed_output_bind_tools(
     """
 
     # Load the default template message for agents without tools
-    default_msg = create_message_from_file('default_without_tools.txt')
+    default_msg = create_message_from_file(DEFAULT_PROMPT_KEY)
 
     # Validate system_message input
     if not system_message or not isinstance(system_message, str):
         raise ValueError("Invalid system message. It must be a non-empty string.")
 
     # Define the prompt template using the system message and placeholder for dynamic messages
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", default_msg),
-            (MessagesPlaceholder(variable_name="messages"))
-        ]
-    )
+    prompt = PromptRegistry().chat_template(default_msg, cache_control=supports_cache_control(model_llm))
 
     # Add specialization to the current agent using the system message and teams (if provided)
     prompt = prompt.partial(system_message=system_message, teams=teams)
@@ -182,6 +165,9 @@ def assistant_agent_with_constructed_output_bind_tools(
 
     # If tools are provided, initialize an agent that can use them
     if tools:
+        # langchain.agents loads the whole chains package, so it is imported only for this agent type
+        from langchain.agents import create_structured_chat_agent
+
         agent = create_structured_chat_agent(
             llm=llm_chain,
             tools=tools,
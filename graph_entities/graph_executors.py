@@ -4,6 +4,8 @@ import traceback
 from typing import Optional, Dict
 from langgraph.graph.state import CompiledStateGraph, StateGraph
 from utils.common_utils import generate_unique_id, save_and_open_graph
+from utils.dao.result_writer import ResultWriter
+from utils.instrumentation import Instrumentation
 
 
 def execute_graph(
@@ -11,6 +13,27 @@ def execute_graph(
         full_task_message: Dict,
         thread_id: int = random.randint(0, 100000)
 ):
+    instrumentation = Instrumentation()
+    instrumentation.begin_run()
+    try:
+        return _execute_graph(graph, full_task_message, thread_id)
+    finally:
+        # Sub-graphs are executed from inside nodes; metrics are exported once, after the outermost graph
+        if instrumentation.end_run():
+            # The results of the run are on disk when the outermost graph returns
+            ResultWriter().flush()
+            tokens = instrumentation.llm_token_summary()
+            if tokens['calls']:
+                print(f"LLM calls: {tokens['calls']}, prompt tokens: {tokens['prompt_tokens']} "
+                      f"(cached: {tokens['cached_tokens']}, written to cache: {tokens['cache_creation_tokens']}, "
+                      f"uncached: {tokens['uncached_tokens']}), completion tokens: {tokens['completion_tokens']}")
+            export_prefix = instrumentation.export()
+            if export_prefix:
+                print(f"Metrics exported to {export_prefix}.jsonl and {export_prefix}.prom")
+            instrumentation.reset()
+
+
+def _execute_graph(graph: StateGraph, full_task_message: Dict, thread_id: int) -> Optional[Dict]:
     config = {"configurable": {"thread_id": thread_id}}
 
     try:
@@ -1,4 +1,8 @@
+from __future__ import annotations
+
 import functools
+from typing import TYPE_CHECKING
+
 from langgraph.constants import START, END
 
 import utils.llm
@@ -10,8 +14,12 @@ from graph_entities.schemes import *
 from graph_entities.statets import *
 from tools.msf_tools import *
 
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
 
-MODULE_SELECTION_TOOLS = [get_msf_exact_sub_group_modules_list]
+MODULE_SELECTION_TOOLS = [get_msf_modules_for_sub_groups, get_msf_exact_sub_group_modules_list]
 
 
 def initializer_plan_composition_graph(
@@ -136,7 +144,7 @@ def create_msf_tools_team_graph(model_llm: Optional[Union[ChatOpenAI, ChatAnthro
     module_node = nodes_fabric.create_graph_node(
         agent_func=assistant_agent_with_tools,
         model_llm=gpt_4o_mini,
-        sys_msg_path='planning_team/module_selection_agent#1.txt',
+        sys_msg_path='planning_team/module_selection_agent#2.txt',
         node_func=create_ordinary_node,
         node_name=MODULE_SELECTION_NODE,
         tools=MODULE_SELECTION_TOOLS
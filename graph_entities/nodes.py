@@ -1,5 +1,8 @@
+import ast
 import random
-from typing import Sequence, Union, Callable, Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Sequence, Union, Callable, Dict, List, Optional
 
 from langchain.schema import HumanMessage, AIMessage
 from langchain_core.messages import ToolMessage, BaseMessage
@@ -10,14 +13,23 @@ from langgraph.prebuilt import ToolInvocation, ToolExecutor
 from constants import *
 from tools import get_msf_sub_groups_list
 from utils.common_utils import save_and_open_graph
+from utils.instrumentation import Instrumentation, instrument_node
+from utils.nmap.recon import ReconPrefetch
+from utils.msf.catalog_snapshot import catalog_version
+from utils.plan_cache import PlanCache, normalize_task, target_profile
+from utils.tool_output import process_tool_output
 from graph_entities.graph_executors import execute_graph
+from graph_entities.routers import match_chooser_option
 from graph_entities.statets import TeamState, PlanningTeamState
 
 
+@instrument_node(EXECUTOR_NODE)
 def create_tool_node(
         state: Union[PlanningTeamState, TeamState],
         tools: Sequence[Union[BaseTool, Callable]]
 ) -> Dict[str, List[ToolMessage]]:
+    instrumentation = Instrumentation()
+    node_start = time.perf_counter()
     messages = state.messages
 
     # Based on the continue condition
@@ -25,26 +37,42 @@ def create_tool_node(
     last_message = messages[-1]
     # We construct an ToolInvocation from the function_call
     tool_calls = last_message.tool_calls
-    tool_messages = []
-    for tool_call in tool_calls:
+    tool_executor = ToolExecutor(tools)
+
+    def run_tool_call(tool_call: Dict) -> ToolMessage:
         action = ToolInvocation(
             tool=tool_call["name"],
             tool_input=tool_call["args"]
         )
-        tool_executor = ToolExecutor(tools)
+        # Time spent behind the previous tool calls of this message
+        instrumentation.record('queue_wait', action.tool, duration=time.perf_counter() - node_start)
         # We call the tool_executor and get back a response
-        response = tool_executor.invoke(action)
-        # We use the response to create a ToolMessage
-        tool_message = ToolMessage(
-            content=str(response),
+        with instrumentation.span('tool', action.tool):
+            response = tool_executor.invoke(action)
+        # We use the response to create a ToolMessage, fitted into the tool's token budget
+        return ToolMessage(
+            content=process_tool_output(action.tool, response),
             name=action.tool,
-            tool_call_id=tool_call["id"]
+            tool_call_id=tool_call["id"],
+            # The typed response travels next to the (possibly reduced) text, see extract_results
+            artifact=response if isinstance(response, (list, tuple, dict)) else None
         )
-        tool_messages.append(tool_message)
+
+    # Independent read-only calls (catalog lookups, stored outputs) run concurrently, the others one by one;
+    # the messages keep the order of the tool calls
+    concurrent_calls = [call for call in tool_calls if call["name"] in CONCURRENT_TOOLS]
+    if len(concurrent_calls) < 2:
+        tool_messages = [run_tool_call(tool_call) for tool_call in tool_calls]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(concurrent_calls), TOOL_EXECUTOR_MAX_WORKERS)) as pool:
+            futures = {id(tool_call): pool.submit(run_tool_call, tool_call) for tool_call in concurrent_calls}
+            tool_messages = [futures[id(tool_call)].result() if id(tool_call) in futures else run_tool_call(tool_call)
+                             for tool_call in tool_calls]
     # We return a list, because this will get added to the existing list
     return {MESSAGES_FIELD: tool_messages, SENDER_FIELD: [EXECUTOR_NODE]}
 
 
+@instrument_node()
 def create_ordinary_node(state: Union[TeamState, PlanningTeamState], agent, name: str):
     """
     Creates a standard node by invoking an agent with the current state and returning the updated state.
@@ -64,12 +92,12 @@ def create_ordinary_node(state: Union[TeamState, PlanningTeamState], agent, name
         messages = [AIMessage(content=f'Feedback:\n{state.validator_feedback}')]
 
     if name is PLAN_COMPOSITION_NODE and state.modules:
-        messages.append(AIMessage(content=f'The list of metasploit modules: {state.modules}!'))
+        messages = [*messages, AIMessage(content=f'The list of metasploit modules: {state.modules}!')]
     if name is CHOOSER_NODE:
         messages = [state.messages[-1]]
 
     # Invoke the agent with the current state
-    response = agent.invoke({'messages': messages})
+    response = Instrumentation().invoke_llm(agent, {'messages': messages}, name)
 
     # Return the updated state, which includes the new message and sender's name
     return {
@@ -78,6 +106,7 @@ def create_ordinary_node(state: Union[TeamState, PlanningTeamState], agent, name
     }
 
 
+@instrument_node()
 def create_extraction_node(state: PlanningTeamState, agent, name: str):
     """
     Creates a module extraction node based on the last message sender in the team's state.
@@ -98,11 +127,11 @@ def create_extraction_node(state: PlanningTeamState, agent, name: str):
 
     Raises:
         ValueError: If the last sender is not recognized as one of the expected nodes: MODULE_GROUP_SELECTION_NODE,
-                    MODULE_SELECTION_NODE, or PLAN_COMPOSITION_NODE.
+                    MODULE_SELECTION_NODE, PLAN_COMPOSITION_NODE or HEADER_NODE.
     """
 
     # Get the agent's response to the last message in the team's state
-    response: Dict[str, List[str]] = agent.invoke([state.messages[-1]])
+    response: Dict[str, List[str]] = Instrumentation().invoke_llm(agent, [state.messages[-1]], name)
     last_sender = state.sender[-1]  # Retrieve the last sender from the team's state
 
     # Check the last sender and update the appropriate fields based on its value
@@ -110,17 +139,25 @@ def create_extraction_node(state: PlanningTeamState, agent, name: str):
         output = {
             MESSAGES_FIELD: [AIMessage(content=PLAN_SAVED_MESSAGE)],
             SENDER_FIELD: [name],
-            PLAN_FIELD: [response.get(PLAN_FIELD)]
+            PLAN_FIELD: response.get(PLAN_FIELD)
+        }
+    elif last_sender is HEADER_NODE:
+        # The testing team finished: its result goes to the results of the host team
+        output = {
+            MESSAGES_FIELD: [AIMessage(content=RESULT_SAVED_MESSAGE)],
+            SENDER_FIELD: [name],
+            RESULTS_FIELD: state.results + [response.get(RESULT_FIELD)]
         }
     else:
         # Raise an error if the sender is not one of the expected nodes
         raise ValueError(f"Unexpected sender: '{last_sender}' in {name}. "
-                         f"Expected -> {PLAN_COMPOSITION_NODE}.")
+                         f"Expected -> {PLAN_COMPOSITION_NODE} or {HEADER_NODE}.")
 
     # Return the constructed output dictionary for updating the team's state
     return output
 
 
+@instrument_node()
 def connector_to_sub_graph_for_planning_team_node(state: PlanningTeamState, name: str, graph):
     compiled_graph: CompiledStateGraph = graph.compile()
 
@@ -219,6 +256,7 @@ def connector_to_sub_graph_for_planning_team_node(state: PlanningTeamState, name
     return output
 
 
+@instrument_node()
 def create_connector_sub_graph(state: PlanningTeamState, name: str, graph: StateGraph,
                                conditional_func: Callable = None):
     messages = state.messages
@@ -234,10 +272,40 @@ def create_connector_sub_graph(state: PlanningTeamState, name: str, graph: State
         if extra_data:
             full_task_message[MESSAGES_FIELD].append(AIMessage(content=extra_data))
 
+    # The plan-cache profile is taken before the reconnaissance is added: whether the background scan has finished
+    # must not change the key
+    profile_texts = [message.content for message in full_task_message[MESSAGES_FIELD]]
+
+    # The speculative reconnaissance is passed on as soon as it is finished, the teams never wait for it
+    recon = None
+    if name is PLANNER_TEAM or name is TESTER_TEAM:
+        recon = state.recon or ReconPrefetch().summary(messages[0].content)
+        if recon:
+            full_task_message[MESSAGES_FIELD].append(
+                AIMessage(content=f'Baseline reconnaissance of the targets (nmap):\n{recon}')
+            )
+
     if name is MODULE_SELECTION_TEAM:
         full_task_message[MESSAGES_FIELD].append(AIMessage(content=f"These are relevant groups: {state.sub_groups}! "
                                                                    f"Chose only the modules from them!"))
 
+    # A plan made before for the same task, ports and module catalog is reused without running the team. The key
+    # uses the human task only: the host agent's hand-off (task_for_team) is reworded on every run
+    plan_key = None
+    if name is PLANNER_TEAM and PLAN_CACHE_ENABLED:
+        task = normalize_task(messages[0].content)
+        profile = target_profile(profile_texts)
+        catalog = catalog_version()
+        plan_key = PlanCache.build_key(task, profile, catalog)
+        cached_output = PlanCache().get(plan_key)
+        if cached_output is not None:
+            Instrumentation().increment('plan_cache_hits_total', name=name)
+            cached_output[SENDER_FIELD] = [name]
+            if recon and not state.recon:
+                cached_output[RECON_FIELD] = recon
+            return cached_output
+        Instrumentation().increment('plan_cache_misses_total', name=name)
+
     # launch graph
     workflow_state = execute_graph(graph=graph, full_task_message=full_task_message)
 
@@ -253,19 +321,54 @@ def create_connector_sub_graph(state: PlanningTeamState, name: str, graph: State
         elif field is not SENDER_FIELD and workflow_state.get(field):
             output[field] = workflow_state[field]
 
+    if recon and not state.recon:
+        output[RECON_FIELD] = recon
+
+    # A run that produced no plan is not cached, the next identical task runs the team again
+    if plan_key is not None and output.get(PLAN_FIELD):
+        PlanCache().put(plan_key, task, profile, catalog, {field: value for field, value in output.items()
+                                                           if field is not SENDER_FIELD and field is not RECON_FIELD})
+
     return output
 
 
+@instrument_node()
+def create_recon_node(state: PlanningTeamState, name: str):
+    """
+    Start the speculative reconnaissance of the targets of the task and continue at once.
+
+    The nmap scans run in the background while the host and the planner team are working; the teams receive
+    them through the state as soon as they are finished, and the tester's identical scans are served from the
+    result cache.
+    """
+    started = ReconPrefetch().start(state.messages[0].content)
+    if started:
+        Instrumentation().increment('recon_targets_total', len(started), name=name)
+
+    return {SENDER_FIELD: [name]}
+
+
+@instrument_node()
 def create_chooser_node(state: Union[TeamState, PlanningTeamState], agent, name: str, chooser_options: List[str]):
+    instrumentation = Instrumentation()
     last_message = state.messages[-1]
 
-    response = agent.invoke({'messages': [last_message]})
+    # Fast path: a message naming exactly one option is routed without a model round trip
+    decision = match_chooser_option(last_message.content, chooser_options) if ROUTER_FAST_PATH_ENABLED else None
+    if decision is not None:
+        instrumentation.increment('router_fast_path_total', name=name, decision=decision)
+        return {CHOOSER_FIELD: decision}
+
+    instrumentation.increment('router_llm_fallback_total', name=name)
+    response = instrumentation.invoke_llm(agent, {'messages': [last_message]}, name)
+    response = response.content.strip().strip('\'"') if isinstance(response, BaseMessage) else response
 
     if response not in chooser_options:
         output = {
             MESSAGES_FIELD: [AIMessage(content=f'You choose not from these options: {chooser_options} in a income '
                                                f'message. Try again! Income message is: {last_message.content}')],
             SENDER_FIELD: [name],
+            CHOOSER_FIELD: None,
         }
     else:
         output = {
@@ -275,6 +378,7 @@ def create_chooser_node(state: Union[TeamState, PlanningTeamState], agent, name:
     return output
 
 
+@instrument_node()
 def connector_to_tools_team_node(
         state: PlanningTeamState,
         name: str,
@@ -306,14 +410,41 @@ def connector_to_tools_team_node(
     return output
 
 
-def extract_results(event: Dict):
+def extract_results(event: Dict) -> List[str]:
+    """
+    Collect the module names returned by the trailing tool calls of a sub-graph run, without duplicates.
+
+    The typed responses of the tools (ToolMessage.artifact) are used; messages without one fall back to parsing
+    the content as a Python literal.
+    """
     messages = event.get(MESSAGES_FIELD)
-    result = []
+    tool_messages = []
     for message in messages[::-1]:
         if not isinstance(message, ToolMessage):
-            return result
-
-        result += message.content.replace("['", "").replace("']", "").split("', '")
+            break
+        tool_messages.append(message)
+
+    result: Dict[str, None] = {}
+    for message in reversed(tool_messages):
+        payload = message.artifact
+        if payload is None:
+            try:
+                payload = ast.literal_eval(message.content)
+            except (ValueError, SyntaxError):
+                continue
+        for module in _module_names(payload):
+            result[module] = None
+    return list(result)
+
+
+def _module_names(payload: Any) -> List[str]:
+    # ['name', ...], [('name', 'description'), ...] or {'sub_group': ['name', ...], ...}
+    if isinstance(payload, dict):
+        return [module for value in payload.values() for module in _module_names(value)]
+    if isinstance(payload, (list, tuple)):
+        return [item if isinstance(item, str) else str(item[0]) for item in payload
+                if isinstance(item, str) or (isinstance(item, (list, tuple)) and item)]
+    return []
 
 
 class SubGraphBorder:
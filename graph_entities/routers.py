@@ -1,43 +1,80 @@
-import re
+from typing import List, Optional, Sequence, Tuple
 
 from constants import *
 from graph_entities.statets import PlanningTeamState
 
-FINAL_ANSWER_PATTERN = re.compile(FINAL_ANSWER)
-ARGS_AGENT_PATTERN = re.compile(f'\\*\\*{ARGS_AGENT}\\*\\*')
-NMAP_TESTER_AGENT_PATTERN = re.compile(f'\\*\\*{NMAP_TESTER_AGENT}\\*\\*')
-MSF_TESTER_AGENT_PATTERN = re.compile(f'\\*\\*{MSF_TESTER_AGENT}\\*\\*')
-PLANNER_TEAM_PATTERN = re.compile(f'{PLANNER_AGENT}')
-TESTER_TEAM_PATTERN = re.compile(f'{TESTER_AGENT}')
-CHOOSER_NODE_PATTERN = re.compile(f'{CHOOSER_NODE}')
 
+class RouteMatcher:
+    """
+    Matches the literal route labels of a router against a message.
+
+    Routes are given in precedence order and the highest-priority label found anywhere in the text wins. Every
+    label is searched with str.find, which uses CPython's fast substring search; this beats one pass of a regex
+    alternation of the same labels (the regex engine tries every alternative at every position, see
+    benchmarks/router_benchmark.py). The search stops at the first label found, so a message naming the top route
+    is scanned only until that label.
+    """
+
+    def __init__(self, routes: Sequence[Tuple[str, str]]):
+        """
+        :param routes: (literal label, route) pairs, highest priority first
+        """
+        self.routes: Tuple[Tuple[str, str], ...] = tuple(routes)
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the highest-priority route named in the text, or None."""
+        for label, route in self.routes:
+            if text.find(label) != -1:
+                return route
+        return None
+
+    def matches(self, text: str) -> List[str]:
+        """Return every route named in the text, in precedence order."""
+        return [route for label, route in self.routes if text.find(label) != -1]
+
+
+PLANNING_TEAM_MATCHER = RouteMatcher([
+    ('Tools Agent', TOOLS_TEAM),
+])
+HEADER_NODE_MATCHER = RouteMatcher([
+    (FINAL_ANSWER, "__end__"),
+    (f'**{NMAP_TESTER_AGENT}**', NMAP_TESTER_NODE),
+    (f'**{MSF_TESTER_AGENT}**', MSF_TESTER_NODE),
+    (f'**{ARGS_AGENT}**', ARGS_NODE),
+])
+NMAP_NODE_MATCHER = RouteMatcher([
+    (FINAL_ANSWER, "__end__"),
+])
+CHOOSER_NODE_MATCHER = RouteMatcher([
+    (FINAL_ANSWER, "__end__"),
+    (PLANNER_AGENT, PLANNER_NODE),
+    (TESTER_AGENT, TESTER_NODE),
+    (CHOOSER_NODE, CHOOSER_NODE),
+])
+# Labels of the chooser options, matched by the chooser node before it asks its LLM
+CHOOSER_OPTIONS_MATCHER = RouteMatcher([
+    (FINAL_ANSWER, FINAL_ANSWER),
+    (PLANNER_AGENT, PLANNER_AGENT),
+    (TESTER_AGENT, TESTER_AGENT),
+])
+# chooser decision -> node the host graph continues with
+CHOOSER_DECISION_NODES = {
+    FINAL_ANSWER: "__end__",
+    PLANNER_AGENT: PLANNER_NODE,
+    TESTER_AGENT: TESTER_NODE,
+}
 
 
 def router_planing_team(state: PlanningTeamState):
     last_message = state.messages[-1]
 
-    if re.findall(r'Tools Agent', last_message.content):
-        return TOOLS_TEAM
-
-    return EXTRACTION_NODE
+    return PLANNING_TEAM_MATCHER.match(last_message.content) or EXTRACTION_NODE
 
 
 def router_header_node(state: PlanningTeamState):
     last_message = state.messages[-1]
 
-    if re.findall(FINAL_ANSWER_PATTERN, last_message.content):
-        return "__end__"
-
-    if re.findall(NMAP_TESTER_AGENT_PATTERN, last_message.content):
-        return NMAP_TESTER_NODE
-
-    if re.findall(MSF_TESTER_AGENT_PATTERN, last_message.content):
-        return MSF_TESTER_NODE
-
-    if re.findall(ARGS_AGENT_PATTERN, last_message.content):
-        return ARGS_NODE
-
-    return "continue"
+    return HEADER_NODE_MATCHER.match(last_message.content) or "continue"
 
 
 def router_args_node(state: PlanningTeamState):
@@ -64,25 +101,36 @@ def router_nmap_node(state: PlanningTeamState):
     if last_message.tool_calls:
         return EXECUTOR_NODE
 
-    if re.findall(FINAL_ANSWER_PATTERN, last_message.content):
-        return "__end__"
+    return NMAP_NODE_MATCHER.match(last_message.content) or 'continue'
 
-    return 'continue'
 
+def match_chooser_option(content: str, chooser_options: List[str]) -> Optional[str]:
+    """
+    Choose the option a message names without asking the chooser LLM.
 
-def router_chooser_node(state: PlanningTeamState):
-    last_message = state.messages[-1]
+    FINAL ANSWER wins whenever it is present (the chooser prompt asks for it in that case); otherwise the message
+    must name exactly one of the other options.
+
+    :return: The option, or None if the message names none or several of them
+    """
+    named = [option for option in CHOOSER_OPTIONS_MATCHER.matches(content) if option in chooser_options]
+    if FINAL_ANSWER in named:
+        return FINAL_ANSWER
+
+    if len(named) == 1:
+        return named[0]
 
-    if re.findall(FINAL_ANSWER_PATTERN, last_message.content):
-        return "__end__"
+    return None
 
-    if re.search(PLANNER_TEAM_PATTERN, last_message.content):
-        return PLANNER_NODE
 
-    if re.findall(TESTER_TEAM_PATTERN, last_message.content):
-        return TESTER_NODE
+def router_chooser_node(state: PlanningTeamState):
+    last_message = state.messages[-1]
+
+    if state.chooser_decision in CHOOSER_DECISION_NODES:
+        return CHOOSER_DECISION_NODES[state.chooser_decision]
 
-    if re.findall(CHOOSER_NODE_PATTERN, last_message.content):
-        return CHOOSER_NODE
+    route = CHOOSER_NODE_MATCHER.match(last_message.content)
+    if route is not None:
+        return route
 
     raise ValueError(f"Nothing was chosen! -> {last_message.content}")
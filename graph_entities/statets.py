@@ -5,6 +5,15 @@ from pydantic import BaseModel, Field
 from typing import Sequence, Annotated, Optional, List
 
 
+def unique_union(left: Optional[List[str]], right: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Reducer merging two lists into one without duplicates, keeping the order of first appearance.
+    """
+    if left is None and right is None:
+        return None
+    return list(dict.fromkeys([*(left or []), *(right or [])]))
+
+
 class TeamState(BaseModel):
     """
         Represents the state of a team within a graph.
@@ -40,6 +49,12 @@ class PlanningTeamState(BaseModel):
         description="List of senders participating in the communication."
     )
 
+    # The security testing plan extracted from the planner team's answer
+    plan: Optional[str] = Field(
+        default=None,
+        description="The security testing plan created by the planner team."
+    )
+
     # List of plan execution results
     plans: List[str] = Field(
         default_factory=list,
@@ -52,14 +67,14 @@ class PlanningTeamState(BaseModel):
         description="Results corresponding to each executed plan."
     )
 
-    # List of subgroups relevant to the security testing process, dynamically combined via operator.add
-    sub_groups: Annotated[Optional[List[str]], operator.add] = Field(
+    # List of subgroups relevant to the security testing process, merged without duplicates
+    sub_groups: Annotated[Optional[List[str]], unique_union] = Field(
         default=None,
         description="List of subgroups used in the security testing process."
     )
 
-    # List of modules chosen for security testing, dynamically combined via operator.add
-    modules: Annotated[Optional[List[str]], operator.add] = Field(
+    # List of modules chosen for security testing, merged without duplicates
+    modules: Annotated[Optional[List[str]], unique_union] = Field(
         default=None,
         description="List of all metasploit modules."
     )
@@ -73,3 +88,9 @@ class PlanningTeamState(BaseModel):
     chooser_decision: Optional[str] = Field(
         default=None
     )
+
+    # Baseline reconnaissance of the targets, prefetched in the background when the host run starts
+    recon: Optional[str] = Field(
+        default=None,
+        description="Nmap scans of the targets made by the speculative reconnaissance."
+    )
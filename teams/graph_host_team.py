@@ -1,3 +1,5 @@
+import functools
+
 from graph_entities.conditions import *
 from utils.llm import *
 from teams.graph_planning_team import *
@@ -20,7 +22,7 @@ def create_host_graph():
         sys_msg_path='host/chooser#1.txt',
         node_func=create_chooser_node,
         node_name=CHOOSER_NODE,
-        chooser_options=[FINAL_ANSWER, TESTER_AGENT, PLANNER_TEAM]
+        chooser_options=[FINAL_ANSWER, TESTER_AGENT, PLANNER_AGENT]
     )
 
     planner_node = nodes_fabric.create_team_node(
@@ -36,14 +38,18 @@ def create_host_graph():
         name=TESTER_TEAM,
     )
 
+    recon_node = functools.partial(create_recon_node, name=RECON_NODE)
+
     graph = StateGraph(PlanningTeamState)
 
+    graph.add_node(RECON_NODE, recon_node)
     graph.add_node(HOST_NODE, host_node)
     graph.add_node(PLANNER_NODE, planner_node)
     graph.add_node(CHOOSER_NODE, chooser_node)
     graph.add_node(TESTER_NODE, tester_node)
 
-    graph.add_edge(START, HOST_NODE)
+    graph.add_edge(START, RECON_NODE)
+    graph.add_edge(RECON_NODE, HOST_NODE)
     graph.add_edge(HOST_NODE, CHOOSER_NODE)
 
     graph.add_conditional_edges(
@@ -1,3 +1,7 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from graph_entities.graphs import *
 from graph_entities.nodes import *
 from graph_entities.routers import *
@@ -6,6 +10,10 @@ from graph_entities.statets import *
 from tools.msf_tools import *
 from tools.nmap_tools import *
 
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
 TESTER_TOOLS = [tool_based_on_metasploit, tool_based_on_nmap]
 
 
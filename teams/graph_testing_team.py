@@ -1,11 +1,20 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from tools.nmap_tools import *
+from tools.output_tools import get_tool_output
 from graph_entities.graphs import *
 from graph_entities.nodes import *
 from graph_entities.statets import *
 
-MSF_TOOLS = [tool_based_on_metasploit]
-NMAP_TOOLS = [tool_based_on_nmap]
-ARGS_TOOLS = [get_msf_module_options]
+if TYPE_CHECKING:
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
+MSF_TOOLS = [tool_based_on_metasploit, get_tool_output]
+NMAP_TOOLS = [tool_based_on_nmap, get_nmap_open_ports, get_tool_output]
+ARGS_TOOLS = [get_msf_module_options, get_nmap_open_ports]
 
 
 def create_host_testing_graph(model_llm: ChatOpenAI):
@@ -33,7 +42,7 @@ def create_host_testing_graph(model_llm: ChatOpenAI):
         tools=NMAP_TOOLS
     )
 
-    combine_tools = [*MSF_TOOLS, *ARGS_TOOLS, *NMAP_TOOLS]
+    combine_tools = [*MSF_TOOLS, get_msf_module_options, tool_based_on_nmap, get_nmap_open_ports]
     execution_node = functools.partial(
         create_tool_node,
         tools=combine_tools
@@ -1,20 +1,27 @@
 import logging
 import re
 import time
-from typing import Optional, Tuple, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 
-from pymetasploit3.msfrpc import MsfRpcClient
 from langchain_core.tools import tool
 
 from constants import *
-from dao.sqlite.msf_sqlite import create_connection, check_existing_record
-from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
-from utils.msf.classes import CustomMsfRpcClient
+from dao.sqlite.msf_sqlite import MsfSqliteDAO
+from utils.dao.result_writer import ResultWriter
+from utils.msf.catalog_snapshot import catalog_snapshot
 from utils.msf.data_compressor import DataCompressor
+from utils.msf.result_cache import ExecutionCache, UncachedResult
+from utils.instrumentation import Instrumentation
+from utils.record_replay import record_replay
+
+if TYPE_CHECKING:
+    from pymetasploit3.msfrpc import MsfRpcClient
 
 logger = logging.getLogger('exception_logger')
 logger.setLevel(logging.WARNING)
 
+CONSOLE_TIMEOUT_MARKER = '[TIMEOUT]'
+
 
 def get_msf_sub_groups_list() -> List[str]:
     """
@@ -34,7 +41,12 @@ def get_msf_sub_groups_list() -> List[str]:
         error is caught and logged, but the function will still return an empty list.
     """
     db_url: str = 'sqlite:///metasploit_data.db'
+    snapshot = catalog_snapshot(db_url)
+    if snapshot is not None:
+        return snapshot.sub_groups()
     try:
+        # sqlalchemy and pymetasploit3 are imported on first use to keep the start-up of workers short
+        from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
         manager_db = ManagerAlchemyDB(db_url)
         sub_groups = manager_db.get_sub_group_from_modules()
         return sub_groups
@@ -46,7 +58,7 @@ def get_msf_sub_groups_list() -> List[str]:
 
 @tool
 def get_msf_exact_sub_group_modules_list(sub_group_name: str, db_url: str = 'sqlite:///metasploit_data.db')\
-        -> List[Tuple[str, str]]:
+        -> List[str]:
     """
         Retrieves a list of modules filtered by a specific 'sub_group' from the 'module_auxiliary' table in the
         Metasploit database.
@@ -60,16 +72,20 @@ def get_msf_exact_sub_group_modules_list(sub_group_name: str, db_url: str = 'sql
             db_url (str, optional): The database connection URL. Defaults to 'sqlite:///metasploit_data.db'.
 
         Returns:
-            List[Tuple[str, str]]: A list of tuples containing the module name and description.
-                                   Returns an empty list if no modules are found or if an error occurs.
+            List[str]: A list of the module names.
+                       Returns an empty list if no modules are found or if an error occurs.
 
         Raises:
             Exception: If there is an issue connecting to the database or executing the query, the function returns an empty list.
     """
 
+    snapshot = catalog_snapshot(db_url)
+    if snapshot is not None:
+        return snapshot.modules_by_sub_group(sub_group_name)
     try:
+        from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
         manager_db = ManagerAlchemyDB(db_url)
-        modules: List[Tuple[str, str]] = manager_db.get_modules_by_sub_group(sub_group_name)
+        modules: List[str] = manager_db.get_modules_by_sub_group(sub_group_name)
         return modules
     except Exception as e:
         print(f"Failed to retrieve modules for sub_group '{sub_group_name}': {e}")
@@ -78,6 +94,37 @@ def get_msf_exact_sub_group_modules_list(sub_group_name: str, db_url: str = 'sql
 
 
 
+@tool
+def get_msf_modules_for_sub_groups(sub_group_names: List[str], db_url: str = 'sqlite:///metasploit_data.db')\
+        -> Dict[str, List[str]]:
+    """
+        Retrieves the modules of several sub-groups at once from the 'module_auxiliary' table in the
+        Metasploit database.
+
+        Prefer this tool to calling get_msf_exact_sub_group_modules_list once per sub-group: all sub-groups are
+        resolved with one query. The sub-group names are formatted with slashes (e.g., 'auxiliary/admin').
+
+        Args:
+            sub_group_names (List[str]): The subgroups to list the modules of, e.g. ['auxiliary/scanner', 'exploit/multi'].
+            db_url (str, optional): The database connection URL. Defaults to 'sqlite:///metasploit_data.db'.
+
+        Returns:
+            Dict[str, List[str]]: The module names per requested subgroup; a subgroup without modules (or an error)
+                                  gives an empty list.
+    """
+
+    snapshot = catalog_snapshot(db_url)
+    if snapshot is not None:
+        return snapshot.modules_by_sub_groups(sub_group_names)
+    try:
+        from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
+        manager_db = ManagerAlchemyDB(db_url)
+        return manager_db.get_modules_by_sub_groups(sub_group_names)
+    except Exception as e:
+        print(f"Failed to retrieve modules for sub_groups {sub_group_names}: {e}")
+        return {name: [] for name in sub_group_names}
+
+
 @tool
 def get_msf_module_options(module_name: str, db_url: str = 'sqlite:///metasploit_data.db') -> str:
     """
@@ -95,9 +142,14 @@ def get_msf_module_options(module_name: str, db_url: str = 'sqlite:///metasploit
         an error occurs.
     """
     try:
-        manager_db = ManagerAlchemyDB(db_url)
-        # Retrieve module options and filter out null values
-        modules = [module for module in manager_db.get_module_options(module_name) if module]
+        snapshot = catalog_snapshot(db_url)
+        if snapshot is not None:
+            options = snapshot.module_options(module_name)
+        else:
+            from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
+            options = ManagerAlchemyDB(db_url).get_module_options(module_name)
+        # Filter out null values
+        modules = [module for module in options if module]
         # Format and return the options as a string
         return f'Configuration options for this module -> {module_name}: {", ".join(modules)}'
     except Exception as e:
@@ -107,6 +159,7 @@ def get_msf_module_options(module_name: str, db_url: str = 'sqlite:///metasploit
 
 
 @tool
+@record_replay('msf')
 def tool_based_on_metasploit(input_dict: Any) -> str:
     """
         Executes a specified Metasploit module via the RPC console interface and returns the compressed output.
@@ -130,6 +183,9 @@ def tool_based_on_metasploit(input_dict: Any) -> str:
         Raises:
             ValueError: If 'module_category' or 'module_name' is missing.
             Exception: For other errors during execution, returned as error messages.
+
+        Identical executions (same module, target and options) are served from a short-lived cache; add
+        'bypass_cache': True to the input dictionary to force a fresh run.
     """
 
 
@@ -145,6 +201,9 @@ def tool_based_on_metasploit(input_dict: Any) -> str:
         module_category = args.pop('module_category')
         module_name = args.pop('module_name')
 
+        # The bypass flag controls the cache and must not be sent to the console as a module option
+        bypass_cache = str(args.pop(BYPASS_CACHE_KEY, False)).lower() == 'true'
+
         # Get a host for inserting in the DB
         host: Optional[str] = None
         for host_name in HOST_NAMES_LIST:
@@ -161,28 +220,16 @@ def tool_based_on_metasploit(input_dict: Any) -> str:
             if result and isinstance(result, str):
                 return result
 
-        # Execute the actual Metasploit module
-        output = _execute_metasploit_module(module_category, module_name, args)
-
-        # Split the output at the documentation line and take the part after it
-        split_output = re.split(r'Metasploit Documentation: https://docs.metasploit.com/\n', output, maxsplit=1)
-        filtered_output = split_output[1] if len(split_output) > 1 else ""
-
-        # Compressing output data
-        compressor = DataCompressor()
-        compressor.start_compressing(filtered_output)
-        compressed_output = compressor.get_compressed_output()
-
-        # Save the results in the SQLite DB
-        _save_results_db(
-            module=f'{module_category}/{module_name}',
-            host=host,
-            output=filtered_output,
-            compressed_output=compressed_output
+        # Reuse the result of an identical execution or share the one that is still running
+        module = f'{module_category}/{module_name}'
+        cache = ExecutionCache()
+        return cache.get_or_execute(
+            key=cache.build_key(module, host, args),
+            ttl=cache.get_ttl(module),
+            func=lambda: _run_module(module_category, module_name, args, host),
+            bypass=bypass_cache
         )
 
-        return compressed_output
-
     except ValueError as e:
         return f"ValueError: {str(e)}"
     except Exception as e:
@@ -190,6 +237,39 @@ def tool_based_on_metasploit(input_dict: Any) -> str:
         raise
 
 
+def _run_module(module_category: str, module_name: str, args: Dict[str, Any], host: str) -> str:
+    """
+    Executes the module, compresses the output and saves both forms in the results DB.
+
+    Returns:
+        str: The compressed output; an UncachedResult if the console read timed out or no output was found.
+    """
+    # Execute the actual Metasploit module
+    output = _execute_metasploit_module(module_category, module_name, args)
+
+    # Split the output at the documentation line and take the part after it
+    split_output = re.split(r'Metasploit Documentation: https://docs.metasploit.com/\n', output, maxsplit=1)
+    filtered_output = split_output[1] if len(split_output) > 1 else ""
+
+    # Compressing output data
+    compressor = DataCompressor()
+    compressor.start_compressing(filtered_output)
+    compressed_output = compressor.get_compressed_output()
+
+    # Save the results in the SQLite DB
+    _save_results_db(
+        module=f'{module_category}/{module_name}',
+        host=host,
+        output=filtered_output,
+        compressed_output=compressed_output
+    )
+
+    # A timed out or failed run is returned once, not replayed from the result cache
+    if CONSOLE_TIMEOUT_MARKER in output or not filtered_output:
+        return UncachedResult(compressed_output)
+    return compressed_output
+
+
 def _extract_string_parameters(data: Dict[str, Any]) -> Dict[str, str]:
     """
     Recursively extracts all key-value pairs from the input dictionary
@@ -217,8 +297,8 @@ def _extract_string_parameters(data: Dict[str, Any]) -> Dict[str, str]:
 
 
 def _save_results_db(host: str, module: str, output: str, compressed_output: str) -> None:
-    manager_db = ManagerAlchemyDB(db_url='sqlite:///my_sqlite.db')
-    manager_db.write_to_db(
+    # Queued for the background writer, the tool call doesn't wait for the commit
+    ResultWriter().write_console_result(
         host=host,
         module=module,
         output=output,
@@ -227,8 +307,7 @@ def _save_results_db(host: str, module: str, output: str, compressed_output: str
 
 
 def _mock_execution(module_category: str, module_name: str, host: str) -> str:
-    db_connection = create_connection()
-    record = check_existing_record(db_connection, f'{module_category}/{module_name}', host)
+    record = MsfSqliteDAO().check_existing_record(f'{module_category}/{module_name}', host)
     if record:
         return record[0]
     else:
@@ -236,6 +315,7 @@ def _mock_execution(module_category: str, module_name: str, host: str) -> str:
 
 
 def _execute_metasploit_module(module_category: str, module_name: str, args: Dict[str, Any]) -> str:
+    from utils.msf.classes import CustomMsfRpcClient
     client: MsfRpcClient = CustomMsfRpcClient().get_client()
     current_console = client.consoles.console()
 
@@ -264,17 +344,19 @@ def _build_module_commands(args: Dict[str, Any]) -> list:
 def _read_console_output(console, timeout: int = 300) -> str:
     start_time = time.time()
     output = ""
+    instrumentation = Instrumentation()
     while True:
         response = console.read()
+        instrumentation.increment('msf_console_polls_total')
         output += response['data']
 
         if any(phrase in output for phrase in EXECUTION_COMPLETION_PHRASES):
             break
 
         if time.time() - start_time > timeout:
-            output += '[TIMEOUT] "Time limit exceeded, exiting the loop."'
+            output += f'{CONSOLE_TIMEOUT_MARKER} "Time limit exceeded, exiting the loop."'
             console.write('exit\n')
             break
 
-        time.sleep(1)
+        time.sleep(CONSOLE_POLL_INTERVAL)
     return output
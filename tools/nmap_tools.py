@@ -1,9 +1,19 @@
-import nmap
-from typing import List, Optional
+import logging
+from typing import Optional
 from langchain_core.tools import tool
 
+from constants import NMAP_CACHE_MODULE, NMAP_RENDER_TOKEN_BUDGET, RESULTS_DB_URL, RESULT_WRITER_PUT_TIMEOUT
+from utils.dao.result_writer import ResultWriter
+from utils.msf.result_cache import ExecutionCache
+from utils.nmap.scan_engine import NmapScanEngine
+from utils.nmap.scan_result import NmapScanResult
+from utils.record_replay import record_replay
+
+logger = logging.getLogger('exception_logger')
+
 
 @tool
+@record_replay('nmap')
 def tool_based_on_nmap(in_hosts: str, in_ports: Optional[str] = None, in_arguments: str = "-sV") -> str:
     """
     A tool to scan a target host using Nmap.
@@ -14,37 +24,74 @@ def tool_based_on_nmap(in_hosts: str, in_ports: Optional[str] = None, in_argumen
         in_arguments (str): Additional arguments for Nmap. Defaults to "-sV" to detect service versions.
 
     Returns:
-        str: The scan results as a formatted string or an error message if an exception occurs.
+        str: A compact summary of the scan (open services grouped across hosts, per-host port ranges) or an
+        error message if an exception occurs. The full result is saved in the results DB.
     """
     try:
-        # Initialize the Nmap scanner
-        scanner = nmap.PortScanner()
-        result_list: List[str] = []
-
-        # Run the Nmap scan with the provided target, ports, and arguments
-        scanner.scan(
-            hosts=in_hosts,
-            ports=in_ports,
-            arguments=in_arguments
-        )
-
-        # Collect the results from the scan
-        for host in scanner.all_hosts():
-            result_list.append(f"Host: {host}")
-            result_list.append(f"State: {scanner[host].state()}")
-            for proto in scanner[host].all_protocols():
-                result_list.append(f"Protocol: {proto}")
-                ports = scanner[host][proto].keys()
-                for port in ports:
-                    result_list.append(f"Port: {port}, State: {scanner[host][proto][port]['state']}")
-
-
-        # Return the results as a single string
-        result_str = '\n'.join(result_list)
-        answer_template = f"Targets: {hosts}, Ports: {ports}, Arguments: {arguments}, Scan result: {result_str if result_str else 'No results'}"
-
-        return answer_template
+        return run_nmap_scan(in_hosts, in_ports, in_arguments)
 
     except Exception as e:
         # Return the error message in a format that AI can handle
         return f"Error occurred during Nmap scan: {str(e)}"
+
+
+@tool
+def get_nmap_open_ports(host: str) -> str:
+    """
+    Returns the open ports and services found on a host by previous Nmap scans, without scanning it again.
+
+    Args:
+        host (str): The host address, e.g. '10.10.11.23'.
+
+    Returns:
+        str: The open ports as 'port/protocol service product version' entries, or a message that no open ports
+        were recorded for the host.
+    """
+    # sqlalchemy is imported on first use to keep the start-up of workers short
+    from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
+    # Scans still queued for the background writer are committed first
+    ResultWriter().flush(timeout=RESULT_WRITER_PUT_TIMEOUT)
+    open_ports = ManagerAlchemyDB(RESULTS_DB_URL).get_open_ports(host)
+    if not open_ports:
+        return f"No open ports were recorded for the host {host}."
+
+    entries = [' '.join(str(part) for part in (f'{port}/{protocol}', service, product, version) if part)
+               for protocol, port, service, product, version in open_ports]
+    return f"Open ports of {host}: {', '.join(entries)}"
+
+
+def run_nmap_scan(hosts: str, ports: Optional[str] = None, arguments: str = "-sV") -> str:
+    """
+    Scan the hosts (or reuse an identical scan that finished or is still running, e.g. the speculative
+    reconnaissance started with the host run) and return the rendered summary.
+
+    Raises:
+        Exception: If the scan fails; failed scans are not cached.
+    """
+    cache = ExecutionCache()
+    return cache.get_or_execute(
+        key=cache.build_key(NMAP_CACHE_MODULE, hosts, {'ports': ports or '', 'arguments': arguments}),
+        ttl=cache.get_ttl(NMAP_CACHE_MODULE),
+        func=lambda: _scan(hosts, ports, arguments)
+    )
+
+
+def _scan(hosts: str, ports: Optional[str], arguments: str) -> str:
+    # Large target specifications are split into shards scanned by parallel nmap processes
+    scan_results = NmapScanEngine().scan(
+        hosts=hosts,
+        ports=ports,
+        arguments=arguments
+    )
+    scan_result = NmapScanResult.from_engine_results(scan_results, hosts, ports, arguments)
+
+    _save_scan_db(scan_result)
+
+    return scan_result.render(NMAP_RENDER_TOKEN_BUDGET)
+
+
+def _save_scan_db(scan_result: NmapScanResult) -> None:
+    try:
+        ResultWriter().write_nmap_results(scan_result.to_records())
+    except Exception as e:
+        logger.warning(f"The nmap scan {scan_result.scan_id} was not saved in the results DB: {e}")
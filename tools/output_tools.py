@@ -0,0 +1,31 @@
+from langchain_core.tools import tool
+
+from utils.tool_output import load_tool_output
+
+
+@tool
+def get_tool_output(output_id: str, start_line: int = 0, line_count: int = 200) -> str:
+    """
+    Reads the full output of a previous tool call that was shortened to fit the token budget.
+
+    Shortened outputs end with a note containing their id. The stored output is returned page by page,
+    by lines, so long outputs can be read in several calls.
+
+    Args:
+        output_id (str): The id from the note of the shortened output.
+        start_line (int): The first line to return (0-based). Defaults to 0.
+        line_count (int): The number of lines to return. Defaults to 200.
+
+    Returns:
+        str: The requested lines with a header showing their position in the output, or a message that
+        no output with this id exists.
+    """
+    output = load_tool_output(output_id)
+    if output is None:
+        return f"No stored tool output with the id '{output_id}'."
+
+    lines = output.splitlines()
+    start_line = max(start_line, 0)
+    end_line = min(start_line + max(line_count, 1), len(lines))
+    header = f"Lines {start_line}-{end_line - 1} of {len(lines)} of the output '{output_id}':"
+    return '\n'.join([header] + lines[start_line:end_line])
@@ -5,6 +5,8 @@ from typing import Dict
 
 from langchain_core.messages import AIMessage, ToolMessage
 
+import constants
+
 
 def extract_tool_content_and_sender(data):
     for sender, messages in data.items():
@@ -107,6 +109,9 @@ import sys
 
 
 def save_and_open_graph(graph):
+    if not constants.DRAW_GRAPHS:
+        return
+
     try:
         # get PNG data
         png_data = graph.get_graph(xray=True).draw_mermaid_png()
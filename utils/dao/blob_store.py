@@ -0,0 +1,138 @@
+import functools
+import hashlib
+import zlib
+from typing import Callable, Optional, Tuple, Union
+
+import constants
+
+# Values of the encoding columns
+PLAIN = 'plain'  # the text itself
+ZLIB = 'zlib'  # zlib-compressed UTF-8
+ZSTD = 'zstd'  # zstd-compressed UTF-8
+BLOB = 'blob'  # sha256 of the text, the compressed text is in the blobs table
+
+BLOBS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 VARCHAR NOT NULL PRIMARY KEY,
+        encoding VARCHAR NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    )
+"""
+
+# Column holding the encoding of the 'output' column of a table
+ENCODING_COLUMN = 'output_encoding'
+
+StoredValue = Union[str, bytes]
+
+
+@functools.lru_cache(maxsize=None)
+def _zstd():
+    # zstandard is optional; without it outputs are compressed with zlib
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress_text(text: str) -> Tuple[StoredValue, str]:
+    """
+    Compress a text for storage; texts shorter than BLOB_COMPRESSION_MIN_SIZE are kept as they are.
+
+    :return: (stored value, encoding)
+    """
+    if text is None or len(text) < constants.BLOB_COMPRESSION_MIN_SIZE:
+        return text, PLAIN
+
+    data = text.encode()
+    zstandard = _zstd() if constants.BLOB_CODEC == ZSTD else None
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=constants.BLOB_COMPRESSION_LEVEL).compress(data), ZSTD
+    return zlib.compress(data, min(constants.BLOB_COMPRESSION_LEVEL, 9)), ZLIB
+
+
+def decompress_text(value: Optional[StoredValue], encoding: Optional[str]) -> Optional[str]:
+    """Inverse of compress_text; rows written before the encoding column existed have no encoding."""
+    if value is None or encoding in (None, PLAIN):
+        return value
+    if encoding == ZLIB:
+        return zlib.decompress(value).decode()
+    if encoding == ZSTD:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("The output is zstd-compressed, install 'zstandard' to read it.")
+        return zstandard.ZstdDecompressor().decompress(value).decode()
+    raise ValueError(f"Unknown output encoding: {encoding}")
+
+
+def store_text(text: str, save_blob: Callable[[str, str, int, bytes], None]) -> Tuple[StoredValue, str]:
+    """
+    Encode a text for a row, moving large texts into the content-addressed blobs table if deduplication is on.
+
+    :param text: The text
+    :param save_blob: Saves (sha256, encoding, size, data) unless a blob with that sha256 exists
+    :return: (stored value, encoding) of the row
+    """
+    value, encoding = compress_text(text)
+    if encoding == PLAIN or not constants.BLOB_DEDUP_ENABLED:
+        return value, encoding
+
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    save_blob(digest, encoding, len(text), value)
+    return digest, BLOB
+
+
+def load_text(value: Optional[StoredValue], encoding: Optional[str],
+              load_blob: Callable[[str], Optional[Tuple[str, bytes]]]) -> Optional[str]:
+    """
+    Decode a stored value of a row.
+
+    :param load_blob: Returns (encoding, data) of a blob by its sha256
+    """
+    if encoding != BLOB:
+        return decompress_text(value, encoding)
+    blob = load_blob(value)
+    if blob is None:
+        raise LookupError(f"The blob {value} is missing.")
+    return decompress_text(blob[1], blob[0])
+
+
+def migrate_table(connection, table: str) -> None:
+    """
+    Create the blobs table and add the encoding column to a table created before it existed.
+
+    :param connection: DB-API connection of the SQLite DB (sqlite3 or the raw connection of an engine)
+    :param table: Table with an 'output' column
+    """
+    cursor = connection.cursor()
+    cursor.execute(BLOBS_TABLE_DDL)
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+    if columns and ENCODING_COLUMN not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {ENCODING_COLUMN} VARCHAR")
+    connection.commit()
+
+
+class LazyText:
+    """
+    A stored text that is only decoded (fetched from the blobs table, decompressed) when it is read.
+    """
+    __slots__ = ('_loader', '_text', '_loaded')
+
+    def __init__(self, loader: Callable[[], Optional[str]]):
+        self._loader = loader
+        self._text: Optional[str] = None
+        self._loaded = False
+
+    @property
+    def text(self) -> Optional[str]:
+        if not self._loaded:
+            self._text = self._loader()
+            self._loaded = True
+        return self._text
+
+    def __str__(self) -> str:
+        return self.text or ''
+
+    def __repr__(self) -> str:
+        return f"LazyText({'loaded' if self._loaded else 'not loaded'})"
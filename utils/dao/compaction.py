@@ -0,0 +1,332 @@
+"""
+Retention and compaction of the results DB and of the graph state snapshots.
+
+Example:
+    python -m utils.dao.compaction
+    python -m utils.dao.compaction --max-age-days 14 --keep-host 10.10.11.23
+"""
+import argparse
+import gzip
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import constants
+from utils.dao.blob_store import BLOB, ENCODING_COLUMN
+from utils.dao.result_writer import sqlite_path
+from utils.instrumentation import Instrumentation
+
+logger = logging.getLogger(__name__)
+
+CONSOLE_TABLE_PATTERN = re.compile(r'^msf_console_(\d{4})_(\d{2})_(\d{2})$')
+# 'auto_vacuum' value of a DB whose free pages are released by 'PRAGMA incremental_vacuum'
+INCREMENTAL = 2
+
+
+@dataclass
+class CompactionPolicy:
+    """
+    What the compaction keeps.
+
+    max_age_days: Results and snapshots older than this are deleted
+    fold_after_days: Console results older than this keep only their compressed output; snapshots are gzipped
+    max_db_size_mb: The oldest console tables are dropped while the used part of the DB is larger
+    max_snapshots_size_mb: The oldest snapshots are deleted while the snapshots folder is larger
+    keep_hosts: Hosts of active engagements; their results and the snapshots mentioning them are never compacted
+    batch_rows: Rows deleted or folded per transaction, so live writers wait at most one batch
+    vacuum_pages: Free pages released per incremental vacuum step
+    """
+    max_age_days: int = 30
+    fold_after_days: int = 7
+    max_db_size_mb: Optional[float] = None
+    max_snapshots_size_mb: Optional[float] = None
+    keep_hosts: List[str] = field(default_factory=list)
+    batch_rows: int = 500
+    vacuum_pages: int = 1000
+
+    @classmethod
+    def from_constants(cls) -> 'CompactionPolicy':
+        return cls(max_age_days=constants.COMPACTION_MAX_AGE_DAYS,
+                   fold_after_days=constants.COMPACTION_FOLD_AFTER_DAYS,
+                   max_db_size_mb=constants.COMPACTION_MAX_DB_SIZE_MB,
+                   max_snapshots_size_mb=constants.COMPACTION_MAX_SNAPSHOTS_SIZE_MB,
+                   keep_hosts=list(constants.COMPACTION_KEEP_HOSTS),
+                   batch_rows=constants.COMPACTION_BATCH_ROWS,
+                   vacuum_pages=constants.COMPACTION_VACUUM_PAGES)
+
+
+@dataclass
+class CompactionReport:
+    db_bytes_before: int = 0
+    db_bytes_after: int = 0
+    snapshot_bytes_before: int = 0
+    snapshot_bytes_after: int = 0
+    tables_dropped: List[str] = field(default_factory=list)
+    rows_deleted: int = 0
+    rows_folded: int = 0
+    blobs_deleted: int = 0
+    snapshots_deleted: int = 0
+    snapshots_compressed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return self.db_bytes_before - self.db_bytes_after + self.snapshot_bytes_before - self.snapshot_bytes_after
+
+    def __str__(self) -> str:
+        return (f"Compaction reclaimed {self.reclaimed_bytes / 1024:.1f} KB in {self.seconds:.2f} s: "
+                f"DB {self.db_bytes_before / 1024:.1f} -> {self.db_bytes_after / 1024:.1f} KB "
+                f"({len(self.tables_dropped)} tables dropped, {self.rows_deleted} rows deleted, "
+                f"{self.rows_folded} rows folded, {self.blobs_deleted} blobs deleted), "
+                f"snapshots {self.snapshot_bytes_before / 1024:.1f} -> {self.snapshot_bytes_after / 1024:.1f} KB "
+                f"({self.snapshots_deleted} deleted, {self.snapshots_compressed} compressed)")
+
+
+class CompactionJob:
+    """
+    Applies a CompactionPolicy to the results DB and the snapshots folder.
+
+    Rows are deleted and folded in batches of batch_rows, each in its own short transaction, and the free pages
+    are released with incremental vacuum steps, so the result writer keeps committing while the job runs. A DB
+    created before incremental vacuum was enabled is converted once with a full VACUUM. ANALYZE refreshes the
+    planner statistics at the end and the WAL file is truncated.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, states_folder: Optional[str] = None,
+                 policy: Optional[CompactionPolicy] = None):
+        self.db_path = db_path or sqlite_path(constants.RESULTS_DB_URL)
+        self.states_folder = states_folder or constants.STATES_FOLDER
+        self.policy = policy or CompactionPolicy.from_constants()
+
+    def run(self, today: Optional[date] = None) -> CompactionReport:
+        """Compact the DB and the snapshots, and report the reclaimed space."""
+        started = time.perf_counter()
+        today = today or date.today()
+        report = CompactionReport()
+
+        if os.path.exists(self.db_path):
+            report.db_bytes_before = _db_bytes(self.db_path)
+            connection = self._connect()
+            try:
+                self._compact_db(connection, today, report)
+            finally:
+                connection.close()
+            report.db_bytes_after = _db_bytes(self.db_path)
+
+        if os.path.isdir(self.states_folder):
+            report.snapshot_bytes_before = _folder_bytes(self.states_folder)
+            self._compact_snapshots(today, report)
+            report.snapshot_bytes_after = _folder_bytes(self.states_folder)
+
+        report.seconds = time.perf_counter() - started
+        Instrumentation().increment('compaction_reclaimed_bytes_total', max(report.reclaimed_bytes, 0))
+        logger.info(str(report))
+        return report
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: every batch statement is its own transaction
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def _compact_db(self, connection: sqlite3.Connection, today: date, report: CompactionReport) -> None:
+        tables = _table_names(connection)
+        expired = (today - timedelta(days=self.policy.max_age_days)).isoformat()
+        folded = today - timedelta(days=self.policy.fold_after_days)
+
+        for table, day in _console_tables(tables):
+            if (today - day).days >= self.policy.max_age_days:
+                report.rows_deleted += self._delete_rows(connection, table, '1')
+                if self._drop_if_empty(connection, table):
+                    report.tables_dropped.append(table)
+            elif day <= folded:
+                report.rows_folded += self._fold_rows(connection, table)
+
+        if 'tool_outputs' in tables:
+            report.rows_deleted += self._delete_rows(connection, 'tool_outputs', 'created_at < ?', (expired,),
+                                                     by_host=False)
+        if 'nmap_results' in tables:
+            report.rows_deleted += self._delete_rows(connection, 'nmap_results', 'scanned_at < ?', (expired,))
+
+        if self.policy.max_db_size_mb is not None:
+            self._enforce_db_size(connection, today, report)
+        if 'blobs' in tables:
+            report.blobs_deleted += self._delete_orphan_blobs(connection)
+        self._vacuum(connection)
+        connection.execute('PRAGMA analysis_limit=1000')
+        connection.execute('ANALYZE')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def _delete_rows(self, connection: sqlite3.Connection, table: str, condition: str, parameters: tuple = (),
+                     by_host: bool = True) -> int:
+        """Delete the matching rows batch by batch, sparing the hosts of kept engagements."""
+        condition, parameters = self._spare_kept_hosts(condition, parameters, by_host)
+        return self._in_batches(connection, f"DELETE FROM {table} WHERE rowid IN "
+                                            f"(SELECT rowid FROM {table} WHERE {condition} LIMIT ?)", parameters)
+
+    def _fold_rows(self, connection: sqlite3.Connection, table: str) -> int:
+        """Drop the raw output of the rows that have a compressed one."""
+        columns = _column_names(connection, table)
+        condition, parameters = self._spare_kept_hosts(
+            'output IS NOT NULL AND compressed_output IS NOT NULL', (), by_host=True)
+        reset_encoding = f", {ENCODING_COLUMN} = NULL" if ENCODING_COLUMN in columns else ''
+        return self._in_batches(connection, f"UPDATE {table} SET output = NULL{reset_encoding} WHERE rowid IN "
+                                            f"(SELECT rowid FROM {table} WHERE {condition} LIMIT ?)", parameters)
+
+    def _spare_kept_hosts(self, condition: str, parameters: tuple, by_host: bool) -> Tuple[str, tuple]:
+        if not by_host or not self.policy.keep_hosts:
+            return condition, parameters
+        placeholders = ', '.join('?' * len(self.policy.keep_hosts))
+        return (f"({condition}) AND (host IS NULL OR host NOT IN ({placeholders}))",
+                (*parameters, *self.policy.keep_hosts))
+
+    def _in_batches(self, connection: sqlite3.Connection, query: str, parameters: tuple) -> int:
+        changed = 0
+        while True:
+            rowcount = connection.execute(query, (*parameters, self.policy.batch_rows)).rowcount
+            changed += rowcount
+            if rowcount < self.policy.batch_rows:
+                return changed
+
+    @staticmethod
+    def _drop_if_empty(connection: sqlite3.Connection, table: str) -> bool:
+        if connection.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None:
+            return False
+        connection.execute(f"DROP TABLE {table}")
+        return True
+
+    def _enforce_db_size(self, connection: sqlite3.Connection, today: date, report: CompactionReport) -> None:
+        """Drop the oldest console tables (never the one of today) while the used pages exceed the limit."""
+        limit = self.policy.max_db_size_mb * 1024 * 1024
+        for table, day in _console_tables(_table_names(connection)):
+            if _used_bytes(connection) <= limit or day >= today:
+                return
+            report.rows_deleted += self._delete_rows(connection, table, '1')
+            if self._drop_if_empty(connection, table):
+                report.tables_dropped.append(table)
+
+    @staticmethod
+    def _delete_orphan_blobs(connection: sqlite3.Connection) -> int:
+        tables = [table for table in _table_names(connection)
+                  if (CONSOLE_TABLE_PATTERN.match(table) or table == 'tool_outputs')
+                  and ENCODING_COLUMN in _column_names(connection, table)]
+        if not tables:
+            return connection.execute("DELETE FROM blobs").rowcount
+        referenced = ' UNION '.join(f"SELECT output FROM {table} WHERE {ENCODING_COLUMN} = '{BLOB}'"
+                                    for table in tables)
+        # One statement: a row written meanwhile commits with its blob, before or after this delete
+        return connection.execute(f"DELETE FROM blobs WHERE sha256 NOT IN ({referenced})").rowcount
+
+    def _vacuum(self, connection: sqlite3.Connection) -> None:
+        if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != INCREMENTAL:
+            logger.info(f"Enabling incremental vacuum of {self.db_path} (one full VACUUM)")
+            connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            connection.execute('VACUUM')
+            return
+        while connection.execute('PRAGMA freelist_count').fetchone()[0]:
+            connection.execute(f'PRAGMA incremental_vacuum({self.policy.vacuum_pages})').fetchall()
+
+    def _compact_snapshots(self, today: date, report: CompactionReport) -> None:
+        snapshots = sorted((entry for entry in os.scandir(self.states_folder) if entry.is_file()),
+                           key=lambda entry: entry.stat().st_mtime)
+        kept = []
+        for entry in snapshots:
+            age = (today - datetime.fromtimestamp(entry.stat().st_mtime).date()).days
+            if self._mentions_kept_host(entry.path):
+                continue
+            if age >= self.policy.max_age_days:
+                os.remove(entry.path)
+                report.snapshots_deleted += 1
+                continue
+            path = entry.path
+            if age >= self.policy.fold_after_days and not path.endswith('.gz'):
+                path = _gzip_file(path)
+                report.snapshots_compressed += 1
+            kept.append(path)
+
+        if self.policy.max_snapshots_size_mb is None:
+            return
+        limit = self.policy.max_snapshots_size_mb * 1024 * 1024
+        for path in kept:
+            if _folder_bytes(self.states_folder) <= limit:
+                return
+            os.remove(path)
+            report.snapshots_deleted += 1
+
+    def _mentions_kept_host(self, path: str) -> bool:
+        if not self.policy.keep_hosts:
+            return False
+        with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path, 'r')) as file_reader:
+            content = file_reader.read()
+        return any(host in content for host in self.policy.keep_hosts)
+
+
+def _table_names(connection: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+
+def _column_names(connection: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+def _console_tables(tables: Iterable[str]) -> List[Tuple[str, date]]:
+    """The daily console tables with their day, oldest first."""
+    console_tables = []
+    for table in tables:
+        match = CONSOLE_TABLE_PATTERN.match(table)
+        if match:
+            console_tables.append((table, date(*(int(part) for part in match.groups()))))
+    return sorted(console_tables, key=lambda item: item[1])
+
+
+def _used_bytes(connection: sqlite3.Connection) -> int:
+    pages = connection.execute('PRAGMA page_count').fetchone()[0] - connection.execute(
+        'PRAGMA freelist_count').fetchone()[0]
+    return pages * connection.execute('PRAGMA page_size').fetchone()[0]
+
+
+def _db_bytes(db_path: str) -> int:
+    return sum(os.path.getsize(path) for path in (db_path, f'{db_path}-wal') if os.path.exists(path))
+
+
+def _folder_bytes(folder: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+def _gzip_file(path: str) -> str:
+    compressed = f'{path}.gz'
+    with open(path, 'rb') as source, gzip.open(compressed, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    shutil.copystat(path, compressed)
+    os.remove(path)
+    return compressed
+
+
+def main(argv: Optional[List[str]] = None):
+    defaults = CompactionPolicy.from_constants()
+    parser = argparse.ArgumentParser(description='Apply the retention policy to the results DB and the snapshots.')
+    parser.add_argument('--db', default=sqlite_path(constants.RESULTS_DB_URL))
+    parser.add_argument('--states-folder', default=constants.STATES_FOLDER)
+    parser.add_argument('--max-age-days', type=int, default=defaults.max_age_days)
+    parser.add_argument('--fold-after-days', type=int, default=defaults.fold_after_days)
+    parser.add_argument('--max-db-size-mb', type=float, default=defaults.max_db_size_mb)
+    parser.add_argument('--max-snapshots-size-mb', type=float, default=defaults.max_snapshots_size_mb)
+    parser.add_argument('--keep-host', action='append', default=defaults.keep_hosts,
+                        help='host of an active engagement (repeatable)')
+    args = parser.parse_args(argv)
+
+    policy = CompactionPolicy(max_age_days=args.max_age_days, fold_after_days=args.fold_after_days,
+                              max_db_size_mb=args.max_db_size_mb, max_snapshots_size_mb=args.max_snapshots_size_mb,
+                              keep_hosts=args.keep_host, batch_rows=defaults.batch_rows,
+                              vacuum_pages=defaults.vacuum_pages)
+    print(CompactionJob(args.db, args.states_folder, policy).run())
+
+
+if __name__ == '__main__':
+    main()
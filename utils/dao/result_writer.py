@@ -0,0 +1,271 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import constants
+from utils.dao.blob_store import ENCODING_COLUMN, migrate_table, store_text
+
+logger = logging.getLogger(__name__)
+
+CONSOLE_COLUMNS = ('host', 'module', 'output', 'compressed_output', ENCODING_COLUMN)
+NMAP_COLUMNS = ('scan_id', 'scanned_at', 'host', 'hostname', 'host_state', 'protocol', 'port', 'state', 'service',
+                'product', 'version', 'extrainfo')
+TOOL_OUTPUT_COLUMNS = ('id', 'tool', 'created_at', 'tokens', 'output', ENCODING_COLUMN)
+
+# The tables mirror the models of utils.dao.sqlalchemy.models (DynamicConsoleResult, NmapPortResult, ToolOutput)
+CONSOLE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER NOT NULL PRIMARY KEY,
+        host VARCHAR,
+        module VARCHAR,
+        output VARCHAR,
+        compressed_output VARCHAR,
+        output_encoding VARCHAR
+    )
+"""
+TABLES_DDL = {
+    'nmap_results': [
+        """
+        CREATE TABLE IF NOT EXISTS nmap_results (
+            id INTEGER NOT NULL PRIMARY KEY,
+            scan_id VARCHAR NOT NULL,
+            scanned_at VARCHAR NOT NULL,
+            host VARCHAR NOT NULL,
+            hostname VARCHAR,
+            host_state VARCHAR,
+            protocol VARCHAR,
+            port INTEGER,
+            state VARCHAR,
+            service VARCHAR,
+            product VARCHAR,
+            version VARCHAR,
+            extrainfo VARCHAR
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_nmap_results_scan_id ON nmap_results (scan_id)",
+        "CREATE INDEX IF NOT EXISTS ix_nmap_results_host ON nmap_results (host)",
+    ],
+    'tool_outputs': [
+        """
+        CREATE TABLE IF NOT EXISTS tool_outputs (
+            id VARCHAR NOT NULL PRIMARY KEY,
+            tool VARCHAR NOT NULL,
+            created_at VARCHAR NOT NULL,
+            tokens INTEGER NOT NULL,
+            output VARCHAR NOT NULL,
+            output_encoding VARCHAR
+        )
+        """,
+    ],
+}
+
+# A queued row: (table, columns, values); a queued flush request: (None, None, threading.Event)
+_Item = Tuple[Optional[str], Optional[Tuple[str, ...]], Any]
+_STOP = (None, None, None)
+
+
+class ResultWriter:
+    """
+    Background writer of the results DB (MSF console outputs, nmap scans, raw tool outputs).
+
+    Tools enqueue rows and return at once; a daemon thread writes them into the SQLite file through one WAL-mode
+    connection, grouping the rows of up to RESULT_WRITER_BATCH_SIZE writes or RESULT_WRITER_FLUSH_INTERVAL
+    seconds into one commit. Tables are created once per writer instead of being inspected on every write.
+    The queue is bounded: when it stays full for RESULT_WRITER_PUT_TIMEOUT seconds, the row is written by the
+    calling thread. flush() waits until everything queued so far is committed (call it before reading the
+    results back); the queue is flushed and the thread stopped at interpreter exit.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(ResultWriter, cls).__new__(cls)
+                cls._instance._thread = None
+                cls._instance._queue = queue.Queue(maxsize=constants.RESULT_WRITER_QUEUE_SIZE)
+                cls._instance._start_lock = threading.Lock()
+                cls._instance._direct_lock = threading.Lock()
+                cls._instance._created_tables = set()
+                cls._instance.db_path = sqlite_path(constants.RESULTS_DB_URL)
+                cls._instance.committed_rows = 0
+                cls._instance.commits = 0
+        return cls._instance
+
+    def configure(self, db_path: str) -> None:
+        """Flush and stop the writer, then write into another DB file."""
+        self.close()
+        self.db_path = db_path
+        self._created_tables = set()
+
+    def write_console_result(self, host: str, module: str, output: str, compressed_output: str) -> None:
+        """Save an MSF console output in the console table of the day (msf_console_YYYY_MM_DD)."""
+        table = f"msf_console_{datetime.now().strftime('%Y_%m_%d')}"
+        self._submit(table, CONSOLE_COLUMNS, (host, module, output, compressed_output, None))
+
+    def write_nmap_results(self, records: List[Dict[str, Any]]) -> None:
+        """Save the rows of an nmap scan (NmapScanResult.to_records)."""
+        for record in records:
+            self._submit('nmap_results', NMAP_COLUMNS, tuple(record.get(column) for column in NMAP_COLUMNS))
+
+    def write_tool_output(self, output_id: str, tool: str, tokens: int, output: str) -> None:
+        """Save the raw output of a tool call under its id."""
+        created_at = datetime.now().isoformat(timespec='seconds')
+        self._submit('tool_outputs', TOOL_OUTPUT_COLUMNS, (output_id, tool, created_at, tokens, output, None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the rows queued so far are committed.
+
+        :return: False if the timeout expired first
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((None, None, done))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Commit the queued rows and stop the writer thread; a later write starts it again."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join()
+            self._thread = None
+
+    def _submit(self, table: str, columns: Tuple[str, ...], values: tuple) -> None:
+        if not constants.RESULT_WRITER_ENABLED:
+            self._write_direct([(table, columns, values)])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put((table, columns, values), timeout=constants.RESULT_WRITER_PUT_TIMEOUT)
+        except queue.Full:
+            logger.warning(f"The result writer queue is full, a row of {table} is written synchronously")
+            self._write_direct([(table, columns, values)])
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch: List[_Item] = []
+            waiters: List[threading.Event] = []
+            deadline = time.monotonic() + constants.RESULT_WRITER_FLUSH_INTERVAL
+            # Group the rows arriving within the flush interval, up to the batch size, into one commit
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif item[0] is None:
+                    waiters.append(item[2])
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= constants.RESULT_WRITER_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(connection, batch)
+            for waiter in waiters:
+                waiter.set()
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        # Only takes effect on a new DB; lets the compaction job release free pages in small steps
+        connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _write_direct(self, batch: List[_Item]) -> None:
+        with self._direct_lock:
+            connection = self._connect()
+            try:
+                self._write_batch(connection, batch)
+            finally:
+                connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: List[_Item]) -> bool:
+        """
+        Write rows in one commit. When the commit fails the rows are written one by one, so that one bad row
+        doesn't lose the others: a tool output id handed out by store_tool_output must be backed by its row.
+
+        :return: True if every row was written
+        """
+        grouped: Dict[Tuple[str, Tuple[str, ...]], List[tuple]] = {}
+        for table, columns, values in batch:
+            grouped.setdefault((table, columns), []).append(values)
+
+        try:
+            # Created before the inserts: migrate_table commits, which would commit the rows inserted so far
+            for table, _ in grouped:
+                self._create_table(connection, table)
+            with connection:
+                for (table, columns), rows in grouped.items():
+                    if ENCODING_COLUMN in columns:
+                        rows = [self._encode_output(connection, columns, row) for row in rows]
+                    connection.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        rows
+                    )
+            self.committed_rows += len(batch)
+            self.commits += 1
+            return True
+        except sqlite3.Error as e:
+            if len(batch) == 1:
+                table, columns, values = batch[0]
+                logger.error(f"Error writing the row {columns[0]}={values[0]!r} of {table} to database: {e}")
+                return False
+            logger.warning(f"Error writing {len(batch)} result rows to database, writing them one by one: {e}")
+            return all([self._write_batch(connection, [item]) for item in batch])
+
+    def _create_table(self, connection: sqlite3.Connection, table: str) -> None:
+        if table in self._created_tables:
+            return
+        for statement in TABLES_DDL.get(table) or [CONSOLE_TABLE_DDL.format(table=table)]:
+            connection.execute(statement)
+        if table != 'nmap_results':
+            migrate_table(connection, table)
+        self._created_tables.add(table)
+
+    @staticmethod
+    def _encode_output(connection: sqlite3.Connection, columns: Tuple[str, ...], row: tuple) -> tuple:
+        # Compressed (and deduplicated) in the writer thread, so the tool call doesn't pay for it
+        def save_blob(digest: str, encoding: str, size: int, data: bytes) -> None:
+            connection.execute("INSERT OR IGNORE INTO blobs (sha256, encoding, size, data) VALUES (?, ?, ?, ?)",
+                               (digest, encoding, size, data))
+
+        values = list(row)
+        output_index = columns.index('output')
+        values[output_index], values[columns.index(ENCODING_COLUMN)] = store_text(values[output_index], save_blob)
+        return tuple(values)
+
+
+def sqlite_path(db_url: str) -> str:
+    """File path of a 'sqlite:///path' URL."""
+    return db_url.split(':///', 1)[1] if ':///' in db_url else db_url
@@ -1,31 +1,56 @@
 import logging
+import os
+import threading
 
 from datetime import datetime
-from sqlalchemy import create_engine, inspect, Engine, select, and_
+from sqlalchemy import create_engine, event, inspect, Engine, select, and_
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, DeclarativeMeta
-from typing import Type, List, Optional, Tuple
+from typing import Dict, Type, List, Optional, Tuple
 
-from utils.dao.sqlalchemy.models import ModuleAuxiliary, ModuleOptionsAuxiliary, DynamicConsoleResult, Base
+import constants
+from utils.dao.blob_store import load_text, migrate_table
+from utils.dao.result_writer import sqlite_path
+from utils.dao.sqlalchemy.models import ModuleAuxiliary, ModuleOptionsAuxiliary, DynamicConsoleResult, Base, \
+    NmapPortResult, ToolOutput, StoredBlob
+from utils.msf.catalog_records import ModuleCatalog
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logging.getLogger('sqlalchemy.engine').setLevel(logging.ERROR)
 
+# Engines (and their connection pools) are shared by all managers of the same DB and access mode
+_engines: Dict[Tuple[str, bool], Engine] = {}
+_engines_lock = threading.Lock()
+# (DB URL, table) pairs whose output_encoding column was checked
+_migrated_tables = set()
+# Module catalogs loaded by get_module_catalog, per DB URL; dropped when modules are inserted
+_module_catalogs: Dict[str, ModuleCatalog] = {}
+
 
 class ManagerAlchemyDB:
     """
     Database manager class for handling SQLAlchemy operations.
     """
 
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, read_only: Optional[bool] = None):
         """
         Initialize the ManagerDB with a database URL.
 
         :param db_url: SQLAlchemy database URL
+        :param read_only: Open the DB read-only and immutable (see create_read_only_engine); by default the
+                          Metasploit catalog (MSF_CATALOG_DB) is opened so when MSF_CATALOG_READ_ONLY is set. Pass
+                          False to import modules into the catalog.
         """
-        self._engine: Engine = create_engine(db_url, echo=True, future=True)
+        if read_only is None:
+            read_only = constants.MSF_CATALOG_READ_ONLY and is_catalog_url(db_url)
+        with _engines_lock:
+            if (db_url, read_only) not in _engines:
+                _engines[(db_url, read_only)] = create_read_only_engine(db_url) if read_only \
+                    else create_engine(db_url, echo=True, future=True)
+        self._engine: Engine = _engines[(db_url, read_only)]
+        self.read_only = read_only
         self._Session = sessionmaker(self._engine)
 
     def create_tables_by_models(self, base: Type[DeclarativeMeta]) -> None:
@@ -44,42 +69,61 @@ class ManagerAlchemyDB:
         """
         Fetch unique 'group' and 'sub_group' values from the ModuleAuxiliary table.
 
-        :return: List of strings with 'group:sub_group' format
+        :return: List of strings with 'group/sub_group' format
+        """
+        catalog = self._module_catalog()
+        return catalog.sub_group_names() if catalog is not None else []
+
+    def get_module_catalog(self) -> Optional[ModuleCatalog]:
+        """
+        Load the whole ModuleAuxiliary table into an in-process catalog of slotted records with interned strings.
+
+        :return: The catalog, or None if it couldn't be read
         """
         try:
             with self._Session() as session:
                 result = session.execute(
-                    select(ModuleAuxiliary.group, ModuleAuxiliary.sub_group).distinct()
-                ).all()
-
-                # Convert the result to a list of strings in the format "group:sub_group"
-                return [f"{row[0]}/{row[1]}" for row in result]
+                    select(ModuleAuxiliary.group, ModuleAuxiliary.sub_group, ModuleAuxiliary.name,
+                           ModuleAuxiliary.rank, ModuleAuxiliary.disclosure_date, ModuleAuxiliary.status_check,
+                           ModuleAuxiliary.description).
+                    order_by(ModuleAuxiliary.id)
+                ).tuples()
+                return ModuleCatalog.from_rows(result)
         except SQLAlchemyError as e:
-            logger.error(f"Error fetching group and sub_group values: {e}")
-            return []
-
-    def get_modules_by_sub_group(self, complex_name: str) -> List[Tuple[str, str]]:
+            logger.error(f"Error loading the module catalog: {e}")
+            return None
+
+    def _module_catalog(self) -> Optional[ModuleCatalog]:
+        """The module catalog of the DB, loaded once per process (see get_module_catalog)."""
+        url = str(self._engine.url)
+        catalog = _module_catalogs.get(url)
+        if catalog is None:
+            catalog = self.get_module_catalog()
+            if catalog is not None:
+                _module_catalogs[url] = catalog
+        return catalog
+
+    def get_modules_by_sub_group(self, complex_name: str) -> List[str]:
         """
-        Retrieve modules by their 'group:sub_group' from the ModuleAuxiliary table.
+        Retrieve modules by their 'group/sub_group' from the module catalog.
 
-        :param complex_name: The name of the group:sub_group to filter modules by
-        :return: List of tuples containing module names and descriptions
+        :param complex_name: The name of the group/sub_group to filter modules by
+        :return: List of module names
         """
-        # Divide complex_name into group and sub_group
-        group_name, sub_group_name = complex_name.split('/')
+        catalog = self._module_catalog()
+        return catalog.modules_by_sub_group(complex_name) if catalog is not None else []
 
-        try:
-            with self._Session() as session:
-                result = session.execute(
-                    select(ModuleAuxiliary.name).
-                    where(and_(ModuleAuxiliary.sub_group == sub_group_name,
-                               ModuleAuxiliary.group == group_name))
-                ).scalars().all()
+    def get_modules_by_sub_groups(self, complex_names: List[str]) -> Dict[str, List[str]]:
+        """
+        Retrieve the modules of several 'group/sub_group' names from the module catalog.
 
-                return result
-        except SQLAlchemyError as e:
-            logger.error(f"Error fetching modules for group '{group_name}' and sub_group '{sub_group_name}': {e}")
-            return []
+        :param complex_names: The names of the group/sub_group pairs to filter modules by
+        :return: Module names per requested name (in the requested order); unknown names get an empty list
+        """
+        catalog = self._module_catalog()
+        if catalog is None:
+            return {name: [] for name in complex_names}
+        return {name: catalog.modules_by_sub_group(name) for name in complex_names}
 
     def get_module_options(self, module_name: str) -> List[Optional[str]]:
         """
@@ -122,6 +166,7 @@ class ManagerAlchemyDB:
                 inspector = inspect(self._engine)
                 if not inspector.has_table(ScanResult.__tablename__):
                     Base.metadata.create_all(self._engine, tables=[ScanResult.__table__])
+                self._ensure_encoding_column(ScanResult.__tablename__)
 
                 # Create a new record
                 new_result = ScanResult(
@@ -137,6 +182,110 @@ class ManagerAlchemyDB:
         except SQLAlchemyError as e:
             logger.error(f"Error writing to database: {e}")
 
+    def write_nmap_results(self, records: List[dict]) -> None:
+        """
+        Write the rows of an nmap scan into the nmap_results table, creating the table if needed.
+
+        :param records: Rows produced by NmapScanResult.to_records
+        """
+        try:
+            Base.metadata.create_all(self._engine, tables=[NmapPortResult.__table__])
+            with self._Session() as session:
+                session.add_all([NmapPortResult(**record) for record in records])
+                session.commit()
+                logger.info(f"{len(records)} nmap rows successfully written to {NmapPortResult.__tablename__}")
+        except SQLAlchemyError as e:
+            logger.error(f"Error writing nmap results to database: {e}")
+
+    def get_open_ports(self, host: str) -> List[Tuple[str, int, str, str, str]]:
+        """
+        Retrieve the open ports recorded for a host across all scans.
+
+        :param host: The host address
+        :return: List of tuples (protocol, port, service, product, version) ordered by port
+        """
+        try:
+            with self._Session() as session:
+                result = session.execute(
+                    select(NmapPortResult.protocol, NmapPortResult.port, NmapPortResult.service,
+                           NmapPortResult.product, NmapPortResult.version).
+                    where(and_(NmapPortResult.host == host, NmapPortResult.state == 'open')).
+                    distinct().
+                    order_by(NmapPortResult.port, NmapPortResult.protocol)
+                ).all()
+                return [tuple(row) for row in result]
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching open ports for host '{host}': {e}")
+            return []
+
+    def write_tool_output(self, output_id: str, tool: str, tokens: int, output: str) -> bool:
+        """
+        Store the raw output of a tool call in the tool_outputs table, creating the table if needed.
+
+        :return: True if the output was stored
+        """
+        try:
+            Base.metadata.create_all(self._engine, tables=[ToolOutput.__table__])
+            self._ensure_encoding_column(ToolOutput.__tablename__)
+            with self._Session() as session:
+                session.add(ToolOutput(id=output_id, tool=tool, tokens=tokens, output=output,
+                                       created_at=datetime.now().isoformat(timespec='seconds')))
+                session.commit()
+                return True
+        except SQLAlchemyError as e:
+            logger.error(f"Error writing the output of '{tool}' to database: {e}")
+            return False
+
+    def get_tool_output(self, output_id: str) -> Optional[ToolOutput]:
+        """
+        Retrieve a stored tool output by its id.
+
+        :return: The ToolOutput row (its output as stored, see get_tool_output_text), or None if it doesn't exist
+        """
+        try:
+            Base.metadata.create_all(self._engine, tables=[ToolOutput.__table__])
+            self._ensure_encoding_column(ToolOutput.__tablename__)
+            with self._Session() as session:
+                return session.get(ToolOutput, output_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the tool output '{output_id}': {e}")
+            return None
+
+    def get_tool_output_text(self, output_id: str) -> Optional[str]:
+        """
+        Retrieve the decompressed text of a stored tool output by its id.
+
+        :return: The output text, or None if it doesn't exist
+        """
+        stored = self.get_tool_output(output_id)
+        return load_text(stored.output, stored.output_encoding, self.get_blob) if stored is not None else None
+
+    def get_blob(self, sha256: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Retrieve a compressed output of the blobs table.
+
+        :return: (encoding, data), or None if there is no such blob
+        """
+        try:
+            with self._Session() as session:
+                blob = session.get(StoredBlob, sha256)
+                return (blob.encoding, blob.data) if blob is not None else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the blob '{sha256}': {e}")
+            return None
+
+    def _ensure_encoding_column(self, table_name: str) -> None:
+        """Add the output_encoding column (and the blobs table) to a table created before they existed."""
+        key = (str(self._engine.url), table_name)
+        if key in _migrated_tables:
+            return
+        connection = self._engine.raw_connection()
+        try:
+            migrate_table(connection, table_name)
+        finally:
+            connection.close()
+        _migrated_tables.add(key)
+
     def insert_module_auxiliary_data(self, data: List[dict]) -> None:
         """
         Insert multiple records into the ModuleAuxiliary table.
@@ -162,6 +311,7 @@ class ManagerAlchemyDB:
                 session.add_all(module_entries)
                 # Save changes
                 session.commit()
+                _module_catalogs.pop(str(self._engine.url), None)
                 logger.info("Data successfully inserted into ModuleAuxiliary")
         except SQLAlchemyError as e:
             logger.error(f"Error inserting data into database: {e}")
@@ -212,6 +362,39 @@ class ManagerAlchemyDB:
             logger.error(f"Error inserting module options for '{module_name}': {e}")
 
 
+def is_catalog_url(db_url: str) -> bool:
+    """Whether the URL points to the Metasploit module catalog (MSF_CATALOG_DB)."""
+    return os.path.abspath(sqlite_path(db_url)) == os.path.abspath(constants.MSF_CATALOG_DB)
+
+
+def create_read_only_engine(db_url: str) -> Engine:
+    """
+    Create an engine reading a SQLite DB that no process writes while it is open, such as the module catalog.
+
+    The file is opened with mode=ro&immutable=1: SQLite takes no locks, keeps no journal and never checks the file
+    for changes, so any number of worker processes read it concurrently. mmap_size covers the whole file, so the
+    pages are read from the OS page cache shared by the processes instead of being copied into every connection.
+    Nothing is written to the file.
+    Changes made to the file after it was opened are not seen until the process restarts.
+    """
+    path = os.path.abspath(sqlite_path(db_url))
+    if not os.path.exists(path):
+        logger.warning(f"{path} does not exist, it is opened read-write")
+        return create_engine(db_url, echo=True, future=True)
+
+    engine = create_engine(f'sqlite:///file:{path}?mode=ro&immutable=1&uri=true', echo=True, future=True)
+    mmap_size = os.path.getsize(path)
+
+    @event.listens_for(engine, 'connect')
+    def configure_connection(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA mmap_size={mmap_size}')
+        cursor.execute('PRAGMA query_only=1')
+        cursor.close()
+
+    return engine
+
+
 def get_table_name() -> str:
     """Generate a table name based on the current date."""
     current_date = datetime.now().strftime("%Y_%m_%d")
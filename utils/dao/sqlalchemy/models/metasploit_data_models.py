@@ -58,3 +58,45 @@ class DynamicConsoleResult(Base):
     module = Column(String)
     output = Column(String)
     compressed_output = Column(String)
+    output_encoding = Column(String, nullable=True)  # see utils.dao.blob_store
+
+
+class NmapPortResult(Base):
+    """A port of a scanned host; hosts without reported ports are stored with an empty port."""
+    __tablename__ = 'nmap_results'
+
+    id = Column(Integer, primary_key=True)
+    scan_id = Column(String, nullable=False, index=True)
+    scanned_at = Column(String, nullable=False)
+    host = Column(String, nullable=False, index=True)
+    hostname = Column(String, nullable=True)
+    host_state = Column(String, nullable=True)
+    protocol = Column(String, nullable=True)
+    port = Column(Integer, nullable=True)
+    state = Column(String, nullable=True)
+    service = Column(String, nullable=True)
+    product = Column(String, nullable=True)
+    version = Column(String, nullable=True)
+    extrainfo = Column(String, nullable=True)
+
+
+class ToolOutput(Base):
+    """Raw output of a tool call; the ToolMessage in the graph state holds a budgeted version and the id."""
+    __tablename__ = 'tool_outputs'
+
+    id = Column(String, primary_key=True)
+    tool = Column(String, nullable=False)
+    created_at = Column(String, nullable=False)
+    tokens = Column(Integer, nullable=False)
+    output = Column(String, nullable=False)
+    output_encoding = Column(String, nullable=True)  # see utils.dao.blob_store
+
+
+class StoredBlob(Base):
+    """A compressed output shared by the rows that reference its sha256 (encoding 'blob')."""
+    __tablename__ = 'blobs'
+
+    sha256 = Column(String, primary_key=True)
+    encoding = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)  # characters of the decompressed text
+    data = Column(LargeBinary, nullable=False)
@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from utils.orm_util import create_message_from_file
+
+# A scripted reply: plain text, a ready AIMessage, or a dict for structured output (script values are List[Any],
+# pydantic would otherwise try to coerce the messages)
+ScriptedReply = Union[str, AIMessage, Dict[str, Any]]
+
+
+def tool_call_reply(name: str, args: Dict[str, Any], content: str = '') -> AIMessage:
+    """Build an AIMessage that calls one tool."""
+    return AIMessage(content=content, tool_calls=[{'name': name, 'args': args, 'id': f'call_{uuid.uuid4().hex[:12]}'}])
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that answers from a script instead of calling a provider.
+
+    Replies are keyed by the system message file of the agent (e.g. 'testing_team/header#1.txt'), so one model
+    instance can be shared by every node of a graph, as NodesFabric does with a real model. Every key has a list
+    of replies which are returned in order; the last one is repeated once the list is exhausted.
+    """
+    script: Dict[str, List[Any]]
+    latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    _fingerprints: Dict[str, str]
+    _positions: Dict[str, int]
+    _state_lock: threading.Lock
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._state_lock = threading.Lock()
+        # The agents format the files' placeholders, so only the text before the first one is matched
+        self._fingerprints = {
+            key: (create_message_from_file(key) or '').split('{')[0][:200].strip() for key in self.script
+        }
+        self.reset()
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted-chat-model'
+
+    def reset(self) -> None:
+        """Start every script from its first reply again."""
+        with self._state_lock:
+            self._positions = {key: 0 for key in self.script}
+
+    def bind_tools(self, tools: List[Any], **kwargs) -> 'ScriptedChatModel':
+        # Tool calls are scripted, the tools themselves are not needed
+        return self
+
+    def with_structured_output(self, schema: Any = None, **kwargs) -> RunnableLambda:
+        def structured(prompt_value) -> Dict[str, Any]:
+            reply = self._next_reply(prompt_value.to_messages())
+            if not isinstance(reply, dict):
+                raise TypeError(f"A structured reply must be a dict, got: {reply!r}")
+            return reply
+
+        return RunnableLambda(structured)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs) -> ChatResult:
+        reply = self._next_reply(messages)
+        message = reply if isinstance(reply, AIMessage) else AIMessage(content=str(reply))
+        message = message.model_copy(update={'usage_metadata': {
+            'input_tokens': self.prompt_tokens,
+            'output_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens
+        }})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _next_reply(self, messages: List[BaseMessage]) -> ScriptedReply:
+        key = self._match_key(messages)
+        with self._state_lock:
+            replies = self.script[key]
+            position = self._positions[key]
+            self._positions[key] = position + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        return replies[min(position, len(replies) - 1)]
+
+    def _match_key(self, messages: List[BaseMessage]) -> str:
+        # System messages are plain text, or text blocks when the prefix carries cache_control
+        system_text = ' '.join(
+            message.content if isinstance(message.content, str)
+            else ' '.join(block.get('text', '') for block in message.content if isinstance(block, dict))
+            for message in messages if isinstance(message, SystemMessage)
+        )
+        for key, fingerprint in self._fingerprints.items():
+            if fingerprint and fingerprint in system_text:
+                return key
+        raise KeyError(f"No scripted replies for the prompt: {system_text[:200]!r}")
+
+
+def scripted_llm_factory(model: ScriptedChatModel) -> Callable[..., ScriptedChatModel]:
+    """Drop-in replacement of utils.llm.create_llm that always returns the scripted model."""
+    def create_llm(model_name: Any = None, temperature: float = 0) -> ScriptedChatModel:
+        return model
+
+    return create_llm
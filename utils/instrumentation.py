@@ -0,0 +1,248 @@
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import constants
+
+METRIC_PREFIX = 'pentest'
+
+# event kind -> (Prometheus metric, help text) of its duration summary
+DURATION_METRICS = {
+    'node': ('node_duration_seconds', 'Wall time of graph nodes.'),
+    'llm': ('llm_latency_seconds', 'Latency of LLM calls.'),
+    'tool': ('tool_duration_seconds', 'Wall time of tool runs.'),
+    'queue_wait': ('tool_queue_wait_seconds', 'Time a tool call waited before it started.'),
+}
+
+COUNTER_HELP = {
+    'compaction_reclaimed_bytes_total': 'Bytes of the results DB and snapshots reclaimed by the compaction job.',
+    'llm_prompt_tokens_total': 'Prompt tokens sent to LLMs.',
+    'llm_completion_tokens_total': 'Completion tokens returned by LLMs.',
+    'llm_cached_prompt_tokens_total': 'Prompt tokens served from the provider prompt cache.',
+    'llm_cache_creation_tokens_total': 'Prompt tokens written to the provider prompt cache.',
+    'llm_uncached_prompt_tokens_total': 'Prompt tokens processed without the prompt cache.',
+    'msf_console_polls_total': 'console.read calls made while waiting for Metasploit output.',
+    'plan_cache_hits_total': 'Planner team runs served from the cross-run plan cache.',
+    'plan_cache_misses_total': 'Planner team runs that were not in the plan cache.',
+    'recon_targets_total': 'Targets scanned by the speculative reconnaissance.',
+    'router_fast_path_total': 'Chooser decisions taken from the message keywords without an LLM call.',
+    'router_llm_fallback_total': 'Chooser decisions that needed an LLM call.',
+}
+
+
+class Instrumentation:
+    """
+    Process-wide collector of structured timings and counters.
+
+    Events (node enter/exit, LLM calls with token usage, tool runs, queue waits) are kept in memory and can be
+    exported as JSONL; durations and counters are aggregated for the Prometheus text format.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(Instrumentation, cls).__new__(cls)
+                cls._instance._data_lock = threading.RLock()
+                cls._instance._run_depth = 0
+                cls._instance.reset()
+        return cls._instance
+
+    def reset(self) -> None:
+        with self._data_lock:
+            self.events: List[Dict[str, Any]] = []
+            self._durations: Dict[Tuple[str, Tuple], List[float]] = {}
+            self._counters: Dict[Tuple[str, Tuple], float] = {}
+
+    def record(self, kind: str, name: str, duration: Optional[float] = None, **fields) -> None:
+        """
+        Record an event; events with a duration are also aggregated per (kind, name).
+
+        :param kind: Event kind, e.g. 'node', 'llm', 'tool', 'queue_wait'
+        :param name: Name of the node, agent or tool
+        :param duration: Duration in seconds
+        :param fields: Additional event fields (token counts, status, ...)
+        """
+        if not constants.INSTRUMENTATION_ENABLED:
+            return
+
+        event = {'ts': time.time(), 'kind': kind, 'name': name, **fields}
+        if duration is not None:
+            event['duration_s'] = duration
+
+        with self._data_lock:
+            self.events.append(event)
+            if duration is not None:
+                self._durations.setdefault((kind, (('name', name),)), []).append(duration)
+
+    def increment(self, counter: str, value: float = 1, **labels) -> None:
+        """Increase a counter, e.g. increment('llm_prompt_tokens_total', 120, name='host_node')."""
+        if not constants.INSTRUMENTATION_ENABLED:
+            return
+        key = (counter, tuple(sorted(labels.items())))
+        with self._data_lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def span(self, kind: str, name: str, **fields) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block and record it as an event. The yielded dict may be filled with extra event fields.
+        """
+        extra: Dict[str, Any] = {}
+        start_time = time.perf_counter()
+        status = 'ok'
+        try:
+            yield extra
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.record(kind, name, duration=time.perf_counter() - start_time, status=status, **fields, **extra)
+
+    def record_llm_response(self, name: str, response: Any, duration: float) -> None:
+        """
+        Record an LLM call with the token usage reported in the response's usage_metadata (if any).
+
+        Prompt tokens are split into cached ones (read from the provider's prompt cache), the ones written to the
+        cache (Anthropic cache_control) and uncached ones.
+        """
+        usage = getattr(response, 'usage_metadata', None) or {}
+        prompt_tokens = usage.get('input_tokens', 0)
+        completion_tokens = usage.get('output_tokens', 0)
+        input_details = usage.get('input_token_details') or {}
+        cached_tokens = input_details.get('cache_read') or 0
+        cache_creation_tokens = input_details.get('cache_creation') or 0
+        uncached_tokens = max(prompt_tokens - cached_tokens - cache_creation_tokens, 0)
+
+        self.record('llm', name, duration=duration, prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens, cached_tokens=cached_tokens,
+                    cache_creation_tokens=cache_creation_tokens, uncached_tokens=uncached_tokens)
+        self.increment('llm_prompt_tokens_total', prompt_tokens, name=name)
+        self.increment('llm_completion_tokens_total', completion_tokens, name=name)
+        self.increment('llm_cached_prompt_tokens_total', cached_tokens, name=name)
+        self.increment('llm_cache_creation_tokens_total', cache_creation_tokens, name=name)
+        self.increment('llm_uncached_prompt_tokens_total', uncached_tokens, name=name)
+
+    def counter_total(self, counter: str, **labels) -> float:
+        """Sum of a counter over the label sets matching the given labels, e.g. counter_total('router_fast_path_total')."""
+        with self._data_lock:
+            return sum(value for (name, counter_labels), value in self._counters.items()
+                       if name == counter and set(labels.items()) <= set(counter_labels))
+
+    def llm_token_summary(self) -> Dict[str, int]:
+        """Totals of prompt, cached, cache creation, uncached and completion tokens over the recorded LLM calls."""
+        fields = ('prompt_tokens', 'cached_tokens', 'cache_creation_tokens', 'uncached_tokens', 'completion_tokens')
+        with self._data_lock:
+            calls = [event for event in self.events if event['kind'] == 'llm']
+        summary = {field: sum(event.get(field, 0) for event in calls) for field in fields}
+        summary['calls'] = len(calls)
+        return summary
+
+    def invoke_llm(self, agent: Any, agent_input: Any, name: str) -> Any:
+        """Invoke an agent (prompt | model chain) and record its latency and token usage."""
+        start_time = time.perf_counter()
+        response = agent.invoke(agent_input)
+        self.record_llm_response(name, response, time.perf_counter() - start_time)
+        return response
+
+    def begin_run(self) -> bool:
+        """Mark the start of a graph execution; returns True for the outermost one."""
+        with self._data_lock:
+            self._run_depth += 1
+            return self._run_depth == 1
+
+    def end_run(self) -> bool:
+        """Mark the end of a graph execution; returns True for the outermost one."""
+        with self._data_lock:
+            self._run_depth -= 1
+            return self._run_depth == 0
+
+    def export_jsonl(self, file_path: str) -> None:
+        with self._data_lock:
+            events = list(self.events)
+        with open(file_path, 'w') as file_writer:
+            for event in events:
+                file_writer.write(json.dumps(event, default=str))
+                file_writer.write('\n')
+
+    def export_prometheus(self) -> str:
+        """Return the aggregated metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._data_lock:
+            durations = dict(self._durations)
+            counters = dict(self._counters)
+
+        for kind, (metric, help_text) in DURATION_METRICS.items():
+            series = {labels: values for (event_kind, labels), values in durations.items() if event_kind == kind}
+            if not series:
+                continue
+            full_name = f'{METRIC_PREFIX}_{metric}'
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} summary')
+            for labels, values in sorted(series.items()):
+                lines.append(f'{full_name}_count{_format_labels(labels)} {len(values)}')
+                lines.append(f'{full_name}_sum{_format_labels(labels)} {sum(values):.6f}')
+
+        for counter in sorted({name for name, _ in counters}):
+            full_name = f'{METRIC_PREFIX}_{counter}'
+            lines.append(f'# HELP {full_name} {COUNTER_HELP.get(counter, counter)}')
+            lines.append(f'# TYPE {full_name} counter')
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter:
+                    lines.append(f'{full_name}{_format_labels(labels)} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory: Optional[str] = None) -> Optional[str]:
+        """
+        Write the collected events (JSONL) and metrics (Prometheus text) into the directory.
+
+        :return: The common path prefix of the written files, or None if instrumentation is disabled
+        """
+        directory = directory or constants.INSTRUMENTATION_EXPORT_DIR
+        if not constants.INSTRUMENTATION_ENABLED or not directory:
+            return None
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        prefix = f"{directory}/run_{datetime.datetime.now().strftime('%Y_%m_%d_%H-%M-%S')}"
+        self.export_jsonl(f'{prefix}.jsonl')
+        with open(f'{prefix}.prom', 'w') as file_writer:
+            file_writer.write(self.export_prometheus())
+        return prefix
+
+
+def instrument_node(default_name: Optional[str] = None) -> Callable:
+    """
+    Decorator for node functions: records enter/exit timing of the node under its 'name' argument
+    (or default_name for nodes created without one).
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = kwargs.get('name') or default_name or func.__name__
+            instrumentation = Instrumentation()
+            instrumentation.record('node_enter', name)
+            with instrumentation.span('node', name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
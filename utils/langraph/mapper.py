@@ -1,4 +1,5 @@
 import datetime
+import gzip
 import json
 from typing import Any, Dict, List
 
@@ -6,6 +7,8 @@ from langchain_core.load.load import loads
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langgraph.pregel import StateSnapshot
 
+import constants
+
 
 def save_snapshot_in_json(list_snapshots: List[StateSnapshot], team_name: str):
     """
@@ -14,7 +17,7 @@ def save_snapshot_in_json(list_snapshots: List[StateSnapshot], team_name: str):
     Args:
         list_snapshots: List of StateSnapshot objects to save.
 
-    The file will be saved in the 'resources/states/' directory with a
+    The file will be saved in the STATES_FOLDER directory ('resources/states/') with a
     timestamp-based filename.
     """
     list_json = []
@@ -22,7 +25,7 @@ def save_snapshot_in_json(list_snapshots: List[StateSnapshot], team_name: str):
         list_json.append(_state_to_json(snapshot))
 
     # Generate a unique file name with the current date and time
-    with open(f'resources/states/{team_name.replace(" ", "_")}_snapshots_{datetime.datetime.now().strftime("%d_%m_%Y_%H_%M")}', 'x') as file_writer:
+    with open(f'{constants.STATES_FOLDER}/{team_name.replace(" ", "_")}_snapshots_{datetime.datetime.now().strftime("%d_%m_%Y_%H_%M")}', 'x') as file_writer:
         for snapshot_json in list_json:
             file_writer.write(snapshot_json)
             file_writer.write('\n\n')
@@ -33,13 +36,14 @@ def load_snapshot_from_json(file_path: str, position: int = 0) -> StateSnapshot:
     Load a StateSnapshot object from a JSON file.
 
     Args:
-        file_path: Path to the file where the snapshots are stored.
+        file_path: Path to the file where the snapshots are stored (gzipped by the compaction job if it ends
+            with '.gz').
         position: The position in the file to read from (default is 0).
 
     Returns:
         A StateSnapshot object restored from the JSON data.
     """
-    with open(file_path, 'r') as f:
+    with (gzip.open(file_path, 'rt') if file_path.endswith('.gz') else open(file_path, 'r')) as f:
         text_json = f.read().split('\n\n')
     return _json_to_state_snapshot(text_json[position])
 
@@ -1,8 +1,22 @@
-from typing import Optional
+from __future__ import annotations
 
+import functools
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from langchain_core.runnables import Runnable
+
+import constants
 from utils.literals import MODEL
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
+
+if TYPE_CHECKING:
+    # The provider packages take most of the start-up time; they are imported when the first client is built
+    from langchain_anthropic import ChatAnthropic
+    from langchain_openai import ChatOpenAI
+
+
+OPENAI = 'openai'
+ANTHROPIC = 'anthropic'
 
 
 def get_correct_anthropic_name(model_name: str) -> Optional[str]:
@@ -15,12 +29,75 @@ def get_correct_anthropic_name(model_name: str) -> Optional[str]:
     return None
 
 
-def create_llm(model_name: MODEL, temperature: float = 0) -> ChatOpenAI:
+class LazyChatModel(Runnable):
+    """
+    Chat model whose client is built on first use.
+
+    bind_tools and with_structured_output return lazy runnables as well, so graphs can be built (and their
+    agents configured) without importing the provider packages or creating any client.
+    """
+
+    def __init__(self, factory: Callable[[], Runnable], name: str, provider: str):
+        self._factory = factory
+        self._model: Optional[Runnable] = None
+        self._lock = threading.Lock()
+        self.name = name
+        self.provider = provider
+
+    @property
+    def model(self) -> Runnable:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        return await self.model.ainvoke(input, config, **kwargs)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> LazyChatModel:
+        return LazyChatModel(lambda: self.model.bind_tools(tools, **kwargs), name=f'{self.name}.bind_tools',
+                             provider=self.provider)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> LazyChatModel:
+        return LazyChatModel(lambda: self.model.with_structured_output(schema, **kwargs),
+                             name=f'{self.name}.with_structured_output', provider=self.provider)
+
+
+def _build_llm(model_name: MODEL, temperature: float) -> ChatOpenAI | ChatAnthropic:
     if 'gpt' in model_name:
+        from langchain_openai import ChatOpenAI
         llm = ChatOpenAI(model=model_name, temperature=temperature)
-    elif 'claude' in model_name.lower():
+    else:
+        from langchain_anthropic import ChatAnthropic
         correct_anthropic_name = get_correct_anthropic_name(model_name)
         llm = ChatAnthropic(model_name=correct_anthropic_name, temperature=temperature)
+    return llm
+
+
+@functools.lru_cache(maxsize=None)
+def create_llm(model_name: MODEL, temperature: float = 0) -> LazyChatModel:
+    """
+    Return the (lazily built) client of a model; graphs asking for the same model and temperature share it.
+    """
+    if 'gpt' in model_name:
+        provider = OPENAI
+    elif 'claude' in model_name.lower():
+        provider = ANTHROPIC
     else:
         raise ValueError('model_name doesn\'t exist as a key in the following list: \'gpt\', \'claude\'')
-    return llm
+    return LazyChatModel(functools.partial(_build_llm, model_name, temperature), name=model_name, provider=provider)
+
+
+def supports_cache_control(model_llm: Any) -> bool:
+    """
+    Whether the prompt of this model should mark its static prefix with Anthropic's cache_control.
+    OpenAI caches identical prompt prefixes automatically and rejects the extra field, so it is only set for Anthropic.
+    """
+    if not constants.PROMPT_CACHE_ENABLED:
+        return False
+    provider = getattr(model_llm, 'provider', None)
+    return provider == ANTHROPIC or type(model_llm).__name__ == 'ChatAnthropic'
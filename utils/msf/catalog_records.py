@@ -0,0 +1,100 @@
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class StringTable:
+    """
+    Interned strings with dense integer ids: every distinct string is kept once, and referenced by its id.
+    """
+    __slots__ = ('_ids', '_strings')
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def intern(self, text: str) -> int:
+        """Id of the string, added to the table if it is new."""
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self._strings)
+            self._strings.append(sys.intern(text))
+        return string_id
+
+    def get(self, text: str) -> Optional[int]:
+        return self._ids.get(text)
+
+    def __getitem__(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __iter__(self):
+        return iter(self._strings)
+
+
+@dataclass(slots=True)
+class ModuleRecord:
+    """A module of the catalog; group, sub_group, rank and status_check are interned, shared by all modules."""
+    group: str
+    sub_group: str
+    name: str
+    rank: str
+    disclosure_date: Optional[str] = None
+    status_check: Optional[str] = None
+    description: Optional[str] = None
+
+
+class ModuleCatalog:
+    """
+    In-process module catalog: ModuleRecord rows and, per 'group/sub_group' id of a StringTable, the array of the
+    rows of that sub-group.
+    """
+    __slots__ = ('modules', 'sub_groups', '_sub_group_rows', '_rows_by_name')
+
+    def __init__(self, modules: Sequence[ModuleRecord]):
+        self.modules: List[ModuleRecord] = list(modules)
+        self.sub_groups = StringTable()
+        self._sub_group_rows: List[array] = []
+        self._rows_by_name: Dict[str, int] = {module.name: row for row, module in enumerate(self.modules)}
+        # (group, sub_group) -> rows; the 'group/sub_group' string is built once per sub-group, not once per module
+        rows_by_pair: Dict[Tuple[str, str], array] = {}
+        for row, module in enumerate(self.modules):
+            rows = rows_by_pair.get((module.group, module.sub_group))
+            if rows is None:
+                rows = rows_by_pair[(module.group, module.sub_group)] = array('I')
+            rows.append(row)
+        for (group, sub_group), rows in rows_by_pair.items():
+            self.sub_groups.intern(f'{group}/{sub_group}')
+            self._sub_group_rows.append(rows)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> 'ModuleCatalog':
+        """
+        :param rows: (group, sub_group, name, rank, disclosure_date, status_check, description) tuples
+        """
+        intern = sys.intern
+        return cls([
+            ModuleRecord(intern(group), intern(sub_group), name, intern(rank), disclosure_date,
+                         intern(status_check) if status_check is not None else None, description)
+            for group, sub_group, name, rank, disclosure_date, status_check, description in rows
+        ])
+
+    def __len__(self) -> int:
+        return len(self.modules)
+
+    def sub_group_names(self) -> List[str]:
+        """The 'group/sub_group' names, in catalog order."""
+        return list(self.sub_groups)
+
+    def modules_by_sub_group(self, complex_name: str) -> List[str]:
+        sub_group_id = self.sub_groups.get(complex_name)
+        if sub_group_id is None:
+            return []
+        return [self.modules[row].name for row in self._sub_group_rows[sub_group_id]]
+
+    def module(self, name: str) -> Optional[ModuleRecord]:
+        row = self._rows_by_name.get(name)
+        return self.modules[row] if row is not None else None
@@ -0,0 +1,301 @@
+"""
+Immutable, memory-mapped snapshot of the Metasploit module catalog.
+
+Layout of the file (native byte order, every array of uint32):
+    header          MAGIC, byte-order mark, counts and the offset of every section
+    string offsets  n_strings + 1 offsets into the string data; the strings are unique and sorted, so comparing
+                    two string ids compares the strings
+    modules         name, rank, disclosure date, check, description: one string-id column each, rows sorted by
+                    (group, sub_group, catalog id) so every sub-group is a contiguous range of rows
+    options         n_modules + 1 offsets into the option values, and the option values (string ids)
+    name order      row numbers sorted by module name, searched with bisection
+    sub-groups      'group/sub_group' string ids (sorted), first row and end row of every sub-group
+    string data     UTF-8
+Worker processes mapping the same file share one physical copy through the OS page cache.
+
+Example:
+    python -m utils.msf.catalog_snapshot
+"""
+import argparse
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+import constants
+from utils.dao.result_writer import sqlite_path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MSFCAT01'
+BYTE_ORDER_MARK = 0x01020304
+NULL = 0xFFFFFFFF  # string id of a NULL column
+# magic, byte-order mark, n_strings, n_modules, n_sub_groups, n_option_values, source version id,
+# then the offsets of the 12 uint32 sections and of the string data
+HEADER = struct.Struct('=8sIIIIII' + 'I' * 13)
+MODULE_COLUMNS = ('name', 'rank', 'disclosure_date', 'status_check', 'description')
+OPTION_COLUMNS = [f'parameter_{i}' for i in range(1, 20)]
+
+_snapshots: Dict[str, 'CatalogSnapshot'] = {}
+_snapshots_lock = threading.Lock()
+
+
+class CatalogSnapshot:
+    """
+    Read access to a catalog snapshot: sub-group ranges by index in O(1), module names and sub-group names
+    by bisection in O(log n). Nothing is copied out of the mapping but the strings that are returned.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file_reader:
+            self._mmap = mmap.mmap(file_reader.fileno(), 0, access=mmap.ACCESS_READ)
+        view = self._view = memoryview(self._mmap)
+        (magic, byte_order_mark, n_strings, n_modules, n_sub_groups, n_option_values, version_id,
+         *offsets) = HEADER.unpack_from(view)
+        if magic != MAGIC or byte_order_mark != BYTE_ORDER_MARK:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not a catalog snapshot of this platform")
+
+        def uint32s(section: int, count: int) -> memoryview:
+            return view[offsets[section]:offsets[section] + 4 * count].cast('I')
+
+        self._string_offsets = uint32s(0, n_strings + 1)
+        self._columns = {column: uint32s(1 + i, n_modules) for i, column in enumerate(MODULE_COLUMNS)}
+        self._option_offsets = uint32s(6, n_modules + 1)
+        self._option_values = uint32s(7, n_option_values)
+        self._name_order = uint32s(8, n_modules)
+        self._sub_group_names = uint32s(9, n_sub_groups)
+        self._sub_group_starts = uint32s(10, n_sub_groups)
+        self._sub_group_ends = uint32s(11, n_sub_groups)
+        self._string_data = view[offsets[12]:]
+        self.source_version = self.string(version_id)
+
+    def __len__(self) -> int:
+        return len(self._name_order)
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NULL:
+            return None
+        return bytes(self._string_data[self._string_offsets[string_id]:self._string_offsets[string_id + 1]]).decode()
+
+    def string_id(self, text: str) -> Optional[int]:
+        """Id of a string of the table, found by bisection, or None."""
+        low, high = 0, len(self._string_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(middle) < text:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self._string_offsets) - 1 and self.string(low) == text else None
+
+    def sub_groups(self) -> List[str]:
+        """The 'group/sub_group' names, sorted."""
+        return [self.string(string_id) for string_id in self._sub_group_names]
+
+    def modules_by_sub_group(self, complex_name: str) -> List[str]:
+        """Module names of a 'group/sub_group', in catalog order."""
+        index = _bisect(self._sub_group_names, self.string_id(complex_name))
+        if index is None:
+            return []
+        names = self._columns['name']
+        return [self.string(names[row]) for row in range(self._sub_group_starts[index], self._sub_group_ends[index])]
+
+    def modules_by_sub_groups(self, complex_names: List[str]) -> Dict[str, List[str]]:
+        return {name: self.modules_by_sub_group(name) for name in complex_names}
+
+    def find_module(self, name: str) -> Optional[int]:
+        """Row of a module by its name."""
+        string_id = self.string_id(name)
+        if string_id is None:
+            return None
+        names = self._columns['name']
+        low, high = 0, len(self._name_order)
+        while low < high:
+            middle = (low + high) // 2
+            if names[self._name_order[middle]] < string_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._name_order) and names[self._name_order[low]] == string_id:
+            return self._name_order[low]
+        return None
+
+    def module(self, name: str) -> Optional[Dict[str, Optional[str]]]:
+        """The catalog columns of a module, or None if it is not in the catalog."""
+        row = self.find_module(name)
+        if row is None:
+            return None
+        return {column: self.string(values[row]) for column, values in self._columns.items()}
+
+    def module_options(self, name: str) -> List[str]:
+        """The non-null options of a module."""
+        row = self.find_module(name)
+        if row is None:
+            return []
+        return [self.string(string_id)
+                for string_id in self._option_values[self._option_offsets[row]:self._option_offsets[row + 1]]]
+
+    def close(self) -> None:
+        # The mapping can only be closed once no view of it is left
+        for view in (self._string_offsets, *self._columns.values(), self._option_offsets, self._option_values,
+                     self._name_order, self._sub_group_names, self._sub_group_starts, self._sub_group_ends,
+                     self._string_data, self._view):
+            view.release()
+        self._mmap.close()
+
+
+def export_catalog(db_path: Optional[str] = None, snapshot_path: Optional[str] = None) -> str:
+    """
+    Write the snapshot of a catalog DB. The file is replaced atomically: processes that mapped the previous
+    snapshot keep reading it.
+
+    :return: The snapshot path
+    """
+    db_path = db_path or constants.MSF_CATALOG_DB
+    snapshot_path = snapshot_path or constants.CATALOG_SNAPSHOT_PATH
+    connection = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
+    try:
+        modules = connection.execute(
+            f'SELECT "group", sub_group, {", ".join(MODULE_COLUMNS)} FROM modules ORDER BY "group", sub_group, id'
+        ).fetchall()
+        options: Dict[str, List[str]] = {}
+        for module_name, *values in connection.execute(
+                f"SELECT module_name, {', '.join(OPTION_COLUMNS)} FROM module_options_auxiliary ORDER BY id"):
+            # Like get_module_options: the first row of a module
+            options.setdefault(module_name, [value for value in values if value is not None])
+    finally:
+        connection.close()
+
+    version = catalog_version(db_path)
+    sub_group_rows: Dict[str, List[int]] = {}
+    for row, (group, sub_group, *_) in enumerate(modules):
+        sub_group_rows.setdefault(f'{group}/{sub_group}', []).append(row)
+
+    strings = sorted({version, *sub_group_rows,
+                      *(value for module in modules for value in module[2:] if value is not None),
+                      *(value for values in options.values() for value in values)})
+    string_ids = {text: string_id for string_id, text in enumerate(strings)}
+
+    def ids(values) -> array:
+        return array('I', (NULL if value is None else string_ids[value] for value in values))
+
+    encoded = [text.encode() for text in strings]
+    string_offsets = array('I', [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    columns = [ids(module[2 + i] for module in modules) for i in range(len(MODULE_COLUMNS))]
+    option_offsets, option_values = array('I', [0]), array('I')
+    for module in modules:
+        option_values.extend(ids(options.get(module[2], [])))
+        option_offsets.append(len(option_values))
+    name_order = array('I', sorted(range(len(modules)), key=lambda row: columns[0][row]))
+    sub_groups = sorted(sub_group_rows)
+    sections = [string_offsets, *columns, option_offsets, option_values, name_order,
+                ids(sub_groups),
+                array('I', (sub_group_rows[name][0] for name in sub_groups)),
+                array('I', (sub_group_rows[name][-1] + 1 for name in sub_groups))]
+
+    offsets, position = [], HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += section.itemsize * len(section)
+
+    directory = os.path.dirname(snapshot_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    temporary_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as file_writer:
+        file_writer.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, len(strings), len(modules), len(sub_groups),
+                                      len(option_values), string_ids[version], *offsets, position))
+        for section in sections:
+            section.tofile(file_writer)
+        file_writer.write(b''.join(encoded))
+    os.replace(temporary_path, snapshot_path)
+    return snapshot_path
+
+
+def catalog_snapshot(db_url: str) -> Optional[CatalogSnapshot]:
+    """
+    The snapshot of the catalog behind the DB URL, mapped once per process and exported again when it is missing or
+    older than the catalog; None if the URL is not the catalog, snapshots are disabled or the export failed.
+    """
+    if not constants.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    db_path = os.path.abspath(sqlite_path(db_url))
+    if db_path != os.path.abspath(constants.MSF_CATALOG_DB) or not os.path.exists(db_path):
+        return None
+
+    version = catalog_version(db_path)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(db_path)
+        # A replaced snapshot is not closed: a thread may still be reading it, the mapping is freed with it
+        if snapshot is None or snapshot.source_version != version:
+            snapshot = _load_or_export(db_path, constants.CATALOG_SNAPSHOT_PATH, version)
+            if snapshot is None:
+                _snapshots.pop(db_path, None)
+                return None
+            _snapshots[db_path] = snapshot
+        return snapshot
+
+
+def catalog_version(db_path: Optional[str] = None) -> str:
+    """Version of the Metasploit module catalog, derived from the size and modification time of its DB file."""
+    db_path = db_path or constants.MSF_CATALOG_DB
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return 'missing'
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def _load_or_export(db_path: str, snapshot_path: str, version: str) -> Optional[CatalogSnapshot]:
+    try:
+        if os.path.exists(snapshot_path):
+            snapshot = CatalogSnapshot(snapshot_path)
+            if snapshot.source_version == version:
+                return snapshot
+            snapshot.close()
+        export_catalog(db_path, snapshot_path)
+        return CatalogSnapshot(snapshot_path)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logger.warning(f"The catalog snapshot is not available: {e}")
+        return None
+
+
+def _bisect(values: memoryview, value: Optional[int]) -> Optional[int]:
+    """Index of a value in a sorted uint32 array, or None."""
+    if value is None:
+        return None
+    low, high = 0, len(values)
+    while low < high:
+        middle = (low + high) // 2
+        if values[middle] < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low if low < len(values) and values[low] == value else None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Export the Metasploit module catalog into a snapshot file.')
+    parser.add_argument('--db', default=constants.MSF_CATALOG_DB)
+    parser.add_argument('--output', default=constants.CATALOG_SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    path = export_catalog(args.db, args.output)
+    snapshot = CatalogSnapshot(path)
+    print(f"{path}: {len(snapshot)} modules, {len(snapshot.sub_groups())} sub-groups, "
+          f"{os.path.getsize(path) / 1024:.1f} KB")
+    snapshot.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,23 @@ import threading
 from pymetasploit3.msfrpc import MsfRpcClient
 
 from constants import PASSWORD, HOST, PORT, SSL, FALSE
+from utils.record_replay import RecordReplay, REPLAY
+
+
+class RecordReplayMsfRpcClient(MsfRpcClient):
+    """
+    MsfRpcClient whose RPC calls are recorded or replayed by RecordReplay.
+
+    In replay mode no connection to msfrpcd is made, including the login performed by the constructor.
+    """
+
+    def call(self, method, opts=None, is_raw=False):
+        # Snapshot the options before the parent inserts the token and clears the list;
+        # auth.* options hold credentials and random tokens, so they are not part of the request key
+        request = {'method': method, 'opts': [] if method.startswith('auth.') else list(opts or [])}
+        return RecordReplay().call('msf_rpc', request, lambda: super(RecordReplayMsfRpcClient, self).call(
+            method, opts, is_raw
+        ))
 
 
 class CustomMsfRpcClient:
@@ -16,11 +33,18 @@ class CustomMsfRpcClient:
                 # Create a new instance
                 cls._instance = super(CustomMsfRpcClient, cls).__new__(cls)
 
-                # Initialize environment variables
-                cls._instance._get_env_vars()
+                record_replay = RecordReplay()
+
+                # Initialize environment variables; a replayed client never connects, so they are optional
+                if record_replay.mode == REPLAY:
+                    cls._instance.password, cls._instance.host, cls._instance.port = '', None, None
+                    cls._instance.ssl = False
+                else:
+                    cls._instance._get_env_vars()
 
                 # Initialize the MsfRpcClient with the loaded environment variables
-                cls._instance.client = MsfRpcClient(
+                client_class = MsfRpcClient if record_replay.mode is None else RecordReplayMsfRpcClient
+                cls._instance.client = client_class(
                     password=cls._instance.password,
                     host=cls._instance.host,
                     port=cls._instance.port,
@@ -0,0 +1,232 @@
+import itertools
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import msgpack
+import yaml
+
+DEFAULT_OUTPUT = [
+    '[*] Fake msfrpcd: module started\n',
+    '[*] Auxiliary module execution completed\n'
+]
+
+USE_COMMAND_PATTERN = re.compile(r'^use\s+(\S+)', re.MULTILINE)
+RUN_COMMAND_PATTERN = re.compile(r'^(run|exploit)\s*$', re.MULTILINE)
+
+
+class FakeModuleScript:
+    """
+    Scripted console output of a single module: the chunks become readable one after another,
+    each one chunk_delay seconds after the previous one.
+    """
+
+    def __init__(self, chunks: Optional[List[str]] = None, chunk_delay: float = 0.0):
+        self.chunks = chunks or DEFAULT_OUTPUT
+        self.chunk_delay = chunk_delay
+
+
+class FakeMsfRpcScenario:
+    """
+    Behaviour of the fake msfrpcd: latency added to every RPC call and scripted outputs per module.
+
+    Example of a scenario file (YAML or JSON):
+        rpc_latency: 0.005
+        default:
+          chunk_delay: 0.2
+        modules:
+          auxiliary/scanner/smb/smb_version:
+            chunk_delay: 0.5
+            chunks:
+              - "[+] 10.10.11.23:445 - SMB Detected\\n"
+              - "[*] Auxiliary module execution completed\\n"
+    """
+
+    def __init__(self, rpc_latency: float = 0.0, default: Optional[FakeModuleScript] = None,
+                 modules: Optional[Dict[str, FakeModuleScript]] = None):
+        self.rpc_latency = rpc_latency
+        self.default = default or FakeModuleScript()
+        self.modules = modules or {}
+
+    def get_script(self, module: str) -> FakeModuleScript:
+        return self.modules.get(module, self.default)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FakeMsfRpcScenario':
+        return cls(
+            rpc_latency=data.get('rpc_latency', 0.0),
+            default=FakeModuleScript(**data['default']) if data.get('default') else None,
+            modules={name: FakeModuleScript(**script) for name, script in (data.get('modules') or {}).items()}
+        )
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'FakeMsfRpcScenario':
+        with open(file_path, 'r') as file_reader:
+            return cls.from_dict(yaml.safe_load(file_reader))
+
+
+class _FakeConsole:
+
+    def __init__(self, cid: str):
+        self.cid = cid
+        self.prompt = 'msf6 > '
+        self.pending: List[tuple] = []  # (ready_at, chunk)
+        self.module: Optional[str] = None
+
+
+class FakeMsfRpcState:
+    """In-memory state of the fake msfrpcd: consoles, jobs and call statistics."""
+
+    def __init__(self, scenario: FakeMsfRpcScenario):
+        self.scenario = scenario
+        self.consoles: Dict[str, _FakeConsole] = {}
+        self.jobs: Dict[str, str] = {}
+        self.calls: Dict[str, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def dispatch(self, method: str, args: List[Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+        handler = getattr(self, '_' + method.replace('.', '_'), None)
+        if handler is None:
+            return {'error': True, 'error_class': 'ArgumentError', 'error_message': f'Unknown API Call: {method}'}
+        return handler(*args)
+
+    def _auth_login(self, username: str, password: str) -> Dict[str, Any]:
+        return {'result': 'success', 'token': uuid.uuid4().hex}
+
+    def _auth_token_add(self, token: str) -> Dict[str, Any]:
+        return {'result': 'success'}
+
+    def _console_create(self, *args) -> Dict[str, Any]:
+        with self._lock:
+            cid = str(next(self._ids))
+            self.consoles[cid] = _FakeConsole(cid)
+        return {'id': cid, 'prompt': 'msf6 > ', 'busy': False}
+
+    def _console_list(self) -> Dict[str, Any]:
+        with self._lock:
+            consoles = [{'id': cid, 'prompt': console.prompt, 'busy': bool(console.pending)}
+                        for cid, console in self.consoles.items()]
+        return {'consoles': consoles}
+
+    def _console_write(self, cid: str, data: str) -> Dict[str, Any]:
+        with self._lock:
+            console = self.consoles.get(cid)
+            if console is None:
+                return {'result': 'failure'}
+
+            used_module = USE_COMMAND_PATTERN.search(data)
+            if used_module:
+                console.module = used_module.group(1)
+
+            if RUN_COMMAND_PATTERN.search(data):
+                script = self.scenario.get_script(console.module or '')
+                ready_at = time.monotonic()
+                for chunk in script.chunks:
+                    ready_at += script.chunk_delay
+                    console.pending.append((ready_at, chunk))
+        return {'wrote': len(data)}
+
+    def _console_read(self, cid: str) -> Dict[str, Any]:
+        with self._lock:
+            console = self.consoles.get(cid)
+            if console is None:
+                return {'result': 'failure'}
+
+            now = time.monotonic()
+            ready = [chunk for ready_at, chunk in console.pending if ready_at <= now]
+            console.pending = [(ready_at, chunk) for ready_at, chunk in console.pending if ready_at > now]
+            return {'data': ''.join(ready), 'prompt': console.prompt, 'busy': bool(console.pending)}
+
+    def _console_destroy(self, cid: str) -> Dict[str, Any]:
+        with self._lock:
+            return {'result': 'success' if self.consoles.pop(cid, None) else 'failure'}
+
+    def _module_execute(self, module_type: str, module_name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            job_id = str(next(self._ids))
+            self.jobs[job_id] = f'{module_type}/{module_name}'
+        return {'job_id': int(job_id), 'uuid': uuid.uuid4().hex}
+
+    def _job_list(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.jobs)
+
+    def _job_info(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            name = self.jobs.get(str(job_id))
+        if name is None:
+            return {'error': True, 'error_class': 'Msf::RPC::Exception', 'error_message': 'Invalid Job'}
+        return {'jid': int(job_id), 'name': name, 'start_time': 0, 'datastore': {}}
+
+    def _job_stop(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return {'result': 'success' if self.jobs.pop(str(job_id), None) else 'failure'}
+
+
+class FakeMsfRpcServer:
+    """
+    Lightweight local stand-in for msfrpcd that speaks the msgpack API used by pymetasploit3.
+
+    Covers auth, console.create/list/write/read/destroy, module.execute and job.list/info/stop.
+    Usage:
+        with FakeMsfRpcServer(scenario, port=55553) as server:
+            ...  # point CustomMsfRpcClient at 127.0.0.1:55553 with SSL=false
+    """
+
+    def __init__(self, scenario: Optional[FakeMsfRpcScenario] = None, host: str = '127.0.0.1', port: int = 0):
+        self.state = FakeMsfRpcState(scenario or FakeMsfRpcScenario())
+        state = self.state
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                request = msgpack.unpackb(body, raw=False, strict_map_key=False)
+                method, args = request[0], request[1:]
+                # Every call except auth.login carries the token as its first argument
+                if method != 'auth.login':
+                    args = args[1:]
+
+                if state.scenario.rpc_latency:
+                    time.sleep(state.scenario.rpc_latency)
+
+                payload = msgpack.packb(state.dispatch(method, args))
+                self.send_response(200)
+                self.send_header('Content-Type', 'binary/message-pack')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> tuple:
+        return self._server.server_address
+
+    def start(self) -> 'FakeMsfRpcServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeMsfRpcServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import constants
+
+
+class UncachedResult(str):
+    """
+    A result handed to the callers of the in-flight execution but not stored, e.g. a timed out or failed run.
+    """
+
+
+class _InFlight:
+    """
+    A single execution shared between all callers that requested the same key while it was running.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class ExecutionCache:
+    """
+    Thread-safe cache of tool executions keyed by a canonical hash of (module, target, options).
+
+    Entries expire according to a TTL chosen per module class (see constants.RESULT_CACHE_TTL). Concurrent
+    requests for the same key are coalesced: the first caller executes, the others wait for its result.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(ExecutionCache, cls).__new__(cls)
+                cls._instance._entries = {}  # key -> (expires_at, result)
+                cls._instance._in_flight = {}  # key -> _InFlight
+                cls._instance._state_lock = threading.Lock()
+                cls._instance.hits = 0
+                cls._instance.misses = 0
+                cls._instance.coalesced = 0
+        return cls._instance
+
+    @staticmethod
+    def build_key(module: str, target: Optional[str], options: Dict[str, Any]) -> str:
+        """
+        Build a canonical hash for an execution.
+
+        Option names are case-insensitive and values are compared as stripped strings, so
+        {'rhosts': '10.0.0.1 '} and {'RHOSTS': '10.0.0.1'} produce the same key.
+
+        :param module: Full module name, e.g. 'auxiliary/scanner/smb/smb_version'
+        :param target: The target host(s) of the execution
+        :param options: Module options
+        :return: Hex digest identifying the execution
+        """
+        canonical = {
+            'module': module.strip().lower(),
+            'target': _normalize_target(target),
+            'options': {str(key).strip().upper(): _normalize_value(value) for key, value in options.items()}
+        }
+        payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def get_ttl(module: str) -> int:
+        """
+        Return the TTL (seconds) for a module, using the longest matching module class prefix.
+
+        :param module: Full module name, e.g. 'auxiliary/scanner/smb/smb_version'
+        :return: TTL in seconds; 0 means the module is never cached
+        """
+        best_prefix = ''
+        ttl = constants.RESULT_CACHE_DEFAULT_TTL
+        for prefix, prefix_ttl in constants.RESULT_CACHE_TTL.items():
+            if (module == prefix or module.startswith(f'{prefix}/')) and len(prefix) > len(best_prefix):
+                best_prefix, ttl = prefix, prefix_ttl
+        return ttl
+
+    def get_or_execute(self, key: str, ttl: int, func: Callable[[], str], bypass: bool = False) -> str:
+        """
+        Return a cached result for the key or execute func, sharing one in-flight execution between callers.
+
+        :param key: Key built by build_key
+        :param ttl: Time to live of the result in seconds; 0 disables caching and coalescing
+        :param func: Zero-argument callable performing the execution; an UncachedResult it returns is not stored
+        :param bypass: Skip the lookup and force a fresh execution; the fresh result replaces the cached one
+        :return: The execution result
+        """
+        if not constants.RESULT_CACHE_ENABLED or ttl <= 0:
+            return func()
+
+        with self._state_lock:
+            if not bypass:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self.hits += 1
+                    return entry[1]
+
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = func()
+            if not isinstance(in_flight.result, UncachedResult):
+                with self._state_lock:
+                    self._entries[key] = (time.monotonic() + ttl, in_flight.result)
+            return in_flight.result
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._state_lock:
+                del self._in_flight[key]
+            in_flight.event.set()
+
+    def invalidate(self, key: str) -> None:
+        """Drop a single cached result."""
+        with self._state_lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._state_lock:
+            self._entries.clear()
+
+
+def _normalize_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value).strip()
+
+
+def _normalize_target(target: Optional[str]) -> str:
+    if not target:
+        return ''
+    # 'b, a' and 'a b' describe the same set of hosts
+    hosts = {host for host in str(target).replace(',', ' ').split() if host}
+    return ' '.join(sorted(hosts))
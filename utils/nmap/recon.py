@@ -0,0 +1,122 @@
+import ipaddress
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import constants
+from utils.msf.result_cache import ExecutionCache
+
+logger = logging.getLogger('exception_logger')
+
+# IPv4 addresses and networks, e.g. '10.10.11.23' or '10.10.11.0/24'
+TARGET_PATTERN = re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?\b')
+
+
+class ReconPrefetch:
+    """
+    Speculative baseline reconnaissance of the targets of a task.
+
+    start() submits an nmap scan (RECON_NMAP_PROFILE) of every target found in the task to a background pool and
+    returns immediately. The scans go through run_nmap_scan, so their results land in the result cache and the
+    results DB: a tester scanning a target with the same profile gets the prefetched (or still running) scan
+    instead of starting a new one. summary() returns the finished scans without waiting for the others.
+    A finished scan is kept for the TTL of nmap scans in the result cache; expired and failed scans are dropped, so
+    the next start() scans their targets again.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(ReconPrefetch, cls).__new__(cls)
+                cls._instance._executor = None
+                cls._instance._futures = {}  # target -> (start time, Future of the rendered scan)
+                cls._instance._state_lock = threading.Lock()
+        return cls._instance
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=constants.RECON_MAX_WORKERS, thread_name_prefix='recon')
+        return self._executor
+
+    def start(self, task: str) -> List[str]:
+        """
+        Start the reconnaissance of the targets of the task; targets with a running or fresh scan are not scanned
+        again, the failed and expired scans are dropped.
+
+        :param task: The task text
+        :return: The targets whose scan was started
+        """
+        with self._state_lock:
+            self._drop_stale()
+            if not constants.RECON_ENABLED:
+                return []
+            started = [target for target in extract_targets(task) if target not in self._futures]
+            for target in started:
+                self._futures[target] = (time.monotonic(), self.executor.submit(_scan_target, target))
+        return started
+
+    def result(self, target: str, timeout: Optional[float] = 0) -> Optional[str]:
+        """
+        Return the scan of a target, waiting at most timeout seconds (None waits until it finishes).
+
+        :return: The rendered scan, or None if it is not finished, failed, expired or was never started
+        """
+        with self._state_lock:
+            self._drop_stale()
+            entry: Optional[Tuple[float, Future]] = self._futures.get(target)
+        future = entry[1] if entry is not None else None
+        if future is None or (timeout == 0 and not future.done()):
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"The reconnaissance of {target} is not available: {e}")
+            return None
+
+    def summary(self, task: str) -> Optional[str]:
+        """Return the finished scans of the targets of the task, or None if none is finished yet."""
+        scans = [scan for scan in (self.result(target) for target in extract_targets(task)) if scan]
+        return '\n'.join(scans) or None
+
+    def reset(self) -> None:
+        """Forget the started scans (their results stay in the result cache)."""
+        with self._state_lock:
+            self._futures = {}
+
+    def _drop_stale(self) -> None:
+        # Called with the state lock held
+        ttl = ExecutionCache.get_ttl(constants.NMAP_CACHE_MODULE)
+        now = time.monotonic()
+        for target, (started_at, future) in list(self._futures.items()):
+            if not future.done():
+                continue
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(f"The reconnaissance of {target} failed: {future.exception()}")
+                del self._futures[target]
+            elif future.cancelled() or now - started_at > ttl:
+                del self._futures[target]
+
+
+def extract_targets(task: str) -> List[str]:
+    """The IPv4 addresses and networks named in the task, in order of appearance."""
+    targets: Dict[str, None] = {}
+    for candidate in TARGET_PATTERN.findall(task):
+        try:
+            ipaddress.ip_network(candidate, strict=False)
+        except ValueError:
+            continue
+        targets[candidate] = None
+    return list(targets)[:constants.RECON_MAX_TARGETS]
+
+
+def _scan_target(target: str) -> str:
+    # Imported here: the tools module imports the scan engine, which is not needed until the first scan
+    from tools.nmap_tools import run_nmap_scan
+    profile = constants.RECON_NMAP_PROFILE
+    return run_nmap_scan(target, profile.get('ports'), profile.get('arguments', '-sV'))
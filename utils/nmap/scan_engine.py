@@ -0,0 +1,240 @@
+import ipaddress
+import itertools
+import logging
+import re
+import shlex
+import subprocess
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import constants
+
+logger = logging.getLogger(__name__)
+
+OCTET_RANGE_PATTERN = re.compile(r'^[\d,\-*]+\.[\d,\-*]+\.[\d,\-*]+\.[\d,\-*]+$')
+# Upper bound for expanding a single target token into addresses; larger specs are passed to nmap as they are
+MAX_EXPANDED_HOSTS = 65536
+
+HostResult = Dict[str, Any]
+
+
+def expand_target(target: str) -> List[str]:
+    """
+    Expand a single nmap target token into individual addresses when possible.
+
+    Supports IPv4/IPv6 addresses, CIDR networks ('10.0.0.0/24') and nmap octet ranges ('10.0.0.1-50',
+    '10.0.1,3.*'). Host names and specs that would expand to more than MAX_EXPANDED_HOSTS addresses
+    are returned unchanged.
+
+    :param target: A target token without spaces
+    :return: List of addresses (or the original token)
+    """
+    try:
+        network = ipaddress.ip_network(target, strict=False)
+        if network.num_addresses > MAX_EXPANDED_HOSTS:
+            return [target]
+        if network.num_addresses <= 2:
+            return [str(address) for address in network]
+        return [str(address) for address in network.hosts()]
+    except ValueError:
+        pass
+
+    if not OCTET_RANGE_PATTERN.match(target):
+        return [target]
+
+    octets = [_expand_octet(octet) for octet in target.split('.')]
+    if any(not octet for octet in octets) or _product_size(octets) > MAX_EXPANDED_HOSTS:
+        return [target]
+    return ['.'.join(str(value) for value in combination) for combination in itertools.product(*octets)]
+
+
+def split_targets(hosts: str, shard_size: int) -> List[str]:
+    """
+    Split an nmap target specification into shards of at most shard_size hosts.
+
+    :param hosts: Target specification, e.g. '10.0.0.0/24 scanme.nmap.org'
+    :param shard_size: Maximum number of hosts per shard
+    :return: List of space-separated target specifications
+    """
+    targets: List[str] = []
+    for token in hosts.split():
+        # 'a,b' lists of complete addresses are split; commas inside octets ('10.0.1,3.1') are nmap ranges
+        if ',' in token and not OCTET_RANGE_PATTERN.match(token):
+            targets.extend(part for part in token.split(',') if part)
+        else:
+            targets.append(token)
+
+    # dict keeps the order of the specification while dropping duplicates
+    addresses = list(dict.fromkeys(address for target in targets for address in expand_target(target)))
+
+    return [' '.join(addresses[i:i + shard_size]) for i in range(0, len(addresses), shard_size)]
+
+
+class NmapScanEngine:
+    """
+    Runs nmap over large target specifications as parallel shards.
+
+    Every shard is a separate nmap process started with '-oX -'; its XML output is parsed incrementally,
+    so each host is reported (via on_host) as soon as nmap finishes it. '--host-timeout' keeps a single
+    unresponsive host from stalling a shard, and scan_timeout bounds the whole shard.
+    """
+
+    def __init__(
+            self,
+            max_workers: int = constants.NMAP_MAX_WORKERS,
+            shard_size: int = constants.NMAP_SHARD_SIZE,
+            host_timeout: int = constants.NMAP_HOST_TIMEOUT,
+            scan_timeout: int = constants.NMAP_SCAN_TIMEOUT,
+            nmap_path: str = 'nmap'
+    ):
+        self.max_workers = max_workers
+        self.shard_size = shard_size
+        self.host_timeout = host_timeout
+        self.scan_timeout = scan_timeout
+        self.nmap_path = nmap_path
+
+    def scan(
+            self,
+            hosts: str,
+            ports: Optional[str] = None,
+            arguments: str = '-sV',
+            on_host: Optional[Callable[[str, HostResult], None]] = None
+    ) -> Dict[str, HostResult]:
+        """
+        Scan the hosts and return the merged results.
+
+        :param hosts: nmap target specification
+        :param ports: Port specification, e.g. '22,80,1000-2000'; None scans nmap's default ports
+        :param arguments: Additional nmap arguments
+        :param on_host: Optional callback receiving (address, result) for every finished host
+        :return: Dictionary {address: {'state', 'hostname', 'timed_out', 'protocols': {proto: {port: {...}}}}}
+        """
+        shards = split_targets(hosts, self.shard_size)
+        if not shards:
+            raise ValueError(f"No targets found in the host specification: '{hosts}'.")
+
+        results: Dict[str, HostResult] = {}
+        results_lock = threading.Lock()
+
+        def collect(address: str, host_result: HostResult) -> None:
+            with results_lock:
+                results[address] = host_result
+            if on_host:
+                on_host(address, host_result)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards))) as executor:
+            futures = [executor.submit(self._scan_shard, shard, ports, arguments, collect) for shard in shards]
+            errors = [future.exception() for future in futures if future.exception()]
+
+        if errors and not results:
+            raise errors[0]
+        for error in errors:
+            logger.warning(f"An nmap shard failed: {error}")
+
+        return results
+
+    def build_command(self, shard: str, ports: Optional[str], arguments: str) -> List[str]:
+        command = [self.nmap_path, '-oX', '-', '--host-timeout', f'{self.host_timeout}s']
+        command.extend(shlex.split(arguments or ''))
+        if ports:
+            command.extend(['-p', ports])
+        command.extend(shard.split())
+        return command
+
+    def _scan_shard(self, shard: str, ports: Optional[str], arguments: str,
+                    collect: Callable[[str, HostResult], None]) -> None:
+        stderr = process = timer = None
+        try:
+            # stderr goes to a file: a pipe read only after stdout ends could fill up with warnings and block nmap
+            stderr = tempfile.TemporaryFile(mode='w+')
+            process = subprocess.Popen(
+                self.build_command(shard, ports, arguments),
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                text=True
+            )
+            # Kill the whole shard if it runs past the scan timeout; finished hosts are already collected
+            timer = threading.Timer(self.scan_timeout, process.kill)
+            timer.start()
+
+            parser = ET.XMLPullParser(events=('end',))
+            for line in process.stdout:
+                parser.feed(line)
+                for _, element in parser.read_events():
+                    if element.tag == 'host':
+                        address, host_result = parse_host_element(element)
+                        if address:
+                            collect(address, host_result)
+                        element.clear()
+
+            return_code = process.wait()
+            if return_code != 0 and timer.is_alive():
+                stderr.seek(0)
+                raise RuntimeError(f"nmap exited with code {return_code}: {stderr.read().strip()}")
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process is not None:
+                # Still running when the output couldn't be read or parsed
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+            if stderr is not None:
+                stderr.close()
+
+
+def parse_host_element(element: ET.Element) -> tuple:
+    """
+    Convert an nmap XML <host> element into (address, result).
+    """
+    address_element = element.find("address[@addrtype='ipv4']")
+    if address_element is None:
+        address_element = element.find('address')
+    address = address_element.get('addr') if address_element is not None else None
+
+    status = element.find('status')
+    hostname = element.find('hostnames/hostname')
+
+    protocols: Dict[str, Dict[int, Dict[str, str]]] = {}
+    for port in element.findall('ports/port'):
+        state = port.find('state')
+        service = port.find('service')
+        protocols.setdefault(port.get('protocol'), {})[int(port.get('portid'))] = {
+            'state': state.get('state') if state is not None else 'unknown',
+            'name': service.get('name', '') if service is not None else '',
+            'product': service.get('product', '') if service is not None else '',
+            'version': service.get('version', '') if service is not None else '',
+            'extrainfo': service.get('extrainfo', '') if service is not None else '',
+        }
+
+    return address, {
+        'state': status.get('state') if status is not None else 'unknown',
+        'hostname': hostname.get('name') if hostname is not None else '',
+        'timed_out': element.get('timedout') == 'true',
+        'protocols': protocols
+    }
+
+
+def _expand_octet(octet: str) -> List[int]:
+    values: List[int] = []
+    for part in octet.split(','):
+        if part == '*':
+            part = '0-255'
+        if '-' in part:
+            start, _, end = part.partition('-')
+            start, end = int(start or 0), int(end or 255)
+            values.extend(range(start, min(end, 255) + 1))
+        elif part:
+            values.append(int(part))
+    return [value for value in values if 0 <= value <= 255]
+
+
+def _product_size(octets: List[List[int]]) -> int:
+    size = 1
+    for octet in octets:
+        size *= len(octet)
+    return size
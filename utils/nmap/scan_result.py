@@ -0,0 +1,236 @@
+import ipaddress
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.tokens import count_tokens
+
+OPEN = 'open'
+
+
+@dataclass
+class NmapPort:
+    protocol: str
+    port: int
+    state: str
+    service: str = ''
+    product: str = ''
+    version: str = ''
+    extrainfo: str = ''
+
+    @property
+    def service_label(self) -> str:
+        """Service name with product and version, e.g. 'ssh OpenSSH 8.9p1'."""
+        return ' '.join(part for part in (self.service, self.product, self.version, self.extrainfo) if part)
+
+
+@dataclass
+class NmapHost:
+    address: str
+    state: str
+    hostname: str = ''
+    timed_out: bool = False
+    ports: List[NmapPort] = field(default_factory=list)
+
+    def ports_by_state(self) -> Dict[str, Dict[str, List[int]]]:
+        """Return {state: {protocol: [ports]}}."""
+        grouped: Dict[str, Dict[str, List[int]]] = {}
+        for port in self.ports:
+            grouped.setdefault(port.state, {}).setdefault(port.protocol, []).append(port.port)
+        return grouped
+
+
+@dataclass
+class NmapScanResult:
+    """
+    Structured representation of an nmap scan: per-host port tables plus services grouped across hosts.
+    """
+    targets: str
+    ports_spec: Optional[str]
+    arguments: str
+    hosts: List[NmapHost] = field(default_factory=list)
+    scan_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    scanned_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+
+    @classmethod
+    def from_engine_results(cls, results: Dict[str, Dict[str, Any]], targets: str, ports_spec: Optional[str],
+                            arguments: str) -> 'NmapScanResult':
+        """
+        Build the model from NmapScanEngine.scan output.
+        """
+        hosts = []
+        for address, host_result in results.items():
+            ports = [
+                NmapPort(protocol=protocol, port=port, state=port_result['state'], service=port_result['name'],
+                         product=port_result['product'], version=port_result['version'],
+                         extrainfo=port_result['extrainfo'])
+                for protocol, protocol_ports in host_result['protocols'].items()
+                for port, port_result in sorted(protocol_ports.items())
+            ]
+            hosts.append(NmapHost(address=address, state=host_result['state'], hostname=host_result['hostname'],
+                                  timed_out=host_result['timed_out'], ports=ports))
+
+        hosts.sort(key=lambda host: _address_sort_key(host.address))
+        return cls(targets=targets, ports_spec=ports_spec, arguments=arguments, hosts=hosts)
+
+    def services(self) -> Dict[Tuple[int, str, str], List[str]]:
+        """
+        Group open ports across hosts: {(port, protocol, service label): [addresses]}.
+        """
+        grouped: Dict[Tuple[int, str, str], List[str]] = {}
+        for host in self.hosts:
+            for port in host.ports:
+                if port.state == OPEN:
+                    grouped.setdefault((port.port, port.protocol, port.service_label), []).append(host.address)
+        return dict(sorted(grouped.items()))
+
+    def render(self, token_budget: Optional[int] = None) -> str:
+        """
+        Render a compact text for the LLM.
+
+        Sections are ordered by value (summary, services across hosts, per-host port tables, unreachable
+        hosts); once the token budget is reached the remaining lines are replaced by a single note.
+
+        :param token_budget: Maximum number of tokens of the rendered text; None renders everything
+        :return: The rendered result
+        """
+        up = [host for host in self.hosts if host.state == 'up' and not host.timed_out]
+        timed_out = [host.address for host in self.hosts if host.timed_out]
+        down = [host.address for host in self.hosts if host.state != 'up' and not host.timed_out]
+
+        lines = [f"Targets: {self.targets}, Ports: {self.ports_spec}, Arguments: {self.arguments}, "
+                 f"Hosts: {len(up)} up, {len(down)} down, {len(timed_out)} timed out, Scan id: {self.scan_id}"]
+
+        services = self.services()
+        if services:
+            lines.append('Open services (port/protocol service: hosts):')
+            for (port, protocol, label), addresses in services.items():
+                lines.append(f"  {port}/{protocol} {label or 'unknown'}: {collapse_addresses(addresses)}")
+
+        # Hosts with identical port tables share one line
+        tables: Dict[str, List[NmapHost]] = {}
+        for host in up:
+            states = host.ports_by_state()
+            table = '; '.join(
+                f"{state}: " + ' '.join(f"{protocol} {collapse_ports(ports)}" for protocol, ports in protocols.items())
+                for state, protocols in sorted(states.items(), key=lambda item: item[0] != OPEN)
+            )
+            tables.setdefault(table or 'no ports reported', []).append(host)
+
+        if tables:
+            lines.append('Hosts (state: protocol ports):')
+        for table, hosts in tables.items():
+            label = collapse_addresses([host.address for host in hosts])
+            if len(hosts) == 1 and hosts[0].hostname:
+                label += f" ({hosts[0].hostname})"
+            lines.append(f"  {label}: {table}")
+
+        if timed_out:
+            lines.append(f"Timed out: {collapse_addresses(timed_out)}")
+        if down:
+            lines.append(f"Down: {collapse_addresses(down)}")
+
+        if not self.hosts:
+            lines.append('No results')
+
+        return _fit_lines(lines, token_budget)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Flatten the result into rows for the results DB; hosts without ports produce a single row without a port.
+        """
+        records = []
+        for host in self.hosts:
+            host_fields = {
+                'scan_id': self.scan_id,
+                'scanned_at': self.scanned_at,
+                'host': host.address,
+                'hostname': host.hostname,
+                'host_state': 'timeout' if host.timed_out else host.state
+            }
+            if not host.ports:
+                records.append({**host_fields, 'protocol': None, 'port': None, 'state': None})
+            for port in host.ports:
+                records.append({
+                    **host_fields,
+                    'protocol': port.protocol,
+                    'port': port.port,
+                    'state': port.state,
+                    'service': port.service,
+                    'product': port.product,
+                    'version': port.version,
+                    'extrainfo': port.extrainfo
+                })
+        return records
+
+
+def collapse_ports(ports: List[int]) -> str:
+    """
+    Collapse a list of ports into ranges: [22, 80, 81, 82, 443] -> '22,80-82,443'.
+    """
+    return ','.join(f'{start}-{end}' if start != end else str(start) for start, end in _ranges(sorted(set(ports))))
+
+
+def collapse_addresses(addresses: List[str]) -> str:
+    """
+    Collapse consecutive IPv4 addresses into nmap-style ranges: 10.0.0.1, 10.0.0.2, 10.0.0.3 -> '10.0.0.1-3'.
+    Other addresses and host names are listed as they are.
+    """
+    numbers = []
+    others = []
+    for address in addresses:
+        try:
+            parsed = ipaddress.ip_address(address)
+            if parsed.version == 4:
+                numbers.append(int(parsed))
+                continue
+        except ValueError:
+            pass
+        others.append(address)
+
+    # Ranges are only collapsed inside the last octet, as nmap target specifications do: consecutive addresses
+    # crossing an octet boundary give two ranges, e.g. 10.0.0.250-255, 10.0.1.0-5
+    by_prefix: Dict[int, List[int]] = {}
+    for number in sorted(set(numbers)):
+        by_prefix.setdefault(number >> 8, []).append(number)
+
+    parts = []
+    for prefix_numbers in by_prefix.values():
+        for start, end in _ranges(prefix_numbers):
+            first = str(ipaddress.IPv4Address(start))
+            parts.append(f'{first}-{end & 0xFF}' if start != end else first)
+    return ', '.join(parts + others)
+
+
+def _ranges(values: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for value in values:
+        if ranges and value == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], value)
+        else:
+            ranges.append((value, value))
+    return ranges
+
+
+def _address_sort_key(address: str) -> Tuple[int, Any]:
+    try:
+        return 0, int(ipaddress.ip_address(address))
+    except ValueError:
+        return 1, address
+
+
+def _fit_lines(lines: List[str], token_budget: Optional[int]) -> str:
+    if token_budget is None:
+        return '\n'.join(lines)
+
+    kept: List[str] = []
+    used = 0
+    for num, line in enumerate(lines):
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > token_budget and kept:
+            kept.append(f"... {len(lines) - num} more lines truncated; query the results DB for the full scan.")
+            break
+        kept.append(line)
+        used += line_tokens
+    return '\n'.join(kept)
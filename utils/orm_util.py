@@ -1,13 +1,12 @@
-import constants
+from utils.prompt_registry import PromptRegistry
 
 
 def create_message_from_file(file_name: str) -> str:
-    work_dir = constants.MESSAGE_FOLDER
-    file_path = f'{work_dir}/{file_name}'
+    """
+    Return a prompt of the messages folder, e.g. 'host/host#1.txt' or 'planning_team/plan_composition_agent#2'.
+    The prompts are read once and served from the PromptRegistry.
+    """
     try:
-        with open(file_path, 'r') as file_reader:
-            lines = file_reader.readlines()
-            filtered_lines = [line.replace('\n', '') for line in lines]
-            return ' '.join(filtered_lines)
-    except FileNotFoundError:
+        return PromptRegistry().get(file_name)
+    except KeyError:
         print(f"A file was not found according to this file name: {file_name}.")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+import constants
+from utils.msf.catalog_snapshot import catalog_version
+
+PORT_PATTERN = re.compile(r'\b(\d{1,5})/(tcp|udp)\b', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class PlanCache:
+    """
+    Cross-run cache of the planner team's output, persisted in a SQLite file.
+
+    Entries are keyed by the normalized task text, the target profile (the open-port signature found in the task
+    and in the previous test results) and the version of the Metasploit module catalog, so a plan is reused only
+    for the same request against the same ports and the same modules. Entries expire after PLAN_CACHE_TTL seconds;
+    invalidate_task(), invalidate_catalog() and clear() drop them explicitly.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(PlanCache, cls).__new__(cls)
+                cls._instance._connection = None
+                cls._instance._store_lock = threading.Lock()
+                cls._instance.store_path = constants.PLAN_CACHE_STORE
+        return cls._instance
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.store_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.store_path, check_same_thread=False)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    task TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    catalog_version TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    output BLOB NOT NULL
+                ) WITHOUT ROWID
+            """)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def configure(self, store_path: str) -> None:
+        """Switch to another store file (e.g. for a benchmark)."""
+        self.close()
+        self.store_path = store_path
+
+    @staticmethod
+    def build_key(task: str, profile: str, catalog: str) -> str:
+        """
+        :param task: Normalized task text
+        :param profile: Target profile, see target_profile
+        :param catalog: Catalog version, see catalog_version
+        :return: Hex digest identifying the plan
+        """
+        payload = json.dumps({'task': task, 'profile': profile, 'catalog': catalog}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached planner output, or None if there is no fresh entry."""
+        with self._store_lock:
+            row = self.connection.execute(
+                "SELECT created_at, output FROM plans WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] + constants.PLAN_CACHE_TTL < time.time():
+            return None
+        return _unpack_output(row[1])
+
+    def put(self, key: str, task: str, profile: str, catalog: str, output: Dict[str, Any]) -> None:
+        """Save the planner output (state fields of the connector node) under the key."""
+        with self._store_lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO plans (key, task, profile, catalog_version, created_at, output) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, task, profile, catalog, time.time(), _pack_output(output))
+            )
+            self.connection.commit()
+
+    def invalidate(self, key: str) -> int:
+        """Drop a single plan."""
+        return self._delete("DELETE FROM plans WHERE key = ?", (key,))
+
+    def invalidate_task(self, task: str) -> int:
+        """Drop the plans of a task (raw or normalized text), whatever the target profile and catalog version."""
+        return self._delete("DELETE FROM plans WHERE task = ?", (normalize_task(task),))
+
+    def invalidate_catalog(self, catalog: Optional[str] = None) -> int:
+        """
+        Drop the plans built against other catalog versions than the given (by default the current) one,
+        e.g. after the Metasploit modules were re-imported.
+        """
+        catalog = catalog if catalog is not None else catalog_version()
+        return self._delete("DELETE FROM plans WHERE catalog_version != ?", (catalog,))
+
+    def clear(self) -> int:
+        """Drop all plans."""
+        return self._delete("DELETE FROM plans", ())
+
+    def close(self) -> None:
+        with self._store_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _delete(self, query: str, parameters: tuple) -> int:
+        with self._store_lock:
+            deleted = self.connection.execute(query, parameters).rowcount
+            self.connection.commit()
+        return deleted
+
+
+def normalize_task(text: str) -> str:
+    """Lower-case the text and collapse whitespace, so re-worded spacing or casing hits the same plan."""
+    return WHITESPACE_PATTERN.sub(' ', text).strip().strip('.!').lower()
+
+
+def target_profile(texts: Iterable[str]) -> str:
+    """Open-port signature of the texts, e.g. '22/tcp,80/tcp'."""
+    ports = {(int(port), protocol.lower()) for text in texts for port, protocol in PORT_PATTERN.findall(text)}
+    return ','.join(f'{port}/{protocol}' for port, protocol in sorted(ports))
+
+
+def _pack_output(output: Dict[str, Any]) -> bytes:
+    payload = {
+        field: messages_to_dict(value) if field == constants.MESSAGES_FIELD else value
+        for field, value in output.items()
+    }
+    return zlib.compress(json.dumps(payload).encode())
+
+
+def _unpack_output(blob: bytes) -> Dict[str, Any]:
+    payload = json.loads(zlib.decompress(blob).decode())
+    return {
+        field: messages_from_dict(value) if field == constants.MESSAGES_FIELD else value
+        for field, value in payload.items()
+    }
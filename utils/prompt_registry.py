@@ -0,0 +1,156 @@
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+
+import constants
+
+PROMPT_EXTENSION = '.txt'
+# 'planning_team/plan_composition_agent#2' -> ('planning_team/plan_composition_agent', 2)
+VERSIONED_KEY_PATTERN = re.compile(r'^(?P<name>.+?)(?:#(?P<version>\d+))?$')
+# The prompt every agent starts with; its templates are pre-built for every agent prompt
+DEFAULT_PROMPT_KEY = 'default_without_tools'
+
+
+class PromptRegistry:
+    """
+    Registry of the prompts of the messages/ folder.
+
+    The whole folder is read once, on first use. Prompts are addressed by versioned keys relative to the folder,
+    e.g. 'planning_team/plan_composition_agent#2'; a key without a version ('planning_team/plan_composition_agent')
+    resolves to the latest version, and the file names used so far ('host/host#1.txt') are accepted as well.
+    Chat prompt templates are pre-built and cached, so agents of repeatedly built graphs share them.
+    Call reload() after editing the prompt files.
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(PromptRegistry, cls).__new__(cls)
+                cls._instance._load_lock = threading.RLock()
+                cls._instance._messages = None
+                cls._instance._latest = {}
+                cls._instance._templates = {}
+        return cls._instance
+
+    @property
+    def messages(self) -> Dict[str, str]:
+        """All prompts by versioned key."""
+        if self._messages is None:
+            self.reload()
+        return self._messages
+
+    def reload(self, folder: Optional[str] = None) -> int:
+        """
+        (Re)read every prompt of the folder and drop the cached templates.
+
+        :param folder: The prompt folder; defaults to MESSAGE_FOLDER
+        :return: The number of loaded prompts
+        """
+        folder = folder or constants.MESSAGE_FOLDER
+        messages: Dict[str, str] = {}
+        for root, _, file_names in os.walk(folder):
+            for file_name in file_names:
+                if not file_name.endswith(PROMPT_EXTENSION):
+                    continue
+                file_path = os.path.join(root, file_name)
+                key = os.path.relpath(file_path, folder)[:-len(PROMPT_EXTENSION)].replace(os.sep, '/')
+                messages[key] = _read_prompt(file_path)
+
+        latest: Dict[str, Tuple[int, str]] = {}
+        for key in messages:
+            name, version = _split_key(key)
+            if name not in latest or version > latest[name][0]:
+                latest[name] = (version, key)
+
+        with self._load_lock:
+            self._messages = messages
+            self._latest = {name: key for name, (_, key) in latest.items()}
+            self._templates = {}
+
+        # Pre-build the templates the agent factories ask for: the default prompt alone and with each agent prompt
+        # that has no placeholders (the others depend on the agent's tools)
+        default_msg = messages.get(DEFAULT_PROMPT_KEY)
+        if default_msg is not None:
+            self.chat_template(default_msg)
+            for key, message in messages.items():
+                if key != DEFAULT_PROMPT_KEY and not PromptTemplate.from_template(message).input_variables:
+                    self.chat_template(default_msg, message)
+        return len(messages)
+
+    def resolve_key(self, key: str) -> str:
+        """
+        Normalize a key or file name to the versioned key of an existing prompt.
+
+        :raises KeyError: If there is no such prompt
+        """
+        if key.endswith(PROMPT_EXTENSION):
+            key = key[:-len(PROMPT_EXTENSION)]
+        messages = self.messages
+        if key in messages:
+            return key
+        if key in self._latest:
+            return self._latest[key]
+        raise KeyError(f"No prompt '{key}' in the '{constants.MESSAGE_FOLDER}' folder.")
+
+    def get(self, key: str) -> str:
+        """Return the text of a prompt by its (versioned) key or file name."""
+        return self.messages[self.resolve_key(key)]
+
+    def versions(self, name: str) -> List[int]:
+        """Return the available versions of a prompt, e.g. [1, 2] for 'planning_team/plan_composition_agent'."""
+        return sorted(version for key_name, version in map(_split_key, self.messages) if key_name == name)
+
+    def chat_template(self, *system_messages: str, cache_control: bool = False, **partial_variables: Any
+                      ) -> ChatPromptTemplate:
+        """
+        Return the cached ChatPromptTemplate made of the system messages followed by the 'messages' placeholder.
+
+        The system messages are rendered once (with the partial variables they use) into static SystemMessages,
+        so the prompt prefix is byte-identical on every call and placed before all dynamic content; providers
+        can then serve it from their prompt cache.
+
+        :param system_messages: System message templates (e.g. the default prompt and the agent's prompt)
+        :param cache_control: Send the prefix as one system message whose last block carries Anthropic's
+                              cache_control breakpoint
+        :param partial_variables: Values of the placeholders of the system messages, e.g. tools_descriptions
+        :raises ValueError: If a system message uses a placeholder without a value
+        """
+        used_variables = {}
+        for message in system_messages:
+            for variable in PromptTemplate.from_template(message).input_variables:
+                if variable not in partial_variables:
+                    raise ValueError(f"No value for the placeholder '{{{variable}}}' of the system message.")
+                used_variables[variable] = partial_variables[variable]
+
+        key = (system_messages, repr(sorted(used_variables.items())), cache_control)
+        template = self._templates.get(key)
+        if template is None:
+            rendered = [PromptTemplate.from_template(message).format(**used_variables) for message in system_messages]
+            if cache_control:
+                blocks = [{'type': 'text', 'text': text} for text in rendered]
+                blocks[-1]['cache_control'] = {'type': 'ephemeral'}
+                prefix = [SystemMessage(content=blocks)]
+            else:
+                prefix = [SystemMessage(content=text) for text in rendered]
+            template = ChatPromptTemplate.from_messages(prefix + [MessagesPlaceholder(variable_name="messages")])
+            with self._load_lock:
+                self._templates[key] = template
+        return template
+
+
+def _read_prompt(file_path: str) -> str:
+    with open(file_path, 'r') as file_reader:
+        lines = file_reader.readlines()
+        filtered_lines = [line.replace('\n', '') for line in lines]
+        return ' '.join(filtered_lines)
+
+
+def _split_key(key: str) -> Tuple[str, int]:
+    match = VERSIONED_KEY_PATTERN.match(key)
+    return match.group('name'), int(match.group('version') or 0)
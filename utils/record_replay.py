@@ -0,0 +1,216 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional, Tuple
+
+import constants
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when the store has no recording for a request."""
+
+
+class ReplayStore:
+    """
+    Compact indexed store of request/response pairs.
+
+    Every interaction is saved under (kind, key, seq): 'kind' names the wrapped call (e.g. 'nmap', 'msf_rpc'),
+    'key' is a hash of the request and 'seq' is the occurrence number of the same request within a session,
+    so repeated identical calls (console.read polling) replay in the recorded order.
+    Requests and responses are stored as zlib-compressed JSON.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS interactions (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                request BLOB,
+                response BLOB,
+                latency REAL NOT NULL,
+                PRIMARY KEY (kind, key, seq)
+            ) WITHOUT ROWID
+        """)
+        self._connection.commit()
+
+    def save(self, kind: str, key: str, seq: int, request: Any, response: Any, latency: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO interactions (kind, key, seq, request, response, latency) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, seq, _pack(request), _pack(response), latency)
+            )
+            self._connection.commit()
+
+    def load(self, kind: str, key: str, seq: int) -> Optional[Tuple[Any, float]]:
+        """
+        Return (response, latency) for the given occurrence, falling back to the last recorded occurrence
+        when the request was replayed more often than it was recorded.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, latency FROM interactions WHERE kind = ? AND key = ? AND seq <= ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (kind, key, seq)
+            ).fetchone()
+        if row is None:
+            return None
+        return _unpack(row[0]), row[1]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class RecordReplay:
+    """
+    Process-wide record/replay switch for external tool calls.
+
+    Modes:
+        None     - calls pass through untouched;
+        'record' - calls are executed and their request/response pairs are saved in the store;
+        'replay' - calls are served from the store without touching the network; with latency simulation
+                   enabled, the recorded latency is reproduced (scaled by latency_factor).
+    """
+    _instance = None
+    _lock = threading.Lock()  # Lock for thread-safe singleton initialization
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(RecordReplay, cls).__new__(cls)
+                cls._instance._store = None
+                cls._instance._sequences = {}
+                cls._instance._sequence_lock = threading.Lock()
+                cls._instance.configure(
+                    mode=os.getenv('RECORD_REPLAY_MODE', constants.RECORD_REPLAY_MODE),
+                    store_path=constants.RECORD_REPLAY_STORE,
+                    simulate_latency=constants.REPLAY_SIMULATE_LATENCY,
+                    latency_factor=constants.REPLAY_LATENCY_FACTOR
+                )
+        return cls._instance
+
+    def configure(self, mode: Optional[str], store_path: Optional[str] = None, simulate_latency: bool = False,
+                  latency_factor: float = 1.0) -> None:
+        """
+        Switch the mode and the store; resets the occurrence counters.
+
+        :param mode: None, 'record' or 'replay'
+        :param store_path: Path of the SQLite store file
+        :param simulate_latency: Sleep for the recorded latency when replaying
+        :param latency_factor: Multiplier for the simulated latency
+        """
+        if mode not in (None, RECORD, REPLAY):
+            raise ValueError(f"Invalid record/replay mode: {mode}. Must be None, '{RECORD}' or '{REPLAY}'.")
+
+        if self._store:
+            self._store.close()
+            self._store = None
+
+        self.mode = mode
+        self.store_path = store_path or constants.RECORD_REPLAY_STORE
+        self.simulate_latency = simulate_latency
+        self.latency_factor = latency_factor
+        self.reset()
+
+    @property
+    def store(self) -> ReplayStore:
+        if self._store is None:
+            self._store = ReplayStore(self.store_path)
+        return self._store
+
+    def reset(self) -> None:
+        """Restart the occurrence counters, e.g. before replaying a workflow from its beginning."""
+        with self._sequence_lock:
+            self._sequences = {}
+
+    def call(self, kind: str, request: Any, func: Callable[[], Any]) -> Any:
+        """
+        Execute, record or replay a single call.
+
+        :param kind: Name of the wrapped call
+        :param request: JSON-serializable description of the request, used to build the key
+        :param func: Zero-argument callable performing the real call
+        :return: The real or replayed response
+        """
+        if self.mode is None:
+            return func()
+
+        key = _request_key(request)
+        with self._sequence_lock:
+            seq = self._sequences.get((kind, key), 0)
+            self._sequences[(kind, key)] = seq + 1
+
+        if self.mode == REPLAY:
+            recorded = self.store.load(kind, key, seq)
+            if recorded is None:
+                raise ReplayMissError(f"No recording for {kind} request: {request}")
+            response, latency = recorded
+            if self.simulate_latency:
+                time.sleep(latency * self.latency_factor)
+            return response
+
+        start_time = time.perf_counter()
+        response = func()
+        self.store.save(kind, key, seq, request, response, time.perf_counter() - start_time)
+        return response
+
+
+def record_replay(kind: str) -> Callable:
+    """
+    Decorator that routes calls of the function through RecordReplay.
+
+    The decorated function's arguments must be JSON-serializable, and so must its return value.
+
+    :param kind: Name under which the calls are stored (e.g. 'nmap', 'msf')
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Bind with defaults so that passing a default explicitly does not change the key
+            bound_arguments = signature.bind(*args, **kwargs)
+            bound_arguments.apply_defaults()
+            request = dict(bound_arguments.arguments)
+            return RecordReplay().call(kind, request, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def _request_key(request: Any) -> str:
+    payload = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, default=_to_json).encode())
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
@@ -0,0 +1,61 @@
+import functools
+import math
+from typing import Optional
+
+# Rough average for English text and console output when no tokenizer is available
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING_MODEL = 'gpt-4o'
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoder(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        # tiktoken downloads its vocabularies on first use; offline workers fall back to the estimate
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text with tiktoken, or estimate them from its length if tiktoken is not installed.
+
+    :param text: The text to measure
+    :param model: Model name used to pick the tokenizer; defaults to DEFAULT_ENCODING_MODEL
+    :return: Number of tokens
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder(model or DEFAULT_ENCODING_MODEL)
+    if encoder is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, from_end: bool = False, model: Optional[str] = None) -> str:
+    """
+    Keep the first (or, with from_end, the last) max_tokens tokens of a text.
+
+    :param text: The text to cut
+    :param max_tokens: Number of tokens to keep
+    :param from_end: Keep the end of the text instead of its beginning
+    :param model: Model name used to pick the tokenizer; defaults to DEFAULT_ENCODING_MODEL
+    :return: The cut text
+    """
+    if max_tokens <= 0 or not text:
+        return ''
+    encoder = _get_encoder(model or DEFAULT_ENCODING_MODEL)
+    if encoder is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        return text[-max_chars:] if from_end else text[:max_chars]
+
+    tokens = encoder.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoder.decode(tokens[-max_tokens:] if from_end else tokens[:max_tokens])
@@ -0,0 +1,153 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import constants
+from utils.dao.result_writer import ResultWriter
+from utils.instrumentation import Instrumentation
+from utils.msf.data_compressor import DataCompressor
+from utils.prompt_registry import PromptRegistry
+from utils.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+PASSTHROUGH = 'passthrough'
+TRUNCATE = 'truncate'
+COMPRESS = 'compress'
+SUMMARIZE = 'summarize'
+
+SUMMARY_PROMPT_KEY = 'tools/tool_output_summary'
+
+
+@dataclass
+class ToolOutputPolicy:
+    """
+    How the output of a tool is fitted into the graph state.
+
+    budget: Maximum number of tokens of the ToolMessage content; None disables the budget
+    strategy: Reduction applied above the budget: 'truncate' (head and tail), 'compress' (DataCompressor, then
+              truncate), 'summarize' (LLM summary, then truncate) or 'passthrough'
+    store: Store the raw output in the results DB, so it can be fetched by id with get_tool_output
+    """
+    budget: Optional[int] = 4000
+    strategy: str = TRUNCATE
+    store: bool = True
+
+    @classmethod
+    def for_tool(cls, tool_name: str) -> 'ToolOutputPolicy':
+        return cls(**{**constants.TOOL_OUTPUT_DEFAULT_POLICY, **constants.TOOL_OUTPUT_POLICIES.get(tool_name, {})})
+
+
+def process_tool_output(tool_name: str, output: Any, policy: Optional[ToolOutputPolicy] = None) -> str:
+    """
+    Fit the output of a tool call into its token budget.
+
+    Outputs within the budget are returned unchanged. Larger ones are stored raw in the results DB and reduced
+    with the strategy of the tool's policy; a note with the original size and the id of the stored output is
+    appended, so the agent can fetch the full output on demand.
+
+    :param tool_name: Name of the tool
+    :param output: The tool's response
+    :param policy: Policy to apply; defaults to the tool's policy from TOOL_OUTPUT_POLICIES
+    :return: The content of the ToolMessage
+    """
+    text = output if isinstance(output, str) else str(output)
+    policy = policy or ToolOutputPolicy.for_tool(tool_name)
+    if policy.strategy == PASSTHROUGH or policy.budget is None:
+        return text
+
+    tokens = count_tokens(text)
+    if tokens <= policy.budget:
+        return text
+
+    output_id = store_tool_output(tool_name, text, tokens) if policy.store else None
+    if output_id:
+        note = (f"[The output had {tokens} tokens and was reduced ({policy.strategy}). The full output is stored "
+                f"with the id '{output_id}', use get_tool_output to read it.]")
+    else:
+        note = f"[The output had {tokens} tokens and was reduced ({policy.strategy}).]"
+    body_budget = max(policy.budget - count_tokens(note) - 1, 0)
+
+    reduced = text
+    if policy.strategy == COMPRESS:
+        reduced = compress_output(text)
+    elif policy.strategy == SUMMARIZE:
+        reduced = summarize_output(tool_name, text, body_budget)
+
+    reduced_tokens = count_tokens(reduced)
+    if reduced_tokens > body_budget:
+        reduced = truncate_head_tail(reduced, body_budget, reduced_tokens)
+
+    Instrumentation().record('tool_output', tool_name, raw_tokens=tokens, tokens=count_tokens(reduced),
+                             strategy=policy.strategy, output_id=output_id)
+    return f'{reduced}\n{note}'
+
+
+def truncate_head_tail(text: str, budget: int, tokens: Optional[int] = None) -> str:
+    """
+    Keep the beginning and the end of a text within the token budget (TOOL_OUTPUT_HEAD_RATIO of it for the head).
+    """
+    tokens = tokens if tokens is not None else count_tokens(text)
+    if tokens <= budget:
+        return text
+
+    head_budget = int(budget * constants.TOOL_OUTPUT_HEAD_RATIO)
+    marker = f"\n... [{tokens - budget} tokens omitted] ...\n"
+    tail_budget = max(budget - head_budget - count_tokens(marker), 0)
+    return truncate_tokens(text, head_budget) + marker + truncate_tokens(text, tail_budget, from_end=True)
+
+
+def compress_output(text: str) -> str:
+    """Collapse lines with common prefixes with DataCompressor; the text is returned as is if that fails."""
+    try:
+        compressor = DataCompressor()
+        compressor.start_compressing(text)
+        return compressor.get_compressed_output()
+    except Exception as e:
+        logger.warning(f"Tool output was not compressed: {e}")
+        return text
+
+
+def summarize_output(tool_name: str, text: str, budget: int) -> str:
+    """Summarize a tool output with TOOL_OUTPUT_SUMMARY_MODEL; the text is returned as is if that fails."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from utils.llm import create_llm
+
+    try:
+        system_message = PromptRegistry().get(SUMMARY_PROMPT_KEY).format(tool_name=tool_name, token_budget=budget)
+        source = truncate_head_tail(text, constants.TOOL_OUTPUT_SUMMARY_INPUT_BUDGET)
+        response = Instrumentation().invoke_llm(
+            create_llm(constants.TOOL_OUTPUT_SUMMARY_MODEL),
+            [SystemMessage(content=system_message), HumanMessage(content=source)],
+            'tool_output_summarizer'
+        )
+        return response.content
+    except Exception as e:
+        logger.warning(f"The output of '{tool_name}' was not summarized: {e}")
+        return text
+
+
+def store_tool_output(tool_name: str, text: str, tokens: int) -> Optional[str]:
+    """
+    Queue a raw tool output for the results DB (see ResultWriter).
+
+    :return: The id of the stored output, or None if it could not be queued
+    """
+    output_id = uuid.uuid4().hex
+    try:
+        ResultWriter().write_tool_output(output_id, tool_name, tokens, text)
+    except Exception as e:
+        logger.warning(f"The output of '{tool_name}' was not stored: {e}")
+        return None
+    return output_id
+
+
+def load_tool_output(output_id: str) -> Optional[str]:
+    """Return a stored raw tool output by its id, or None if there is no such output."""
+    # sqlalchemy is imported on first use to keep the start-up of workers short
+    from utils.dao.sqlalchemy.db_manager.alchemy_manager import ManagerAlchemyDB
+
+    # The output may still be queued for the background writer
+    ResultWriter().flush(timeout=constants.RESULT_WRITER_PUT_TIMEOUT)
+    return ManagerAlchemyDB(constants.RESULTS_DB_URL).get_tool_output_text(output_id)
@@ -32,12 +32,3 @@ def launch_workflow():
     }
     print(output)
 
-
-def extract_results(event: Dict):
-    messages = event.get(MESSAGES_FIELD)
-    result = []
-    for message in messages[::-1]:
-        if not isinstance(message, ToolMessage):
-            return result
-
-        result += message.content.replace("['", "").replace("']", "").split("', '")